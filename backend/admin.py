@@ -1,15 +1,161 @@
+import re
+
 from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.utils.functional import cached_property
+
+from . import fulltext
+from .models import ArxivPaper, Author, Subject, PaperImage, PaperSource, PaperSummary
+
+# tables smaller than this are counted exactly, the estimate is only worth it for big ones
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# characters of long text fields shown in changelists
+EXCERPT_LENGTH = 100
+
+# new (2401.00001), old (hep-th/9901001) and benchmark (bench.00001) style arxiv ids, with an optional version
+ARXIV_ID = re.compile(r'(\d{4}\.\d{4,5}|[a-z\-]+(\.[A-Z]{2})?/\d{7}|bench\.\S+?)(v\d+)?')
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate instead of COUNT(*) for unfiltered PostgreSQL changelists,
+    counting has to scan the whole table and is what makes big changelists time out.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class DeferredTextChangeList(ChangeList):
+    """
+    A changelist which never loads the model admin's deferred_fields, only the excerpts it displays
+    """
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return queryset.defer(*self.model_admin.deferred_fields)
+
+
+class RangeBucketFilter(admin.SimpleListFilter):
+    """
+    Filters an integer field by ranges instead of listing every distinct value it has
+    """
+    field = None
+    # (lower bound, upper bound), upper bound excluded, None for no bound
+    buckets = [(0, 1), (1, 10), (10, 100), (100, 1000), (1000, 10000), (10000, None)]
+
+    def lookups(self, request, model_admin):
+        choices = []
+        for lower, upper in self.buckets:
+            if upper is None:
+                label = f'{lower:,}+'
+            elif upper - lower == 1:
+                label = f'{lower:,}'
+            else:
+                label = f'{lower:,} - {upper - 1:,}'
+            choices.append((f'{lower}-{upper or ""}', label))
+        return choices
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        lower, upper = self.value().split('-')
+        queryset = queryset.filter(**{f'{self.field}__gte': int(lower)})
+        if upper:
+            queryset = queryset.filter(**{f'{self.field}__lt': int(upper)})
+        return queryset
 
-from .models import ArxivPaper, Author, Subject, PaperImage, PaperSource
 
+class CitationsFilter(RangeBucketFilter):
+    title = 'citations'
+    parameter_name = 'citations_range'
+    field = 'citations'
 
-class ArxivPaperAdmin(admin.ModelAdmin):
-    list_display = ('title', 'citations', 'total_author_citations', 'summary', 'publication_date', 'arxiv_id',
-                    'created_at')
-    search_fields = ('title', 'abstract', 'arxiv_id')
+
+class TotalAuthorCitationsFilter(RangeBucketFilter):
+    title = 'total author citations'
+    parameter_name = 'total_author_citations_range'
+    field = 'total_author_citations'
+    buckets = [(0, 1), (1, 100), (100, 1000), (1000, 10000), (10000, 100000), (100000, None)]
+
+
+class FastModelAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin defaults for tables with hundreds of thousands of rows
+    """
+    paginator = EstimatedCountPaginator
+    # filtered changelists otherwise run a second COUNT(*) over the whole table
+    show_full_result_count = False
+    deferred_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return DeferredTextChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match the whole search term against every search field, which have to name a case sensitive lookup
+        (e.g. title__startswith): Django's iexact and istartswith compare UPPER(column), which no index has,
+        and splitting the term into words would make a title prefix with spaces match nothing
+        """
+        search_term = search_term.strip()
+        search_fields = self.get_search_fields(request)
+        if not search_term or not search_fields:
+            return queryset, False
+        condition = Q()
+        for field in search_fields:
+            condition |= Q(**{field: search_term})
+        may_have_duplicates = any(lookup_spawns_duplicates(self.opts, field) for field in search_fields)
+        return queryset.filter(condition), may_have_duplicates
+
+
+class ArxivPaperAdmin(FastModelAdmin):
+    list_display = ('title', 'citations', 'total_author_citations', 'summary_excerpt', 'publication_date',
+                    'primary_subject', 'arxiv_id', 'created_at')
+    list_select_related = ('primary_subject',)
+    search_fields = ('arxiv_id__exact', 'title__startswith')
     readonly_fields = ('created_at', 'modified_at')
     ordering = ('-publication_date',)
-    list_filter = ('publication_date', 'created_at', 'citations', 'total_author_citations')
+    list_filter = ('publication_date', 'created_at', CitationsFilter, TotalAuthorCitationsFilter)
+    raw_id_fields = ('primary_subject', 'authors', 'subjects', 'images', 'sources')
+    deferred_fields = ('abstract', 'summary', 'comment')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(summary_excerpt=Substr('summary', 1, EXCERPT_LENGTH))
+
+    @admin.display(description='summary')
+    def summary_excerpt(self, paper):
+        if len(paper.summary_excerpt) < EXCERPT_LENGTH:
+            return paper.summary_excerpt
+        return paper.summary_excerpt + '…'
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        An arxiv id is only looked up by its unique index. Anything else matches title prefixes and, on
+        PostgreSQL, the title and abstract through the full text index.
+        """
+        match = ARXIV_ID.fullmatch(search_term.strip())
+        if match:
+            return queryset.filter(arxiv_id=match.group(1)), False
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip() and fulltext.is_available(queryset.db):
+            results = results | fulltext.full_text_filter(queryset, search_term)
+        return results, may_have_duplicates
 
 
 class SubjectAdmin(admin.ModelAdmin):
@@ -18,21 +164,46 @@ class SubjectAdmin(admin.ModelAdmin):
     ordering = ('short_name',)
 
 
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorCitationsFilter(RangeBucketFilter):
+    title = 'citations'
+    parameter_name = 'citations_range'
+    field = 'citations'
+    buckets = [(0, 1), (1, 100), (100, 1000), (1000, 10000), (10000, 100000), (100000, None)]
+
+
+class AuthorAdmin(FastModelAdmin):
     list_display = ('name', 'affiliation', 'email', 'email_domain', 'citations', 'scholar_id')
-    search_fields = ('name', 'affiliation', 'email', 'email_domain', 'citations', 'scholar_id')
+    search_fields = ('name__startswith', 'affiliation__startswith', 'email__exact', 'email_domain__exact',
+                     'scholar_id__exact')
+    list_filter = (AuthorCitationsFilter,)
     ordering = ('name',)
 
 
-class PaperImageAdmin(admin.ModelAdmin):
+class PaperImageAdmin(FastModelAdmin):
     list_display = ('image', 'paper')
-    search_fields = ('image', 'paper')
+    list_select_related = ('paper',)
+    search_fields = ('paper__arxiv_id__exact',)
+    raw_id_fields = ('paper',)
     ordering = ('image',)
+    deferred_fields = ('paper__abstract', 'paper__summary', 'paper__comment')
 
 
-class PaperSourceAdmin(admin.ModelAdmin):
+class PaperSourceAdmin(FastModelAdmin):
     list_display = ('paper',)
-    search_fields = ('paper',)
+    list_select_related = ('paper',)
+    search_fields = ('paper__arxiv_id__exact',)
+    raw_id_fields = ('paper',)
+    deferred_fields = ('content', 'paper__abstract', 'paper__summary', 'paper__comment')
+
+
+class PaperSummaryAdmin(FastModelAdmin):
+    list_display = ('paper', 'model', 'prompt', 'prompt_tokens', 'completion_tokens', 'created_at')
+    list_select_related = ('paper',)
+    list_filter = ('model', 'prompt')
+    search_fields = ('paper__arxiv_id__exact',)
+    raw_id_fields = ('paper',)
+    ordering = ('-created_at',)
+    deferred_fields = ('paper__abstract', 'paper__summary', 'paper__comment')
 
 
 admin.site.register(ArxivPaper, ArxivPaperAdmin)
@@ -40,3 +211,4 @@ admin.site.register(Subject, SubjectAdmin)
 admin.site.register(Author, AuthorAdmin)
 admin.site.register(PaperImage, PaperImageAdmin)
 admin.site.register(PaperSource, PaperSourceAdmin)
+admin.site.register(PaperSummary, PaperSummaryAdmin)
@@ -0,0 +1,98 @@
+from itertools import permutations
+
+from django.db import connection, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+
+from .models import ArxivPaper, Author, CoAuthorship
+
+# papers with more authors than this (large collaborations) don't count towards co-authorships,
+# every pair would get a row while telling little about who works with whom
+COAUTHOR_MAX_AUTHORS = 50
+
+
+def add_coauthorships(pairs: dict) -> None:
+    """
+    Add to the co-authorship counts with one batched upsert
+    :param pairs: (author id, coauthor id) -> number of papers to add
+    :return: None
+    """
+    if not pairs:
+        return
+    table = connection.ops.quote_name(CoAuthorship._meta.db_table)
+    sql = (f'INSERT INTO {table} (author_id, coauthor_id, paper_count) VALUES (%s, %s, %s) '
+           f'ON CONFLICT (author_id, coauthor_id) DO UPDATE SET paper_count = {table}.paper_count + excluded.paper_count')
+    # sorted so concurrent scrapers lock rows in the same order
+    rows = sorted((author_id, coauthor_id, count) for (author_id, coauthor_id), count in pairs.items())
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def remove_coauthorships(pairs: set) -> None:
+    """
+    Take one paper off the co-authorship counts of pairs, dropping the pairs left without any
+    :param pairs: (author id, coauthor id) pairs
+    :return: None
+    """
+    if not pairs:
+        return
+    table = connection.ops.quote_name(CoAuthorship._meta.db_table)
+    sql = f'UPDATE {table} SET paper_count = paper_count - 1 WHERE author_id = %s AND coauthor_id = %s'
+    with connection.cursor() as cursor:
+        # sorted like add_coauthorships
+        cursor.executemany(sql, sorted(pairs))
+    CoAuthorship.objects.filter(paper_count__lte=0).delete()
+
+
+def link_authors(paper, authors) -> None:
+    """
+    Link authors to a paper and update their paper counts, latest paper dates and co-authorships.
+    Authors which were already linked to the paper are not counted twice.
+    :param paper: The saved ArxivPaper
+    :param authors: The paper's Authors, in order
+    :return: None
+    """
+    linked = set(paper.authors.values_list('id', flat=True))
+    new_ids = []
+    for author in authors:
+        if author.id not in linked and author.id not in new_ids:
+            new_ids.append(author.id)
+    if not new_ids:
+        return
+
+    with transaction.atomic():
+        paper.authors.add(*new_ids)
+        updates = {'paper_count': F('paper_count') + 1}
+        if paper.publication_date:
+            updates['latest_paper_date'] = Case(
+                When(Q(latest_paper_date__isnull=True) | Q(latest_paper_date__lt=paper.publication_date),
+                     then=Value(paper.publication_date)),
+                default=F('latest_paper_date'))
+        Author.objects.filter(id__in=new_ids).update(**updates)
+
+        author_ids = list(linked) + new_ids
+        if len(author_ids) <= COAUTHOR_MAX_AUTHORS:
+            # only pairs involving a new author, the others were counted when they were linked
+            new = set(new_ids)
+            add_coauthorships({pair: 1 for pair in permutations(author_ids, 2) if pair[0] in new or pair[1] in new})
+
+
+def unlink_authors(paper, author_ids) -> None:
+    """
+    Unlink authors from a paper, e.g. dropped from a newer arxiv version, undoing what link_authors counted
+    :param paper: The saved ArxivPaper
+    :param author_ids: The ids of the Authors to unlink, those not linked to the paper are ignored
+    :return: None
+    """
+    linked = set(paper.authors.values_list('id', flat=True))
+    removed = linked & set(author_ids)
+    if not removed:
+        return
+
+    with transaction.atomic():
+        paper.authors.remove(*removed)
+        latest = ArxivPaper.objects.filter(authors=OuterRef('pk')).order_by('-publication_date') \
+            .values('publication_date')[:1]
+        Author.objects.filter(id__in=removed).update(paper_count=F('paper_count') - 1,
+                                                     latest_paper_date=Subquery(latest))
+        if len(linked) <= COAUTHOR_MAX_AUTHORS:
+            remove_coauthorships({pair for pair in permutations(linked, 2) if pair[0] in removed or pair[1] in removed})
@@ -0,0 +1,4 @@
+"""
+Benchmark harness for papers.day: a synthetic data generator and timed scenarios for the feed API and the scraper.
+Run with `python manage.py generate_benchmark_data` followed by `python manage.py run_benchmarks`.
+"""
@@ -0,0 +1,172 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.db.models import OuterRef, Subquery, Sum
+
+from backend import subjects as subject_index
+from backend.models import ArxivPaper, Author, Subject, PaperImage
+
+# every generated paper has an arxiv_id with this prefix so it can be cleared again
+BENCH_PREFIX = 'bench.'
+
+SUBJECTS = [
+    ('cs.LG', 'Machine Learning'),
+    ('cs.CL', 'Computation and Language'),
+    ('cs.CV', 'Computer Vision and Pattern Recognition'),
+    ('cs.AI', 'Artificial Intelligence'),
+    ('cs.RO', 'Robotics'),
+    ('cs.NE', 'Neural and Evolutionary Computing'),
+    ('cs.IR', 'Information Retrieval'),
+    ('cs.CR', 'Cryptography and Security'),
+    ('cs.DC', 'Distributed, Parallel, and Cluster Computing'),
+    ('cs.HC', 'Human-Computer Interaction'),
+    ('cs.SD', 'Sound'),
+    ('cs.MA', 'Multiagent Systems'),
+    ('stat.ML', 'Machine Learning (Statistics)'),
+    ('eess.AS', 'Audio and Speech Processing'),
+    ('eess.IV', 'Image and Video Processing'),
+    ('math.OC', 'Optimization and Control'),
+    ('q-bio.NC', 'Neurons and Cognition'),
+    ('physics.comp-ph', 'Computational Physics'),
+]
+
+WORDS = (
+    'transformer attention diffusion model language large learning neural network graph reinforcement policy '
+    'agent vision image video segmentation detection generative adversarial latent representation contrastive '
+    'self-supervised pretraining finetuning benchmark dataset evaluation robust efficient scalable sparse dense '
+    'retrieval augmented reasoning chain thought instruction alignment preference reward feedback optimization '
+    'gradient stochastic convergence theory bound kernel bayesian inference uncertainty calibration federated '
+    'privacy differential quantization pruning distillation compression hardware memory inference speech audio '
+    'multimodal embedding token decoder encoder mixture experts routing scaling laws emergent zero-shot few-shot'
+).split()
+
+FIRST_NAMES = ('Alice Bob Carol David Erin Frank Grace Heidi Ivan Judy Ken Laura Mallory Niaj Olivia Peggy Quinn '
+               'Rupert Sybil Trent Uma Victor Wendy Xin Yuki Zhang Wei Li Priya Ahmed Sofia Mateo').split()
+LAST_NAMES = ('Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez Wang Chen '
+              'Liu Zhang Kim Park Nguyen Singh Kumar Sato Suzuki Müller Schmidt Rossi Novak Ivanov Silva Cohen').split()
+
+
+def _sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(min_words, max_words))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng: random.Random, sentences: int) -> str:
+    return ' '.join(_sentence(rng, 8, 25) for _ in range(sentences))
+
+
+def _authors_per_paper(rng: random.Random) -> int:
+    """
+    Power-law number of authors: most papers have a handful, a long tail of big collaborations has hundreds
+    """
+    return min(int(rng.paretovariate(1.6)) + rng.randint(0, 3), 800)
+
+
+def _power_law_int(rng: random.Random, alpha: float, scale: int, cap: int) -> int:
+    return min(int((rng.paretovariate(alpha) - 1) * scale), cap)
+
+
+def clear_benchmark_data() -> None:
+    """
+    Delete all generated papers along with the authors and images that only they reference
+    """
+    papers = ArxivPaper.objects.filter(arxiv_id__startswith=BENCH_PREFIX)
+    PaperImage.objects.filter(paper__in=papers).delete()
+    papers.delete()
+    Author.objects.filter(name__startswith=BENCH_PREFIX).delete()
+
+
+def generate_benchmark_data(num_papers: int, seed: int = 0, batch_size: int = 2000, stdout=None) -> None:
+    """
+    Populate the database with synthetic papers, authors, subjects and images.
+    :param num_papers: the number of papers to create
+    :param seed: random seed, the same seed always generates the same corpus
+    :param batch_size: the number of papers inserted per bulk_create
+    :param stdout: optional stream to write progress to
+    :return: None
+    """
+    rng = random.Random(seed)
+
+    subjects = []
+    for short_name, full_name in SUBJECTS:
+        subject = Subject.objects.filter(short_name=short_name).first()
+        if not subject:
+            subject = Subject.objects.create(short_name=short_name, full_name=full_name)
+        subjects.append(subject)
+    # a few subjects hold most of the papers
+    subject_weights = [1 / (rank + 1) for rank in range(len(subjects))]
+
+    # roughly one distinct author per paper, of which a small number appear on many papers
+    num_authors = max(num_papers, 100)
+    for start in range(0, num_authors, batch_size):
+        authors = []
+        for n in range(start, min(start + batch_size, num_authors)):
+            name = f'{BENCH_PREFIX}{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}'
+            authors.append(Author(name=name, citations=_power_law_int(rng, 1.2, 50, 500000)))
+        Author.objects.bulk_create(authors, batch_size=batch_size)
+    author_ids = list(Author.objects.filter(name__startswith=BENCH_PREFIX).order_by('id').values_list('id', flat=True))
+
+    today = date.today()
+    author_through = ArxivPaper.authors.through
+    subject_through = ArxivPaper.subjects.through
+    image_through = ArxivPaper.images.through
+    for start in range(0, num_papers, batch_size):
+        papers = []
+        paper_authors = []
+        paper_subjects = []
+        for n in range(start, min(start + batch_size, num_papers)):
+            # recent days are much denser than old ones, like the real feed
+            age = int(rng.expovariate(1 / 120)) % (5 * 365)
+            primary = rng.choices(subjects, weights=subject_weights)[0]
+            paper = ArxivPaper(
+                arxiv_id=f'{BENCH_PREFIX}{n:08d}',
+                title=_sentence(rng, 5, 14)[:255],
+                abstract=_paragraph(rng, rng.randint(5, 10)),
+                summary=_paragraph(rng, 2),
+                publication_date=today - timedelta(days=age),
+                primary_subject=primary,
+                citations=_power_law_int(rng, 1.5, 5, 50000),
+                screenshot=f'screenshots/{BENCH_PREFIX}{n:08d}.png',
+            )
+            papers.append(paper)
+            ids = {author_ids[int(len(author_ids) * rng.random() ** 2)] for _ in range(_authors_per_paper(rng))}
+            paper_authors.append(ids)
+            extra = set(rng.choices(subjects, weights=subject_weights, k=rng.randint(0, 3)))
+            paper_subjects.append({primary.id} | {subject.id for subject in extra})
+        ArxivPaper.objects.bulk_create(papers, batch_size=batch_size)
+
+        # bulk_create only sets primary keys on some backends, so look them up again
+        arxiv_ids = [paper.arxiv_id for paper in papers]
+        paper_ids = dict(ArxivPaper.objects.filter(arxiv_id__in=arxiv_ids).values_list('arxiv_id', 'id'))
+        author_links = []
+        subject_links = []
+        images = []
+        for paper, authors, paper_subject_ids in zip(papers, paper_authors, paper_subjects):
+            paper_id = paper_ids[paper.arxiv_id]
+            author_links.extend(author_through(arxivpaper_id=paper_id, author_id=a) for a in authors)
+            subject_links.extend(subject_through(arxivpaper_id=paper_id, subject_id=s) for s in paper_subject_ids)
+            for i in range(min(int(rng.expovariate(1 / 4)), 30)):
+                images.append(PaperImage(paper_id=paper_id, image=f'images/{paper.arxiv_id}_fig{i}.png'))
+        author_through.objects.bulk_create(author_links, batch_size=batch_size)
+        subject_through.objects.bulk_create(subject_links, batch_size=batch_size)
+        PaperImage.objects.bulk_create(images, batch_size=batch_size)
+        image_links = [image_through(arxivpaper_id=paper_id, paperimage_id=image_id) for image_id, paper_id in
+                       PaperImage.objects.filter(paper_id__in=paper_ids.values()).values_list('id', 'paper_id')]
+        image_through.objects.bulk_create(image_links, batch_size=batch_size)
+
+        total_authors = sum(map(len, paper_authors))
+        if stdout:
+            stdout.write(f'Created {start + len(papers)}/{num_papers} papers '
+                         f'({total_authors} author links, {len(images)} images in this batch)')
+
+    # total_author_citations is denormalized onto the paper by the scraper, do the same here in SQL
+    totals = (author_through.objects.filter(arxivpaper_id=OuterRef('pk')).values('arxivpaper_id')
+              .annotate(total=Sum('author__citations')).values('total'))
+    ArxivPaper.objects.filter(arxiv_id__startswith=BENCH_PREFIX).update(total_author_citations=Subquery(totals))
+
+    # the subject feeds are filled at ingest too
+    subject_index.rebuild_index()
+
+    # so are the author aggregates, bulk_create skipped both the normalized names and the counts
+    call_command('rebuild_author_stats', batch_size=batch_size, stdout=stdout)
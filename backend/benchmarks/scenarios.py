@@ -0,0 +1,256 @@
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from backend import caching
+from backend.models import ArxivPaper, Author
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'arxiv')
+
+
+class Scenario:
+    """
+    A named, repeatable piece of work. `run` is timed, `setup`/`teardown` are not.
+    """
+    group = ''
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def setup(self) -> None:
+        pass
+
+    def run(self):
+        raise NotImplementedError
+
+    def teardown(self) -> None:
+        pass
+
+
+class ApiScenario(Scenario):
+    """
+    A single GET against papers_api with the given query parameters. Cold scenarios start from an empty cache.
+    """
+    group = 'api'
+
+    def __init__(self, name: str, params: dict, cold: bool = False):
+        super().__init__(name)
+        self.params = params
+        self.cold = cold
+        self.client = Client(HTTP_HOST='localhost')
+
+    def setup(self) -> None:
+        if self.cold:
+            caching.clear()
+
+    def run(self):
+        response = self.client.get(reverse('homepage:papers_api'), self.params)
+        assert response.status_code == 200, f'{self.name}: status {response.status_code}'
+        return response
+
+
+def api_scenarios(search_terms: list) -> list:
+    # feed pages are cached too, cold scenarios time the queries behind them
+    scenarios = [ApiScenario('browse', {}, cold=True), ApiScenario('browse-cached', {})]
+    for date_filter in ['today', 'this-week', 'this-month', 'this-year', 'forever']:
+        scenarios.append(ApiScenario(f'date:{date_filter}', {'d': date_filter}, cold=True))
+    scenarios.append(ApiScenario('sort:hot', {'sort': 'hot', 'd': 'forever'}, cold=True))
+    scenarios.append(ApiScenario('sort:hot:s=1500', {'sort': 'hot', 'd': 'forever', 's': 1500}, cold=True))
+    scenarios.append(ApiScenario('subject:cs.LG', {'subject': 'cs.LG', 'd': 'forever'}, cold=True))
+    scenarios.append(ApiScenario('subject:math.OC+stat.ML:s=150', {'subject': 'math.OC+stat.ML', 'd': 'forever',
+                                                                    's': 150}, cold=True))
+    for term in search_terms:
+        scenarios.append(ApiScenario(f'search:{term}', {'q': term, 'd': 'forever'}, cold=True))
+        scenarios.append(ApiScenario(f'search-cached:{term}', {'q': term, 'd': 'forever'}))
+    for start in [150, 1500, 15000]:
+        scenarios.append(ApiScenario(f'paginate:s={start}', {'d': 'forever', 's': start}, cold=True))
+    return scenarios
+
+
+class FakeOpenAI:
+    """
+    Stands in for openai.OpenAI, answering every completion with a fixed summary after a fixed delay
+    """
+    latency = 0.0
+    summary = 'We route tokens to a few experts. It matches dense models at a third of the compute.'
+
+    def __init__(self, *args, **kwargs):
+        self.api_key = None
+        self.completions = SimpleNamespace(create=self._create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.latency)
+        message = SimpleNamespace(content=self.summary, role='assistant')
+        choice = SimpleNamespace(text=self.summary, message=message, index=0)
+        usage = SimpleNamespace(prompt_tokens=200, completion_tokens=40, total_tokens=240)
+        return SimpleNamespace(choices=[choice], usage=usage, model=kwargs.get('model'))
+
+
+def fake_arxiv_get(url, *args, **kwargs):
+    """
+    Serves arxiv list, abstract, pdf and e-print urls from the recorded fixtures
+    """
+    def fixture(name):
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            return f.read()
+
+    response = SimpleNamespace(status_code=200, headers={}, url=url)
+    if '/list/' in url:
+        response.content = fixture('list.html')
+    elif match := re.search(r'/abs/([^/?]+)', url):
+        response.content = fixture('abs.html').replace(b'ARXIV_ID', match.group(1).encode())
+    elif '/pdf/' in url:
+        response.content = fixture('paper.pdf')
+    elif '/e-print/' in url:
+        response.content = fixture('source.tar.gz')
+    else:
+        response.status_code = 404
+        response.content = b''
+    response.text = response.content.decode('utf-8', errors='replace')
+    return response
+
+
+class ScrapeScenario(Scenario):
+    """
+    Runs the scraper against the recorded arxiv fixtures with a mocked OpenAI endpoint, writing media and
+    indexes to a temporary directory. Everything the run created is removed again in teardown.
+    """
+    group = 'scrape'
+
+    def __init__(self, name: str, arxiv_ids: list, from_list: bool = False, openai_latency: float = 0.0):
+        super().__init__(name)
+        self.arxiv_ids = arxiv_ids
+        self.from_list = from_list
+        self.openai_latency = openai_latency
+
+    def setup(self) -> None:
+        import scrape_abs
+        assert not ArxivPaper.objects.filter(arxiv_id__in=self.arxiv_ids).exists(), \
+            f'{self.name}: fixture papers already exist in this database'
+        self.scrape_abs = scrape_abs
+        self.media_root = tempfile.mkdtemp(prefix='papers-bench-')
+        # authors the run creates get higher ids than this
+        self.last_author_id = Author.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        FakeOpenAI.latency = self.openai_latency
+        self.patches = ExitStack()
+        # the scraper narrates every step, keep that out of the benchmark output
+        self.patches.enter_context(redirect_stdout(open(os.devnull, 'w')))
+        # the recorded fixtures aren't rate limited, the breakers still count their failures
+        upstreams = {host: dict(options, rate=None) for host, options in settings.SCRAPER_UPSTREAMS.items()}
+        self.patches.enter_context(override_settings(MEDIA_ROOT=self.media_root,
+                                                     EMBEDDINGS_DIR=os.path.join(self.media_root, 'embeddings'),
+                                                     FEEDS_DIR=os.path.join(self.media_root, 'feeds'),
+                                                     SCRAPER_STATE_DIR=os.path.join(self.media_root, 'upstreams'),
+                                                     SCRAPER_UPSTREAMS=upstreams))
+        self.patches.enter_context(mock.patch('requests.get', fake_arxiv_get))
+        # scraper.summaries imports OpenAI when it runs, so the package attribute is what gets used
+        self.patches.enter_context(mock.patch('openai.OpenAI', FakeOpenAI))
+
+    def run(self):
+        if self.from_list:
+            self.scrape_abs.scrape_papers_from_list('cs.LG', len(self.arxiv_ids), 'pastweek')
+        else:
+            for arxiv_id in self.arxiv_ids:
+                assert self.scrape_abs.scrape_paper(arxiv_id), f'{self.name}: {arxiv_id} was not scraped'
+
+    def teardown(self) -> None:
+        self.patches.close()
+        ArxivPaper.objects.filter(arxiv_id__in=self.arxiv_ids).delete()
+        Author.objects.filter(id__gt=self.last_author_id).delete()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+
+def scrape_scenarios() -> list:
+    list_ids = ['2306.00001', '2306.00002', '2306.00003', '2306.00004', '2306.00005']
+    return [
+        ScrapeScenario('scrape_paper', ['2306.00001']),
+        ScrapeScenario('scrape_paper:openai_500ms', ['2306.00001'], openai_latency=0.5),
+        ScrapeScenario('scrape_papers_from_list:5', list_ids, from_list=True),
+    ]
+
+
+# modules which take long to import and must only be loaded by the stage that uses them
+SCRAPER_LAZY_MODULES = ('openai', 'scholarly', 'fitz', 'pymupdf', 'numpy', 'PIL')
+MANAGE_LAZY_MODULES = ('openai', 'scholarly', 'fitz', 'pymupdf')
+
+
+class StartupScenario(Scenario):
+    """
+    Starts a fresh interpreter under -X importtime and fails if it imported any of lazy_modules
+    """
+    group = 'startup'
+
+    def __init__(self, name: str, args: list, lazy_modules=()):
+        super().__init__(name)
+        self.args = args
+        self.lazy_modules = lazy_modules
+
+    def run(self):
+        result = subprocess.run([sys.executable, '-X', 'importtime', *self.args], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, f'{self.name}: exited with {result.returncode}\n{result.stderr[-2000:]}'
+        imported = {line.rsplit('|', 1)[1].strip() for line in result.stderr.splitlines()
+                    if line.startswith('import time:')}
+        eager = sorted(imported & set(self.lazy_modules))
+        assert not eager, f'{self.name}: imported {", ".join(eager)} at startup'
+
+
+def startup_scenarios() -> list:
+    return [
+        StartupScenario('import:scrape_abs', ['-c', 'import scrape_abs'], SCRAPER_LAZY_MODULES),
+        StartupScenario('manage.py:check', ['manage.py', 'check'], MANAGE_LAZY_MODULES),
+    ]
+
+
+def run_scenario(scenario: Scenario, repeat: int, warmup: int = 1) -> dict:
+    """
+    Time a scenario. Setup and teardown run around every repetition so each run starts from the same state.
+    :return: a dict of timings in milliseconds plus query count and response size of the last run
+    """
+    timings = []
+    queries = 0
+    response_bytes = None
+    for i in range(warmup + repeat):
+        scenario.setup()
+        try:
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                result = scenario.run()
+                elapsed = time.perf_counter() - start
+        finally:
+            scenario.teardown()
+        if i < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries = len(captured.captured_queries)
+        if result is not None and hasattr(result, 'content'):
+            response_bytes = len(result.content)
+
+    timings.sort()
+    return {
+        'group': scenario.group,
+        'name': scenario.name,
+        'runs': repeat,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': queries,
+        'response_bytes': response_bytes,
+    }
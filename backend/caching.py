@@ -0,0 +1,305 @@
+"""
+Cache policies in front of the shared cache (CACHES['default'], file based or Redis).
+
+Every policy in settings.CACHE_POLICIES has a timeout after which its entries are stale, a stale window during
+which they are still served while one worker recomputes them, and a local timeout for the per-process LRU
+that saves repeated reads of hot keys a trip to the shared cache. Locally cached entries can outlive a change
+made by another worker by up to the local timeout, so keys which are invalidated explicitly (rather than
+versioned or left to expire) don't belong in a policy.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# how a lookup was answered. local: from this process' LRU, hit: fresh from the shared cache, stale: served stale
+# while another worker refreshes it, refresh: this worker recomputes a stale entry, miss: nothing cached
+OUTCOMES = ('local', 'hit', 'stale', 'refresh', 'miss')
+FRESH, STALE, REFRESH, MISS = 'hit', 'stale', 'refresh', 'miss'
+
+
+class LocalCache:
+    """
+    Per-process LRU of (expiry, value) entries, bounded to CACHE_LOCAL_MAX_ENTRIES
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, timeout: float) -> None:
+        if timeout <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.CACHE_LOCAL_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheStats:
+    """
+    Per-process counts of how every policy's lookups were answered, for the stats endpoint
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._policies = {}
+        self.started_at = time.time()
+
+    def record(self, policy: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._policies.setdefault(policy, dict.fromkeys(OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self) -> dict:
+        """
+        :return: per policy the count of every outcome and the fraction of lookups served from a cache
+        """
+        with self._lock:
+            policies = {name: dict(counts) for name, counts in self._policies.items()}
+        for counts in policies.values():
+            lookups = sum(counts.values())
+            served = lookups - counts['miss'] - counts['refresh']
+            counts['hit_rate'] = served / lookups if lookups else 0.0
+        return dict(sorted(policies.items()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._policies = {}
+            self.started_at = time.time()
+
+
+local_cache = LocalCache()
+stats = CacheStats()
+
+
+class SingleFlight:
+    """
+    Makes concurrent callers of the same key wait for one computation instead of all running it.
+    Threads in this process share an in-memory result, other processes wait on the policy's lock key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+        if not leader:
+            call['done'].wait()
+            if call['error']:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = compute()
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            call['done'].set()
+            with self._lock:
+                del self._calls[key]
+        return call['result']
+
+
+single_flight = SingleFlight()
+
+
+class CachePolicy:
+    """
+    Reads and fills the cache for one of settings.CACHE_POLICIES. Shared entries are (fresh until, value)
+    pairs kept for the policy's timeout plus its stale window. Values must not be None.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def options(self) -> dict:
+        return settings.CACHE_POLICIES[self.name]
+
+    def get(self, key: str):
+        """
+        :return: The cached value, fresh or stale, or None. Never computes anything.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list) -> dict:
+        """
+        :return: key -> cached value for the keys which have one, fresh or stale
+        """
+        found = {}
+        for key in keys:
+            value = local_cache.get(key)
+            if value is not None:
+                found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            for key, (fresh_until, value) in cache.get_many(missing).items():
+                self._keep_locally(key, fresh_until, value)
+                found[key] = value
+        return found
+
+    def set(self, key: str, value) -> None:
+        options = self.options
+        fresh_until = time.time() + options['timeout']
+        cache.set(key, (fresh_until, value), options['timeout'] + options['stale'])
+        self._keep_locally(key, fresh_until, value)
+
+    def get_or_compute(self, key: str, compute):
+        """
+        The cached value of key, computed and stored by compute() when nothing is cached. Concurrent misses of
+        the same key in this process wait for one computation; a stale value is returned as is while one
+        worker replaces it.
+        """
+        value = local_cache.get(key)
+        if value is not None:
+            stats.record(self.name, 'local')
+            return value
+        state, value = self._lookup(key)
+        stats.record(self.name, state)
+        if state in (FRESH, STALE):
+            return value
+        if state == REFRESH:
+            try:
+                return self._compute(key, compute)
+            except Exception:
+                logger.exception(f'Error occurred while refreshing {key}, serving the stale value')
+                return value
+            finally:
+                cache.delete(self._lock_key(key))
+        return single_flight.do(key, lambda: self._fill(key, compute))
+
+    async def aget_or_compute(self, key: str, compute):
+        """
+        get_or_compute for async views, compute returns an awaitable. Concurrent misses wait on the shared lock.
+        """
+        value = local_cache.get(key)
+        if value is not None:
+            stats.record(self.name, 'local')
+            return value
+        state, value = await sync_to_async(self._lookup)(key)
+        stats.record(self.name, state)
+        if state in (FRESH, STALE):
+            return value
+        lock_key = self._lock_key(key)
+        # a REFRESH state means _lookup took the lock
+        locked = state == REFRESH
+        if state == MISS:
+            locked = await cache.aadd(lock_key, 1, self.options['lock_timeout'])
+            if not locked:
+                value = await sync_to_async(self._wait)(key)
+                if value is not None:
+                    return value
+        try:
+            value = await compute()
+            await sync_to_async(self.set)(key, value)
+            return value
+        except Exception:
+            if state != REFRESH:
+                raise
+            logger.exception(f'Error occurred while refreshing {key}, serving the stale value')
+            return value
+        finally:
+            # the lock of a worker which is still computing is left alone
+            if locked:
+                await cache.adelete(lock_key)
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return key + ':lock'
+
+    def _keep_locally(self, key: str, fresh_until: float, value) -> None:
+        # never keep a value locally past the point it goes stale, the refresh happens in the shared cache
+        local_cache.set(key, value, min(self.options['local_timeout'], fresh_until - time.time()))
+
+    def _lookup(self, key: str):
+        """
+        :return: (state, value). A REFRESH state means this caller took the lock and should recompute.
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return MISS, None
+        fresh_until, value = entry
+        if time.time() < fresh_until:
+            self._keep_locally(key, fresh_until, value)
+            return FRESH, value
+        if cache.add(self._lock_key(key), 1, self.options['lock_timeout']):
+            return REFRESH, value
+        return STALE, value
+
+    def _compute(self, key: str, compute):
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def _wait(self, key: str):
+        """
+        Wait for the process holding the lock of key to store its value
+        :return: The value, or None if the lock was released or timed out without one
+        """
+        lock_key = self._lock_key(key)
+        deadline = time.monotonic() + self.options['lock_timeout']
+        while time.monotonic() < deadline:
+            time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+            if cache.get(lock_key) is None:
+                break
+        return None
+
+    def _fill(self, key: str, compute):
+        lock_key = self._lock_key(key)
+        locked = cache.add(lock_key, 1, self.options['lock_timeout'])
+        if not locked:
+            # another process is computing this key, wait for its result rather than repeating the work
+            value = self._wait(key)
+            if value is not None:
+                return value
+        try:
+            return self._compute(key, compute)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+
+
+feed_pages = CachePolicy('feed')
+search_results = CachePolicy('search')
+authors = CachePolicy('author')
+fragments = CachePolicy('fragment')
+
+
+def clear() -> None:
+    """
+    Empty the shared cache and this process' LRU
+    """
+    cache.clear()
+    local_cache.clear()
@@ -0,0 +1,425 @@
+"""
+Streaming export and import of the paper corpus, to move it between databases (local SQLite, production
+PostgreSQL) or seed a staging server.
+
+An export is a directory of gzipped JSON lines files, a few thousand records each:
+
+    manifest.json                  written last, the watermark to pass as --since next time
+    subjects-00000.jsonl.gz        {short_name, full_name}
+    authors-00000.jsonl.gz         {name, affiliation, ...}
+    papers-00000.jsonl.gz          {arxiv_id, ..., authors: [names], subjects: [short names], pdf: {path, sha256}}
+    images-00000.jsonl.gz          {paper: arxiv_id, image: {path, sha256}, width, height, bytes}
+    sources-00000.jsonl.gz         {paper: arxiv_id, contents: [...]}
+    media/ab/ab12...               media files by content hash, so every file is stored once
+
+Records refer to each other by natural keys (arxiv ids, author names, subject short names) rather than primary
+keys, which differ between databases. Both sides read and write in batches and never hold more than one batch.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ArxivPaper, Author, PaperImage, PaperSource, Subject
+from .names import initials_key, normalize_author_name
+
+FORMAT_VERSION = 1
+
+SUBJECT_FIELDS = ('short_name', 'full_name')
+AUTHOR_FIELDS = ('name', 'affiliation', 'email', 'email_domain', 'citations', 'scholar_id')
+PAPER_FIELDS = ('arxiv_id', 'title', 'abstract', 'comment', 'doi', 'journal_ref', 'publication_date', 'summary',
+                'summary_model', 'summary_prompt', 'total_author_citations', 'citations', 'hot_score', 'version',
+                'arxiv_updated_at', 'etags')
+PAPER_FILE_FIELDS = ('pdf', 'screenshot', 'source_tar')
+
+KINDS = ('subjects', 'authors', 'papers', 'images', 'sources')
+
+
+class ChunkedWriter:
+    """
+    Writes records of one kind to numbered gzipped JSON lines files of at most chunk_size records
+    """
+
+    def __init__(self, directory: str, kind: str, chunk_size: int):
+        self.directory = directory
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.file = None
+
+    def write(self, record: dict) -> None:
+        if self.count % self.chunk_size == 0:
+            self.close()
+            path = os.path.join(self.directory, f'{self.kind}-{self.count // self.chunk_size:05d}.jsonl.gz')
+            self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.file.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False))
+        self.file.write('\n')
+        self.count += 1
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def read_records(directory: str, kind: str):
+    """
+    :return: An iterator over the records of one kind, in the order they were written
+    """
+    for path in sorted(glob.glob(os.path.join(directory, f'{kind}-*.jsonl.gz'))):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def hash_file(file) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    """
+    The media/ directory of an export, files named by the sha256 of their content
+    """
+
+    def __init__(self, directory: str, copy: bool = True):
+        self.directory = os.path.join(directory, 'media')
+        self.copy = copy
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def add(self, field_file):
+        """
+        Reference a media file from an export record, copying it into the export unless it's already there
+        :param field_file: The FieldFile of a model instance
+        :return: {'path', 'sha256'}, sha256 is None if the file is missing or media isn't copied, None if unset
+        """
+        if not field_file:
+            return None
+        reference = {'path': field_file.name, 'sha256': None}
+        if not self.copy or not default_storage.exists(field_file.name):
+            return reference
+        with default_storage.open(field_file.name, 'rb') as f:
+            reference['sha256'] = hash_file(f)
+            target = self.path(reference['sha256'])
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                f.seek(0)
+                with open(target + '.tmp', 'wb') as out:
+                    shutil.copyfileobj(f, out)
+                os.replace(target + '.tmp', target)
+        return reference
+
+    def restore(self, reference) -> str:
+        """
+        Put a referenced media file in place in the default storage, unless a file is already there
+        :return: The name to store in the file field
+        """
+        if not reference:
+            return ''
+        name = reference['path']
+        source = self.path(reference['sha256']) if reference.get('sha256') else None
+        if source and os.path.exists(source) and not default_storage.exists(name):
+            with open(source, 'rb') as f:
+                name = default_storage.save(name, File(f))
+        return name
+
+
+def _values(instance, fields) -> dict:
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _parse(model, record: dict, fields) -> dict:
+    # fields added after an export was written take their defaults
+    values = {}
+    for field in fields:
+        model_field = model._meta.get_field(field)
+        values[field] = model_field.to_python(record[field]) if field in record else model_field.get_default()
+    return values
+
+
+def export_corpus(directory: str, since=None, chunk_size: int = 5000, batch_size: int = 1000, media: bool = True,
+                  stdout=None) -> dict:
+    """
+    Export papers, their authors, subjects, images, sources and media files
+    :param directory: The directory to write to, created if needed
+    :param since: Only export rows modified at or after this datetime, None for everything
+    :param chunk_size: Records per file
+    :param batch_size: Rows loaded from the database at a time
+    :param media: Whether to copy media files into the export, or only reference their paths
+    :param stdout: Optional stream to write progress to
+    :return: The manifest
+    """
+    os.makedirs(directory, exist_ok=True)
+    # rows modified while the export runs are picked up again by the next incremental export
+    started_at = timezone.now()
+    media_store = MediaStore(directory, copy=media)
+    writers = {kind: ChunkedWriter(directory, kind, chunk_size) for kind in KINDS}
+
+    for subject in Subject.objects.order_by('id').iterator(chunk_size=batch_size):
+        writers['subjects'].write(_values(subject, SUBJECT_FIELDS))
+
+    authors = Author.objects.all()
+    if since:
+        authors = authors.filter(Q(modified_at__gte=since) | Q(arxivpaper__modified_at__gte=since)).distinct()
+    for author in authors.only(*AUTHOR_FIELDS).order_by('id').iterator(chunk_size=batch_size):
+        writers['authors'].write(_values(author, AUTHOR_FIELDS))
+
+    papers = ArxivPaper.objects.all()
+    if since:
+        papers = papers.filter(modified_at__gte=since)
+    last_id = 0
+    while True:
+        # keyset batches rather than iterator(), which can't prefetch the m2m links
+        batch = list(papers.filter(id__gt=last_id).order_by('id').select_related('primary_subject')
+                     .prefetch_related('authors', 'subjects')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        paper_ids = [paper.id for paper in batch]
+        arxiv_ids = {paper.id: paper.arxiv_id for paper in batch}
+        for paper in batch:
+            record = _values(paper, PAPER_FIELDS)
+            record['primary_subject'] = paper.primary_subject.short_name if paper.primary_subject else None
+            record['authors'] = [author.name for author in paper.authors.all()]
+            record['subjects'] = [subject.short_name for subject in paper.subjects.all()]
+            for field in PAPER_FILE_FIELDS:
+                record[field] = media_store.add(getattr(paper, field))
+            writers['papers'].write(record)
+        for image in PaperImage.objects.filter(paper_id__in=paper_ids).order_by('id'):
+            writers['images'].write({'paper': arxiv_ids[image.paper_id], 'image': media_store.add(image.image),
+                                     'width': image.width, 'height': image.height, 'bytes': image.bytes})
+        contents = {}
+        for paper_id, content in PaperSource.objects.filter(paper_id__in=paper_ids).order_by('id') \
+                .values_list('paper_id', 'content'):
+            contents.setdefault(paper_id, []).append(content)
+        for paper_id, paper_contents in contents.items():
+            writers['sources'].write({'paper': arxiv_ids[paper_id], 'contents': paper_contents})
+        if stdout:
+            stdout.write(f'Exported {writers["papers"].count} papers')
+
+    for writer in writers.values():
+        writer.close()
+    manifest = {
+        'version': FORMAT_VERSION,
+        'since': since,
+        'watermark': started_at,
+        'counts': {kind: writer.count for kind, writer in writers.items()},
+        'media': media,
+    }
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, cls=DjangoJSONEncoder, indent=2)
+    return manifest
+
+
+def read_manifest(directory: str) -> dict:
+    """
+    :return: The manifest of a finished export, raises ValueError if there is none or it's of another version
+    """
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f'{directory} has no manifest.json, the export is missing or incomplete')
+    if manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f'Unsupported export version {manifest.get("version")}')
+    if manifest.get('watermark'):
+        manifest['watermark'] = parse_datetime(manifest['watermark'])
+    return manifest
+
+
+def _import_subjects(records, batch_size: int) -> int:
+    count = 0
+    for batch in batched(records, batch_size):
+        existing = {subject.short_name: subject for subject in
+                    Subject.objects.filter(short_name__in=[record['short_name'] for record in batch])}
+        new, changed = [], []
+        for record in batch:
+            values = _parse(Subject, record, SUBJECT_FIELDS)
+            subject = existing.get(values['short_name'])
+            if subject is None:
+                subject = Subject(**values)
+                existing[subject.short_name] = subject
+                new.append(subject)
+            elif _values(subject, SUBJECT_FIELDS) != values:
+                subject.full_name = values['full_name']
+                changed.append(subject)
+        Subject.objects.bulk_create(new)
+        Subject.objects.bulk_update(changed, ['full_name'])
+        count += len(batch)
+    return count
+
+
+def _author_ids(names) -> dict:
+    """
+    Map author names to ids, creating bare authors for names the database doesn't have yet
+    """
+    ids = {}
+    for name, author_id in Author.objects.filter(name__in=set(names)).order_by('-id').values_list('name', 'id'):
+        ids[name] = author_id
+    missing = [name for name in dict.fromkeys(names) if name not in ids]
+    if missing:
+        Author.objects.bulk_create([Author(name=name, normalized_name=normalize_author_name(name),
+                                           name_initials=initials_key(normalize_author_name(name)))
+                                    for name in missing])
+        ids.update(Author.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def _import_authors(records, batch_size: int) -> int:
+    fields = [field for field in AUTHOR_FIELDS if field != 'name']
+    count = 0
+    for batch in batched(records, batch_size):
+        values = {record['name']: _parse(Author, record, AUTHOR_FIELDS) for record in batch}
+        existing = {}
+        for author in Author.objects.filter(name__in=list(values)).order_by('-id'):
+            existing[author.name] = author
+        new = [Author(normalized_name=normalize_author_name(name),
+                      name_initials=initials_key(normalize_author_name(name)), **author_values)
+               for name, author_values in values.items() if name not in existing]
+        changed = []
+        for name, author in existing.items():
+            if _values(author, AUTHOR_FIELDS) != values[name]:
+                for field in fields:
+                    setattr(author, field, values[name][field])
+                changed.append(author)
+        Author.objects.bulk_create(new)
+        Author.objects.bulk_update(changed, fields)
+        count += len(batch)
+    return count
+
+
+def _paper_ids(arxiv_ids) -> dict:
+    return dict(ArxivPaper.objects.filter(arxiv_id__in=list(arxiv_ids)).values_list('arxiv_id', 'id'))
+
+
+def _import_papers(records, media_store: MediaStore, batch_size: int) -> int:
+    subject_ids = dict(Subject.objects.values_list('short_name', 'id'))
+    fields = [field for field in PAPER_FIELDS if field != 'arxiv_id'] + ['primary_subject_id'] + list(PAPER_FILE_FIELDS)
+    author_through = ArxivPaper.authors.through
+    subject_through = ArxivPaper.subjects.through
+    count = 0
+    for batch in batched(records, batch_size):
+        with transaction.atomic():
+            existing = {paper.arxiv_id: paper for paper in
+                        ArxivPaper.objects.filter(arxiv_id__in=[record['arxiv_id'] for record in batch])}
+            new, changed = [], []
+            for record in batch:
+                values = _parse(ArxivPaper, record, PAPER_FIELDS)
+                values['primary_subject_id'] = subject_ids.get(record.get('primary_subject'))
+                for field in PAPER_FILE_FIELDS:
+                    values[field] = media_store.restore(record.get(field))
+                paper = existing.get(values['arxiv_id'])
+                if paper is None:
+                    new.append(ArxivPaper(**values))
+                else:
+                    for field in fields:
+                        setattr(paper, field, values[field])
+                    changed.append(paper)
+            ArxivPaper.objects.bulk_create(new)
+            ArxivPaper.objects.bulk_update(changed, fields)
+
+            # the links of every paper in the batch are replaced with the exported ones
+            paper_ids = _paper_ids(record['arxiv_id'] for record in batch)
+            author_ids = _author_ids([name for record in batch for name in record['authors']])
+            author_through.objects.filter(arxivpaper_id__in=paper_ids.values()).delete()
+            subject_through.objects.filter(arxivpaper_id__in=paper_ids.values()).delete()
+            author_links, subject_links = [], []
+            for record in batch:
+                paper_id = paper_ids[record['arxiv_id']]
+                for author_id in dict.fromkeys(author_ids[name] for name in record['authors']):
+                    author_links.append(author_through(arxivpaper_id=paper_id, author_id=author_id))
+                for subject_id in {subject_ids[name] for name in record['subjects'] if name in subject_ids}:
+                    subject_links.append(subject_through(arxivpaper_id=paper_id, subject_id=subject_id))
+            author_through.objects.bulk_create(author_links)
+            subject_through.objects.bulk_create(subject_links)
+        count += len(batch)
+    return count
+
+
+def _import_images(records, media_store: MediaStore, batch_size: int) -> int:
+    image_through = ArxivPaper.images.through
+    count = 0
+    for batch in batched(records, batch_size):
+        with transaction.atomic():
+            paper_ids = _paper_ids(record['paper'] for record in batch)
+            existing = set(PaperImage.objects.filter(paper_id__in=paper_ids.values()).values_list('paper_id', 'image'))
+            new = []
+            for record in batch:
+                paper_id = paper_ids.get(record['paper'])
+                name = media_store.restore(record['image'])
+                if paper_id and name and (paper_id, name) not in existing:
+                    existing.add((paper_id, name))
+                    new.append(PaperImage(paper_id=paper_id, image=name, width=record.get('width', 0),
+                                          height=record.get('height', 0), bytes=record.get('bytes', 0)))
+            PaperImage.objects.bulk_create(new)
+            links = [image_through(arxivpaper_id=paper_id, paperimage_id=image_id) for image_id, paper_id in
+                     PaperImage.objects.filter(paper_id__in=paper_ids.values()).values_list('id', 'paper_id')]
+            image_through.objects.bulk_create(links, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def _import_sources(records, batch_size: int) -> int:
+    source_through = ArxivPaper.sources.through
+    count = 0
+    # sources are big, so these batches are counted in files rather than papers
+    for batch in batched(records, max(batch_size // 10, 1)):
+        with transaction.atomic():
+            paper_ids = _paper_ids(record['paper'] for record in batch)
+            PaperSource.objects.filter(paper_id__in=paper_ids.values()).delete()
+            PaperSource.objects.bulk_create([PaperSource(paper_id=paper_ids[record['paper']], content=content)
+                                             for record in batch if record['paper'] in paper_ids
+                                             for content in record['contents']])
+            links = [source_through(arxivpaper_id=paper_id, papersource_id=source_id) for source_id, paper_id in
+                     PaperSource.objects.filter(paper_id__in=paper_ids.values()).values_list('id', 'paper_id')]
+            source_through.objects.bulk_create(links, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def import_corpus(directory: str, batch_size: int = 1000, stdout=None) -> dict:
+    """
+    Import an export into this database. Rows are matched by natural keys, so importing into a database which
+    already has some of the papers updates them, and incremental exports can be applied on top of each other.
+    :param directory: The export directory
+    :param batch_size: Records per bulk insert
+    :param stdout: Optional stream to write progress to
+    :return: The number of records imported per kind
+    """
+    read_manifest(directory)
+    media_store = MediaStore(directory)
+    counts = {
+        'subjects': _import_subjects(read_records(directory, 'subjects'), batch_size),
+        'authors': _import_authors(read_records(directory, 'authors'), batch_size),
+        'papers': _import_papers(read_records(directory, 'papers'), media_store, batch_size),
+        'images': _import_images(read_records(directory, 'images'), media_store, batch_size),
+        'sources': _import_sources(read_records(directory, 'sources'), batch_size),
+    }
+    if stdout:
+        stdout.write('Imported ' + ', '.join(f'{count} {kind}' for kind, count in counts.items()))
+    return counts
@@ -0,0 +1,144 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import ArxivPaper, PaperCounter
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('view', 'click')
+
+
+class CounterBuffer:
+    """
+    Collects view and click increments in process memory and writes them to PaperCounter as one batched
+    upsert every COUNTER_FLUSH_INTERVAL seconds (or once COUNTER_FLUSH_MAX_PAPERS papers are pending),
+    instead of an UPDATE per event serializing on the hottest rows.
+    The event which finds the oldest pending one older than the interval flushes the buffer, and a background
+    thread also flushes it every interval, so counts get written when events stop coming in too, where the server
+    runs threads. The buffer is also flushed when the worker exits, so an unclean restart loses at most one
+    interval.
+    """
+
+    def __init__(self, background: bool = True):
+        """
+        :param background: Whether to start the background thread with the first event
+        """
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = defaultdict(lambda: {'view': 0, 'click': 0})
+        # when the oldest pending event came in, None while nothing is pending
+        self._oldest = None
+        self._background = background
+        self._timer = None
+
+    def add(self, arxiv_id: str, event_type: str, count: int = 1) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._pending[arxiv_id][event_type] += count
+            if self._oldest is None:
+                self._oldest = now
+            due = (len(self._pending) >= settings.COUNTER_FLUSH_MAX_PAPERS or
+                   now - self._oldest >= settings.COUNTER_FLUSH_INTERVAL)
+            if self._background and self._timer is None:
+                # started by the first event rather than at import, so a forking server starts one per worker
+                self._timer = threading.Thread(target=self._flush_periodically, name='counter-flush', daemon=True)
+                self._timer.start()
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # the counts were put back, the next flush writes them; the event itself was recorded fine
+                logger.exception('Error occurred while flushing paper counters')
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(settings.COUNTER_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Error occurred while flushing paper counters')
+            finally:
+                # this thread never finishes a request, so nothing else closes its broken or expired connection
+                close_old_connections()
+
+    def flush(self) -> int:
+        """
+        Write every pending increment to the database
+        :return: The number of papers whose counters were updated
+        """
+        # only one thread writes at a time, the others keep buffering
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(lambda: {'view': 0, 'click': 0})
+                oldest, self._oldest = self._oldest, None
+            if not pending:
+                return 0
+            try:
+                return self._write(pending)
+            except Exception:
+                # keep the counts for the next flush rather than dropping them
+                with self._lock:
+                    self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+                    for arxiv_id, counts in pending.items():
+                        for event_type, count in counts.items():
+                            self._pending[arxiv_id][event_type] += count
+                raise
+        finally:
+            self._flush_lock.release()
+
+    @staticmethod
+    def _write(pending: dict) -> int:
+        paper_ids = dict(ArxivPaper.objects.filter(arxiv_id__in=list(pending)).values_list('arxiv_id', 'id'))
+        now = timezone.now()
+        # sorted by primary key so concurrent flushes from other workers lock rows in the same order
+        rows = sorted((paper_ids[arxiv_id], counts['view'], counts['click'], now)
+                      for arxiv_id, counts in pending.items() if arxiv_id in paper_ids)
+        if not rows:
+            return 0
+        table = connection.ops.quote_name(PaperCounter._meta.db_table)
+        sql = (f'INSERT INTO {table} (paper_id, views, clicks, modified_at) VALUES (%s, %s, %s, %s) '
+               f'ON CONFLICT (paper_id) DO UPDATE SET views = {table}.views + excluded.views, '
+               f'clicks = {table}.clicks + excluded.clicks, modified_at = excluded.modified_at')
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        return len(rows)
+
+
+buffer = CounterBuffer()
+
+
+def allow_events(client: str) -> bool:
+    """
+    Rate limit of the events API per client, at most EVENTS_RATE_LIMIT requests in a minute, counted in the
+    shared cache so every worker sees the same count. Clicks feed the hot score, nobody should be able to
+    click a paper up the feed.
+    :param client: The client's address
+    :return: Whether the client may report another batch of events
+    """
+    key = f'events:rate:{client}:{int(time.time() // 60)}'
+    # add starts a new minute's count, incr never touches the expiry
+    if cache.add(key, 1, 120):
+        return True
+    try:
+        return cache.incr(key) <= settings.EVENTS_RATE_LIMIT
+    except ValueError:
+        # expired in between
+        return True
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception('Error occurred while flushing paper counters on exit')
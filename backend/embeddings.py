@@ -0,0 +1,403 @@
+"""
+Related papers from hashed TF-IDF vectors over title, abstract and summary.
+
+Vectors are sparse, a paper has a few hundred terms out of EMBEDDING_DIM buckets. They live in EMBEDDINGS_DIR as
+the buckets (buckets.i32) and weights (weights.f32) of every row's non-zero entries, one row after the other,
+where every row ends (ends.i64), the paper id of every row (ids.i64) and the document frequencies they were
+weighted with (stats.f64). EMBEDDINGS_DIR/current is a symlink to the live generation, so a rebuild can write a
+new one and swap it in atomically while web workers keep reading the old one through their memory maps.
+"""
+import fcntl
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+
+STOPWORDS = frozenset((
+    'a an and are as at be by can for from has have in into is it its of on or our that the their this to '
+    'we which with these those than then such via using use used based show shows paper propose proposed new '
+    'also both more most over under between while when where how what not only well'
+).split())
+
+# rows scored at once, bounds the temporary memory of a query to a few hundred bytes per row
+SCORE_CHUNK_ROWS = 8192
+
+
+def _tokens(text: str) -> list:
+    words = [word for word in re.findall(r'[a-z0-9]+', text.lower()) if word not in STOPWORDS and len(word) > 1]
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def paper_text(paper) -> str:
+    return ' '.join(filter(None, [paper.title, paper.title, paper.abstract, paper.summary]))
+
+
+def hashed_counts(text: str, dim: int) -> dict:
+    """
+    Hash the unigrams and bigrams of text into dim buckets. crc32 rather than hash() so every
+    process agrees, the sign bit halves the damage of collisions.
+    :return: bucket -> signed term frequency
+    """
+    buckets = Counter()
+    for token, count in Counter(_tokens(text)).items():
+        h = zlib.crc32(token.encode())
+        buckets[h % dim] += (1 + math.log(count)) * (1 if h & 0x80000000 else -1)
+    return buckets
+
+
+def weigh(buckets: dict, document_frequencies: np.ndarray, documents: float) -> tuple:
+    """
+    Turn hashed term frequencies into an L2-normalized TF-IDF vector
+    :return: The vector's non-zero buckets in order, and their weights
+    """
+    index = np.array(sorted(buckets), dtype=np.int32)
+    tf = np.array([buckets[bucket] for bucket in index.tolist()], dtype=np.float64)
+    weights = tf * (np.log((1 + documents) / (1 + document_frequencies[index])) + 1)
+    norm = np.linalg.norm(weights)
+    return index, (weights / norm if norm else weights).astype(np.float32)
+
+
+def densify(index: np.ndarray, weights: np.ndarray, dim: int) -> np.ndarray:
+    """
+    :return: The dense vector of a sparse one from weigh, as nearest takes it
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[index] = weights
+    return vector
+
+
+def _root() -> str:
+    return settings.EMBEDDINGS_DIR
+
+
+def _current() -> str:
+    return os.path.join(_root(), 'current')
+
+
+class _WriteLock:
+    """
+    Serializes writers (the scraper appending, a rebuild) across processes
+    """
+
+    def __enter__(self):
+        os.makedirs(_root(), exist_ok=True)
+        self.file = open(os.path.join(_root(), 'write.lock'), 'w')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _read_stats(generation: str, dim: int):
+    path = os.path.join(generation, 'stats.f64')
+    if not os.path.exists(path):
+        return np.zeros(dim, dtype=np.float64), 0.0
+    stats = np.fromfile(path, dtype=np.float64)
+    if len(stats) != dim + 1:
+        raise ValueError(f'The related papers index has {len(stats) - 1} buckets rather than EMBEDDING_DIM {dim}, '
+                         f'run rebuild_embeddings')
+    return stats[:-1], stats[-1]
+
+
+def _write_stats(generation: str, document_frequencies: np.ndarray, documents: float) -> None:
+    path = os.path.join(generation, 'stats.f64')
+    np.append(document_frequencies, documents).tofile(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def _new_generation() -> str:
+    generation = tempfile.mkdtemp(prefix=time.strftime('v%Y%m%d%H%M%S-'), dir=_root())
+    # readable by the web workers, which may run as a different user than the scraper
+    os.chmod(generation, 0o755)
+    return generation
+
+
+def _swap_current(generation: str) -> None:
+    link = _current() + '.tmp'
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.basename(generation), link)
+    os.replace(link, _current())
+
+
+def append_paper(paper, replace: bool = False) -> bool:
+    """
+    Add a newly ingested paper to the live index. Its vector is weighted with the document frequencies as
+    they are now, a rebuild re-weighs everything once the corpus has drifted.
+    :param paper: The ArxivPaper to add
+    :param replace: If the paper is already indexed, e.g. with the text of an older arxiv version or summary,
+    append a fresh row for it and blank the old ones rather than leaving it as it is
+    :return: True if the paper was added, False if it was already indexed and not replaced
+    """
+    return append_papers([paper], replace) == 1
+
+
+def append_papers(papers, replace: bool = False) -> int:
+    """
+    append_paper for many papers, reading the ids of the index once
+    :return: The number of papers added
+    """
+    dim = settings.EMBEDDING_DIM
+    with _WriteLock():
+        if not os.path.exists(_current()):
+            _swap_current(_new_generation())
+        generation = os.path.realpath(_current())
+        if os.path.exists(os.path.join(generation, 'vectors.f32')):
+            raise ValueError('The related papers index has dense vectors, run rebuild_embeddings')
+        ids, ends = _read_rows(generation)
+        indexed = set(np.intersect1d(ids, [paper.id for paper in papers]).tolist())
+        papers = [paper for paper in papers if replace or paper.id not in indexed]
+        if not papers:
+            return 0
+
+        document_frequencies, documents = _read_stats(generation, dim)
+        vectors = []
+        for paper in papers:
+            buckets = hashed_counts(paper_text(paper), dim)
+            if paper.id not in indexed:
+                # a replaced paper is counted already, its old terms stay counted until the next rebuild
+                for bucket in buckets:
+                    document_frequencies[bucket] += 1
+                documents += 1
+            vectors.append(buckets)
+        vectors = [weigh(buckets, document_frequencies, documents) for buckets in vectors]
+
+        # entries first, then where the rows end: readers only use rows which have an id
+        end = int(ends[-1]) if len(ends) else 0
+        with open(os.path.join(generation, 'buckets.i32'), 'ab') as f:
+            for index, _ in vectors:
+                f.write(index.tobytes())
+        with open(os.path.join(generation, 'weights.f32'), 'ab') as f:
+            for _, weights in vectors:
+                f.write(weights.tobytes())
+        with open(os.path.join(generation, 'ends.i64'), 'ab') as f:
+            f.write((end + np.cumsum([len(index) for index, _ in vectors], dtype=np.int64)).tobytes())
+        with open(os.path.join(generation, 'ids.i64'), 'ab') as f:
+            f.write(np.array([paper.id for paper in papers], dtype=np.int64).tobytes())
+        if indexed:
+            # zero weights match nothing, and vector_for reads the newest row of an id
+            with open(os.path.join(generation, 'weights.f32'), 'r+b') as f:
+                for row in np.flatnonzero(np.isin(ids, list(indexed))):
+                    start = int(ends[row - 1]) if row else 0
+                    f.seek(start * 4)
+                    f.write(bytes(4 * (int(ends[row]) - start)))
+        _write_stats(generation, document_frequencies, documents)
+    return len(papers)
+
+
+def _read_rows(generation: str) -> tuple:
+    """
+    Read the ids and row ends of a generation, dropping what an interrupted append wrote of rows without an id
+    :return: The ids and the ends of the complete rows
+    """
+    paths = {name: os.path.join(generation, name) for name in ('ids.i64', 'ends.i64', 'buckets.i32', 'weights.f32')}
+    if not os.path.exists(paths['ids.i64']):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ids = np.fromfile(paths['ids.i64'], dtype=np.int64)
+    ends = np.fromfile(paths['ends.i64'], dtype=np.int64)
+    rows = min(len(ids), len(ends))
+    ids, ends = ids[:rows], ends[:rows]
+    entries = int(ends[-1]) if rows else 0
+    for name, size in (('ids.i64', 8 * rows), ('ends.i64', 8 * rows), ('buckets.i32', 4 * entries),
+                       ('weights.f32', 4 * entries)):
+        if os.path.getsize(paths[name]) != size:
+            os.truncate(paths[name], size)
+    return ids, ends
+
+
+def rebuild(papers, stdout=None) -> int:
+    """
+    Build a new generation from scratch and make it the live index
+    :param papers: A callable returning an iterator over the ArxivPapers to index, called twice
+    :param stdout: Optional stream to write progress to
+    :return: The number of papers indexed
+    """
+    dim = settings.EMBEDDING_DIM
+    with _WriteLock():
+        # first pass: document frequencies over the whole corpus
+        document_frequencies = np.zeros(dim, dtype=np.float64)
+        documents = 0
+        for paper in papers():
+            for bucket in hashed_counts(paper_text(paper), dim):
+                document_frequencies[bucket] += 1
+            documents += 1
+        if stdout:
+            stdout.write(f'Counted terms of {documents} papers')
+
+        # second pass: the vectors themselves
+        generation = _new_generation()
+        end = 0
+        with open(os.path.join(generation, 'buckets.i32'), 'wb') as buckets, \
+                open(os.path.join(generation, 'weights.f32'), 'wb') as weights, \
+                open(os.path.join(generation, 'ends.i64'), 'wb') as ends, \
+                open(os.path.join(generation, 'ids.i64'), 'wb') as ids:
+            for n, paper in enumerate(papers(), 1):
+                index, vector = weigh(hashed_counts(paper_text(paper), dim), document_frequencies, documents)
+                buckets.write(index.tobytes())
+                weights.write(vector.tobytes())
+                end += len(index)
+                ends.write(np.int64(end).tobytes())
+                ids.write(np.int64(paper.id).tobytes())
+                if stdout and n % 10000 == 0:
+                    stdout.write(f'Embedded {n}/{documents} papers')
+        _write_stats(generation, document_frequencies, documents)
+
+        previous = os.path.realpath(_current()) if os.path.exists(_current()) else None
+        _swap_current(generation)
+    if previous and previous != os.path.realpath(generation):
+        # workers still mapping the old files keep them alive until they re-open the index
+        for name in os.listdir(previous):
+            os.unlink(os.path.join(previous, name))
+        os.rmdir(previous)
+    return documents
+
+
+class Rows(NamedTuple):
+    """
+    The rows of a generation, swapped as a whole so a query never mixes two generations
+    """
+    ids: np.ndarray
+    ends: np.ndarray
+    buckets: np.ndarray
+    weights: np.ndarray
+
+
+EMPTY_ROWS = Rows(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                  np.zeros(0, dtype=np.float32))
+
+
+class EmbeddingIndex:
+    """
+    Read-only, memory-mapped view of the live index. Picks up appended rows and swapped generations
+    at most every refresh_interval seconds.
+    """
+
+    def __init__(self, refresh_interval: float = 5.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._generation = None
+        self.rows = EMPTY_ROWS
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            if not os.path.exists(_current()):
+                return
+            generation = os.path.realpath(_current())
+            ids_path = os.path.join(generation, 'ids.i64')
+            ends_path = os.path.join(generation, 'ends.i64')
+            try:
+                # a generation with dense vectors has no row ends, it matches nothing until it is rebuilt
+                rows = min(os.path.getsize(ids_path), os.path.getsize(ends_path)) // 8
+            except FileNotFoundError:
+                return
+            if generation == self._generation and rows == len(self.rows.ids):
+                return
+            if not rows:
+                self.rows = EMPTY_ROWS
+            else:
+                ends = np.memmap(ends_path, dtype=np.int64, mode='r', shape=(rows,))
+                entries = int(ends[-1])
+                buckets, weights = EMPTY_ROWS.buckets, EMPTY_ROWS.weights
+                if entries:
+                    buckets = np.memmap(os.path.join(generation, 'buckets.i32'), dtype=np.int32, mode='r',
+                                        shape=(entries,))
+                    weights = np.memmap(os.path.join(generation, 'weights.f32'), dtype=np.float32, mode='r',
+                                        shape=(entries,))
+                self.rows = Rows(np.memmap(ids_path, dtype=np.int64, mode='r', shape=(rows,)), ends, buckets,
+                                 weights)
+            self._generation = generation
+
+    @staticmethod
+    def _scores(rows: Rows, vector: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """
+        Dot products of vector with the rows start to stop
+        """
+        first = int(rows.ends[start - 1]) if start else 0
+        ends = np.asarray(rows.ends[start:stop]) - first
+        starts = np.concatenate([[0], ends[:-1]])
+        products = rows.weights[first:first + ends[-1]] * vector[rows.buckets[first:first + ends[-1]]]
+        if not len(products):
+            return np.zeros(len(ends), dtype=np.float32)
+        # reduceat sums every row from its start to the next one's, an empty row would get the entry at its start
+        scores = np.add.reduceat(products, np.minimum(starts, len(products) - 1))
+        scores[starts == ends] = 0
+        return scores
+
+    def nearest(self, vector: np.ndarray, k: int, exclude=()) -> list:
+        """
+        :param vector: A normalized, dense query vector
+        :param k: The number of neighbours to return
+        :param exclude: Paper ids to leave out of the results
+        :return: (paper id, cosine similarity) pairs, most similar first
+        """
+        self._refresh()
+        rows = self.rows
+        ids = rows.ids
+        wanted = k + len(exclude)
+        best_ids = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(ids), SCORE_CHUNK_ROWS):
+            scores = self._scores(rows, vector, start, min(start + SCORE_CHUNK_ROWS, len(ids)))
+            if len(scores) > wanted:
+                top = np.argpartition(-scores, wanted)[:wanted]
+            else:
+                top = np.arange(len(scores))
+            best_ids = np.concatenate([best_ids, ids[start:start + SCORE_CHUNK_ROWS][top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+        order = np.argsort(-best_scores)
+        # replaced papers have blanked rows left over, which may still come up if too few rows score above zero
+        seen = set(exclude)
+        results = []
+        for i in order:
+            paper_id = int(best_ids[i])
+            if paper_id not in seen:
+                seen.add(paper_id)
+                results.append((paper_id, float(best_scores[i])))
+        return results[:k]
+
+    def vector_for(self, paper_id: int):
+        """
+        :return: The stored vector of a paper as a dense one, or None if it isn't indexed
+        """
+        self._refresh()
+        rows = self.rows
+        matches = np.flatnonzero(rows.ids == paper_id)
+        if not len(matches):
+            return None
+        row = matches[-1]
+        start, end = (int(rows.ends[row - 1]) if row else 0), int(rows.ends[row])
+        return densify(rows.buckets[start:end], rows.weights[start:end], settings.EMBEDDING_DIM)
+
+    def related(self, paper, k: int = 10) -> list:
+        """
+        :return: (paper id, cosine similarity) pairs of the k papers most similar to paper
+        """
+        vector = self.vector_for(paper.id)
+        if vector is None:
+            # not indexed yet, weigh it with the live document frequencies instead
+            try:
+                document_frequencies, documents = _read_stats(self._generation or _current(), settings.EMBEDDING_DIM)
+            except ValueError:
+                # EMBEDDING_DIM changed, nothing matches until the index is rebuilt
+                return []
+            vector = densify(*weigh(hashed_counts(paper_text(paper), settings.EMBEDDING_DIM), document_frequencies,
+                                    documents), settings.EMBEDDING_DIM)
+        return self.nearest(vector, k, exclude=(paper.id,))
+
+
+index = EmbeddingIndex()
@@ -0,0 +1,139 @@
+"""
+Pre-rendered RSS, Atom and JSON feeds of the newest papers, overall and per subject.
+
+The files are written to FEEDS_DIR (under MEDIA_ROOT) so the front web server serves them like any other media
+file, feed readers polling them never reach Django. They are regenerated after every scraped batch, only for the
+subjects the batch touched.
+"""
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, time, timezone
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import feedgenerator
+
+from . import subjects
+from .models import ArxivPaper, Author, Subject, SubjectPaper
+
+FORMATS = {
+    'rss': feedgenerator.Rss201rev2Feed,
+    'atom': feedgenerator.Atom1Feed,
+}
+
+
+def feed_path(name: str, extension: str) -> str:
+    return os.path.join(settings.FEEDS_DIR, f'{name}.{extension}')
+
+
+def feed_url(name: str, extension: str) -> str:
+    media_url = settings.MEDIA_URL if settings.MEDIA_URL.startswith('/') else '/' + settings.MEDIA_URL
+    feeds_path = os.path.relpath(settings.FEEDS_DIR, settings.MEDIA_ROOT).replace(os.sep, '/')
+    return f'{settings.DOMAIN_URL}{media_url}{feeds_path}/{name}.{extension}'
+
+
+def subject_feed_name(short_name: str) -> str:
+    return 'subjects/' + re.sub(r'[^A-Za-z0-9._-]', '_', short_name)
+
+
+def write_atomically(path: str, content: bytes) -> bool:
+    """
+    Replace a file in one rename, so the web server never serves a half written feed.
+    Unchanged files are left alone, which keeps their mtime and ETag for conditional requests.
+    :return: True if the file was written
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return True
+
+
+def _papers(paper_ids):
+    papers = ArxivPaper.objects.filter(id__in=paper_ids).select_related('primary_subject').only(
+        'id', 'arxiv_id', 'title', 'abstract', 'summary', 'publication_date', 'primary_subject__short_name'
+    ).prefetch_related(Prefetch('authors', queryset=Author.objects.only('id', 'name')))
+    return sorted(papers, key=lambda paper: paper_ids.index(paper.id))
+
+
+def render_feeds(name: str, title: str, papers) -> dict:
+    """
+    :return: extension -> rendered feed
+    """
+    link = settings.DOMAIN_URL + '/'
+    description = 'A daily summary of the latest arxiv papers.'
+    feeds = {
+        extension: generator(title=title, link=link, description=description, language='en',
+                             feed_url=feed_url(name, extension))
+        for extension, generator in FORMATS.items()
+    }
+    items = []
+    for paper in papers:
+        authors = [author.name for author in paper.authors.all()]
+        published = datetime.combine(paper.publication_date, time.min, tzinfo=timezone.utc)
+        categories = [paper.primary_subject.short_name] if paper.primary_subject else []
+        for feed in feeds.values():
+            feed.add_item(title=paper.title, link=paper.abstract_link(), description=paper.summary,
+                          unique_id=paper.abstract_link(), pubdate=published,
+                          author_name=', '.join(authors) or None, categories=categories)
+        items.append({
+            'id': paper.abstract_link(),
+            'url': paper.abstract_link(),
+            'title': paper.title,
+            'summary': paper.summary,
+            'content_text': paper.abstract,
+            'date_published': published.isoformat(),
+            'authors': [{'name': author} for author in authors],
+            'tags': categories,
+        })
+
+    rendered = {extension: feed.writeString('utf-8').encode() for extension, feed in feeds.items()}
+    rendered['json'] = json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': title,
+        'home_page_url': link,
+        'feed_url': feed_url(name, 'json'),
+        'description': description,
+        'items': items,
+    }, ensure_ascii=False).encode()
+    return rendered
+
+
+def write_feeds(name: str, title: str, paper_ids) -> int:
+    """
+    Render and write every format of a feed
+    :return: The number of files which changed
+    """
+    rendered = render_feeds(name, title, _papers(list(paper_ids)))
+    return sum(write_atomically(feed_path(name, extension), content) for extension, content in rendered.items())
+
+
+def regenerate(subject_ids=None) -> int:
+    """
+    Regenerate the feed of all papers and the feeds of the given subjects
+    :param subject_ids: The subjects to regenerate, None for every subject with papers
+    :return: The number of files which changed
+    """
+    size = settings.FEED_SIZE
+    newest = ArxivPaper.objects.order_by('-publication_date', '-id').values_list('id', flat=True)[:size]
+    written = write_feeds('all', 'papers.day', newest)
+
+    if subject_ids is None:
+        subject_ids = SubjectPaper.objects.values_list('subject_id', flat=True).distinct()
+    for subject in Subject.objects.filter(id__in=list(subject_ids)):
+        paper_ids = subjects.newest_paper_ids([subject.id], 0, size)
+        written += write_feeds(subject_feed_name(subject.short_name), f'papers.day: {subject.full_name}', paper_ids)
+    return written
@@ -0,0 +1,31 @@
+from django.db import connections
+
+# text search configuration used by both the index and the queries, they have to match for the index to be used
+SEARCH_CONFIG = 'english'
+INDEX_NAME = 'backend_arxivpaper_fts_idx'
+
+
+def is_available(using: str = 'default') -> bool:
+    """
+    Full text search needs PostgreSQL, other databases fall back to prefix and exact matches
+    """
+    return connections[using].vendor == 'postgresql'
+
+
+def search_vector():
+    """
+    The tsvector over title and abstract, as indexed by migration 0015
+    """
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('title', 'abstract', config=SEARCH_CONFIG)
+
+
+def full_text_filter(queryset, text: str):
+    """
+    Filter an ArxivPaper queryset to papers whose title or abstract match every word of text
+    :param queryset: The queryset to filter
+    :param text: The search text, stemmed and combined like a plain search engine query
+    :return: The filtered queryset
+    """
+    from django.contrib.postgres.search import SearchQuery
+    return queryset.alias(fts=search_vector()).filter(fts=SearchQuery(text, config=SEARCH_CONFIG))
@@ -0,0 +1,95 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import feeds, media, subjects
+from .models import ArxivPaper
+from .ranking import paper_hot_score
+
+# bumped whenever a paper is ingested, caches of rendered pages include it in their keys
+CONTENT_VERSION_KEY = 'ingest:version'
+
+
+def content_version() -> int:
+    """
+    :return: A number which changes every time a paper is ingested
+    """
+    return cache.get_or_set(CONTENT_VERSION_KEY, time.time_ns, None)
+
+
+def bump_content_version() -> None:
+    """
+    Called whenever papers change in a way cached pages show, so caches keyed on content_version start over
+    """
+    cache.set(CONTENT_VERSION_KEY, time.time_ns(), None)
+
+
+def paper_ingested(paper) -> None:
+    """
+    Called by the scraper once a paper and everything linked to it has been saved.
+    Failures here are logged and never undo the ingest, every step can be rebuilt from the database.
+    :param paper: The saved ArxivPaper
+    :return: None
+    """
+    _reindex(paper, replace=False)
+
+
+def paper_updated(paper) -> None:
+    """
+    Called by the scraper after updating a paper to a newer arxiv version. Its subjects, publication date and
+    text may have changed. Failures are logged like paper_ingested's.
+    :param paper: The saved ArxivPaper
+    :return: None
+    """
+    _reindex(paper, replace=True)
+
+
+def _reindex(paper, replace: bool) -> None:
+    try:
+        paper.hot_score = paper_hot_score(paper)
+        ArxivPaper.objects.filter(pk=paper.pk).update(hot_score=paper.hot_score)
+    except Exception as e:
+        print(f'[{paper.arxiv_id}] Error occurred while updating the hot score: {e}')
+    try:
+        subjects.index_paper(paper)
+    except Exception as e:
+        print(f'[{paper.arxiv_id}] Error occurred while adding paper to the subject index: {e}')
+    try:
+        bump_content_version()
+    except Exception as e:
+        print(f'[{paper.arxiv_id}] Error occurred while bumping the content version: {e}')
+
+    try:
+        # imported here so the scraper only loads numpy once it has a paper to index
+        from . import embeddings
+        embeddings.append_paper(paper, replace=replace)
+    except Exception as e:
+        print(f'[{paper.arxiv_id}] Error occurred while adding paper to the related papers index: {e}')
+
+
+def batch_ingested(papers) -> None:
+    """
+    Called by the scraper after a batch of papers, for the work worth doing once per batch rather than per paper
+    :param papers: The ArxivPapers ingested in the batch, may be empty
+    :return: None
+    """
+    if settings.MEDIA_GC_AFTER_INGEST:
+        # papers which failed halfway may have left files behind even when none was ingested
+        try:
+            stats = media.collect_garbage(delete=True, min_age=settings.MEDIA_GC_MIN_AGE)
+            if stats['deleted']:
+                print(f'Deleted {stats["deleted"]} orphaned media files ({stats["orphan_bytes"] / 1e6:.1f} MB)')
+        except Exception as e:
+            print(f'Error occurred while deleting orphaned media files: {e}')
+    if not papers:
+        return
+    subject_ids = set()
+    for paper in papers:
+        subject_ids.update(paper.subjects.values_list('id', flat=True))
+        if paper.primary_subject_id:
+            subject_ids.add(paper.primary_subject_id)
+    try:
+        feeds.regenerate(subject_ids)
+    except Exception as e:
+        print(f'Error occurred while regenerating feeds: {e}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from backend import corpus
+
+
+class Command(BaseCommand):
+    help = ('Export papers, authors, subjects, images, sources and media files to a directory of gzipped JSON lines '
+            'files, for import_corpus on another database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to write the export to')
+        parser.add_argument('--since',
+                            help='Only export rows modified since this ISO datetime, or since the watermark of '
+                                 'a previous export when given its directory')
+        parser.add_argument('--chunk_size', type=int, default=5000, help='Records per file')
+        parser.add_argument('--batch_size', type=int, default=1000, help='Rows loaded from the database at a time')
+        parser.add_argument('--no_media', action='store_true', help='Reference media files by path without copying them')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                try:
+                    since = corpus.read_manifest(options['since'])['watermark']
+                except ValueError as e:
+                    raise CommandError(f'--since is neither a datetime nor a previous export: {e}')
+
+        manifest = corpus.export_corpus(options['directory'], since=since, chunk_size=options['chunk_size'],
+                                        batch_size=options['batch_size'], media=not options['no_media'],
+                                        stdout=self.stdout)
+        counts = ', '.join(f'{count} {kind}' for kind, count in manifest['counts'].items())
+        self.stdout.write(self.style.SUCCESS(f'Exported {counts}, next incremental export: '
+                                             f'--since {manifest["watermark"].isoformat()}'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from backend import papertext
+from backend.models import ArxivPaper
+
+
+class Command(BaseCommand):
+    help = ('Extract the text of every paper which has none yet from its pdf or TeX sources and add it to the body '
+            'text search index. Run it after the scraper; safe to interrupt, a second run continues where it stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=50, help='Papers extracted and saved at a time')
+        parser.add_argument('--workers', type=int, default=2, help='Extraction processes')
+        parser.add_argument('--max_read_mb', type=float, default=20,
+                            help='Read at most this many MB of pdfs a second on average, 0 for no limit')
+        parser.add_argument('--limit', type=int, default=None, help='Extract at most this many papers')
+
+    def handle(self, *args, **options):
+        pending = ArxivPaper.objects.filter(text__isnull=True).count()
+        self.stdout.write(f'{pending} papers have no text yet')
+        if not pending:
+            return
+
+        stats = papertext.backfill(batch_size=options['batch_size'], workers=options['workers'],
+                                   max_read_mb=options['max_read_mb'] or None, limit=options['limit'],
+                                   stdout=self.stdout)
+        if stats['locked']:
+            self.stdout.write(self.style.WARNING('Another extract_paper_text is running, nothing to do'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Extracted {stats["extracted"]} papers, {stats["empty"]} without text, '
+                                             f'{stats["read_mb"]:.0f} MB read'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from backend import media
+
+
+class Command(BaseCommand):
+    help = ('List the files in MEDIA_ROOT which no paper or image references, and the references to missing files. '
+            'Nothing is deleted without --delete.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete the orphaned files')
+        parser.add_argument('--min_age', type=int, default=3600,
+                            help='Leave files modified less than this many seconds ago alone')
+        parser.add_argument('--quiet', action='store_true', help="Don't list every file, only the totals")
+
+    def handle(self, *args, **options):
+        stats = media.collect_garbage(delete=options['delete'], min_age=options['min_age'],
+                                      stdout=None if options['quiet'] else self.stdout)
+        message = f'{stats["orphans"]} orphaned files ({stats["orphan_bytes"] / 1e6:.1f} MB)'
+        if options['delete']:
+            message += f', {stats["deleted"]} deleted'
+        message += f', {stats["missing"]} referenced files missing'
+        self.stdout.write(self.style.SUCCESS(message))
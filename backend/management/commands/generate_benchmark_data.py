@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.benchmarks.data import clear_benchmark_data, generate_benchmark_data
+
+
+class Command(BaseCommand):
+    help = 'Populate the database with a synthetic paper corpus for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--num_papers', type=int, default=10000, help='Number of papers to generate')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same corpus')
+        parser.add_argument('--batch_size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--clear', action='store_true', help='Only delete previously generated data')
+
+    def handle(self, *args, **options):
+        if settings.SERVER_TYPE == 'production':
+            raise CommandError('Refusing to generate benchmark data on a production server')
+
+        clear_benchmark_data()
+        if options['clear']:
+            self.stdout.write('Cleared benchmark data')
+            return
+        generate_benchmark_data(options['num_papers'], seed=options['seed'], batch_size=options['batch_size'],
+                                stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Generated {options["num_papers"]} papers'))
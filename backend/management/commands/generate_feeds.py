@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import feeds
+from backend.models import Subject
+
+
+class Command(BaseCommand):
+    help = ('Write the RSS, Atom and JSON feeds of all papers and of every subject to FEEDS_DIR. '
+            'The scraper regenerates the feeds it touches after every batch, this is for the first run and repairs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--subject', action='append', default=[],
+                            help='Only regenerate the feed of this subject (and of all papers), may be repeated')
+
+    def handle(self, *args, **options):
+        subject_ids = None
+        if options['subject']:
+            found = dict(Subject.objects.filter(short_name__in=options['subject']).values_list('short_name', 'id'))
+            unknown = set(options['subject']) - set(found)
+            if unknown:
+                raise CommandError(f'Unknown subjects: {", ".join(sorted(unknown))}')
+            subject_ids = list(found.values())
+        written = feeds.regenerate(subject_ids)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} feed files'))
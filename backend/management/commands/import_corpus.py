@@ -0,0 +1,30 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import corpus, subjects
+
+
+class Command(BaseCommand):
+    help = ('Import a directory written by export_corpus. Existing papers, authors and subjects are matched by '
+            'arxiv id, name and short name and updated, so incremental exports can be applied in order.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory of the export')
+        parser.add_argument('--batch_size', type=int, default=1000, help='Records per bulk insert')
+        parser.add_argument('--skip_derived', action='store_true',
+                            help="Don't rebuild the subject index, author stats and hot scores afterwards")
+
+    def handle(self, *args, **options):
+        try:
+            corpus.import_corpus(options['directory'], batch_size=options['batch_size'], stdout=self.stdout)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not options['skip_derived']:
+            # bulk inserts skip the ingest hooks, so redo what they maintain
+            subjects.rebuild_index()
+            call_command('rebuild_author_stats', batch_size=options['batch_size'], stdout=self.stdout)
+            call_command('update_hot_scores', all=True, stdout=self.stdout)
+            self.stdout.write('Run rebuild_embeddings, generate_feeds and extract_paper_text to update the related '
+                              'papers, feeds and body text index')
+        self.stdout.write(self.style.SUCCESS('Import finished'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from backend.models import PaperImage
+from scraper.images import normalize_stored_images
+
+
+class Command(BaseCommand):
+    help = ('Normalize the paper images stored before the scraper normalized them at ingest: rescale, re-encode and '
+            'strip them, and delete the ones which can\'t be decoded. Images whose file is missing are left alone. '
+            'Safe to interrupt and run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=100, help='Images normalized and saved at a time')
+        parser.add_argument('--limit', type=int, default=None, help='Normalize at most this many images')
+
+    def handle(self, *args, **options):
+        pending = PaperImage.objects.filter(bytes=0).count()
+        self.stdout.write(f'{pending} images need normalizing')
+        if not pending:
+            return
+
+        stats = normalize_stored_images(batch_size=options['batch_size'], limit=options['limit'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Normalized {stats["normalized"]} images, deleted {stats["deleted"]}, '
+                                             f'{stats["missing"]} missing, saved {stats["saved_bytes"] / 1e6:.1f} MB'))
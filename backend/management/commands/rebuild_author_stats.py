@@ -0,0 +1,61 @@
+from collections import Counter
+from itertools import groupby, permutations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from backend.authors import COAUTHOR_MAX_AUTHORS, add_coauthorships
+from backend.models import ArxivPaper, Author, CoAuthorship
+from backend.names import initials_key, normalize_author_name
+
+FIELDS = ['normalized_name', 'name_initials', 'paper_count', 'latest_paper_date']
+
+
+class Command(BaseCommand):
+    help = ('Recompute normalized names, paper counts, latest paper dates and co-authorships of every author. '
+            'The scraper keeps them up to date, this backfills them or repairs them after manual edits.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch_size', type=int, default=2000, help='Rows per bulk update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        through = ArxivPaper.authors.through
+
+        stats = {row['author_id']: row for row in through.objects.values('author_id').annotate(
+            paper_count=Count('arxivpaper_id'), latest_paper_date=Max('arxivpaper__publication_date'))}
+        batch = []
+        updated = 0
+        for author in Author.objects.only('id', 'name', *FIELDS).order_by('id').iterator(chunk_size=batch_size):
+            row = stats.get(author.id, {})
+            key = normalize_author_name(author.name)
+            values = (key, initials_key(key), row.get('paper_count', 0), row.get('latest_paper_date'))
+            if values != (author.normalized_name, author.name_initials, author.paper_count,
+                          author.latest_paper_date):
+                author.normalized_name, author.name_initials, author.paper_count, author.latest_paper_date = values
+                batch.append(author)
+            if len(batch) >= batch_size:
+                Author.objects.bulk_update(batch, FIELDS)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Author.objects.bulk_update(batch, FIELDS)
+            updated += len(batch)
+        self.stdout.write(f'Updated {updated} authors')
+
+        with transaction.atomic():
+            CoAuthorship.objects.all().delete()
+            links = through.objects.order_by('arxivpaper_id', 'id').values_list('arxivpaper_id', 'author_id')
+            pairs = Counter()
+            papers = 0
+            for _, rows in groupby(links.iterator(chunk_size=batch_size), key=lambda row: row[0]):
+                author_ids = [author_id for _, author_id in rows]
+                if len(author_ids) <= COAUTHOR_MAX_AUTHORS:
+                    pairs.update(permutations(author_ids, 2))
+                papers += 1
+                if len(pairs) >= batch_size * 10:
+                    add_coauthorships(pairs)
+                    pairs = Counter()
+            add_coauthorships(pairs)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt co-authorships of {papers} papers'))
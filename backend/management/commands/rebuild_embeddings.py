@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend import embeddings
+from backend.models import ArxivPaper
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the related papers index from every paper in the database'
+
+    def handle(self, *args, **options):
+        def papers():
+            return ArxivPaper.objects.only('id', 'title', 'abstract', 'summary').order_by('id').iterator(chunk_size=2000)
+
+        count = embeddings.rebuild(papers, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} papers'))
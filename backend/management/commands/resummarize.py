@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper import upstreams
+from scraper.summaries import PROMPTS, papers_to_summarize, resummarize
+
+
+class Command(BaseCommand):
+    help = ('Summarize every paper the given model and prompt haven\'t summarized yet, without scraping it again. '
+            'Safe to interrupt: a second run continues with the papers that are left.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=None, help='The OpenAI chat model, SUMMARY_MODEL by default')
+        parser.add_argument('--prompt', default=None, choices=sorted(PROMPTS),
+                            help='The prompt version, SUMMARY_PROMPT by default')
+        parser.add_argument('--variant', action='store_true',
+                            help='Store the summaries next to the current ones (PaperSummary) instead of replacing them')
+        parser.add_argument('--batch_size', type=int, default=100, help='Papers loaded and saved at a time')
+        parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once')
+        parser.add_argument('--token_budget', type=int, default=None, help='Stop after using this many tokens')
+        parser.add_argument('--tokens_per_minute', type=int, default=None, help='Pace requests to this many tokens a minute')
+        parser.add_argument('--limit', type=int, default=None, help='Summarize at most this many papers')
+        parser.add_argument('--dry_run', action='store_true', help='Only count the papers which need a summary')
+
+    def handle(self, *args, **options):
+        model = options['model'] or settings.SUMMARY_MODEL
+        prompt = options['prompt'] or settings.SUMMARY_PROMPT
+        if prompt not in PROMPTS:
+            raise CommandError(f'Unknown prompt {prompt}, expected one of {", ".join(sorted(PROMPTS))}')
+
+        pending = papers_to_summarize(model, prompt, options['variant']).count()
+        self.stdout.write(f'{pending} papers need a summary by {model} with prompt {prompt}')
+        if options['dry_run'] or not pending:
+            return
+
+        stats = resummarize(model, prompt, variant=options['variant'], batch_size=options['batch_size'],
+                            concurrency=options['concurrency'], token_budget=options['token_budget'],
+                            tokens_per_minute=options['tokens_per_minute'], limit=options['limit'],
+                            stdout=self.stdout)
+        message = f'Summarized {stats["summarized"]} papers with {stats["tokens"]} tokens, {stats["failed"]} failed'
+        if stats['budget_exhausted']:
+            message += ', stopped at the token budget'
+        for line in upstreams.summary():
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,88 @@
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from backend.benchmarks.scenarios import api_scenarios, run_scenario, scrape_scenarios, startup_scenarios
+from backend.models import ArxivPaper, Author
+
+
+class Command(BaseCommand):
+    help = 'Run timed benchmark scenarios and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-g', '--group', action='append', choices=['api', 'scrape', 'startup'],
+                            help='Only run the given scenario group (can be repeated)')
+        parser.add_argument('-r', '--repeat', type=int, default=10, help='Timed runs per scenario')
+        parser.add_argument('-o', '--output', type=str, help='Write results to this JSON file')
+        parser.add_argument('-c', '--compare', type=str, help='A previous results file to compare against')
+        parser.add_argument('-q', '--search', action='append',
+                            help='Search terms for the api search scenarios (can be repeated)')
+
+    def handle(self, *args, **options):
+        if settings.SERVER_TYPE == 'production':
+            raise CommandError('Refusing to run benchmarks on a production server')
+
+        groups = options['group'] or ['api', 'scrape', 'startup']
+        scenarios = []
+        if 'api' in groups:
+            search_terms = options['search'] or ['transformer', 'mixture experts', 'Smith', 'zzznomatch']
+            scenarios += api_scenarios(search_terms)
+        if 'scrape' in groups:
+            scenarios += scrape_scenarios()
+        if 'startup' in groups:
+            scenarios += startup_scenarios()
+
+        results = []
+        for scenario in scenarios:
+            result = run_scenario(scenario, options['repeat'])
+            results.append(result)
+            self.stdout.write(f'{result["group"]:>7} {result["name"]:<32} median {result["median_ms"]:>10.2f}ms  '
+                              f'p95 {result["p95_ms"]:>10.2f}ms  {result["queries"]:>4} queries')
+
+        report = {'meta': self.metadata(), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Wrote {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), report)
+
+    def metadata(self) -> dict:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                    cwd=settings.BASE_DIR).stdout.strip()
+        except OSError:
+            commit = None
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+            'papers': ArxivPaper.objects.count(),
+            'authors': Author.objects.count(),
+        }
+
+    def compare(self, baseline: dict, report: dict) -> None:
+        """
+        Print the median change of every scenario that appears in both reports
+        """
+        before = {(r['group'], r['name']): r for r in baseline['results']}
+        self.stdout.write(f'\nCompared to {baseline["meta"].get("commit")}:')
+        for result in report['results']:
+            old = before.get((result['group'], result['name']))
+            if not old:
+                continue
+            change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+            style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+            self.stdout.write(style(f'{result["group"]:>7} {result["name"]:<32} {old["median_ms"]:>10.2f}ms -> '
+                                    f'{result["median_ms"]:>10.2f}ms ({change:+.1f}%)'))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from backend.models import ArxivPaper
+from backend.ranking import paper_hot_score
+
+
+class Command(BaseCommand):
+    help = 'Recompute the hot feed score of papers whose ranking inputs changed, run periodically from cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since_hours', type=float, default=25,
+                            help='Recompute papers modified in this many hours, a little more than the cron interval')
+        parser.add_argument('--all', action='store_true', help='Recompute every paper, e.g. after changing weights')
+        parser.add_argument('--batch_size', type=int, default=2000, help='Rows per bulk update')
+
+    def handle(self, *args, **options):
+        papers = ArxivPaper.objects.select_related('counter')
+        if not options['all']:
+            since = timezone.now() - timedelta(hours=options['since_hours'])
+            papers = papers.filter(Q(modified_at__gte=since) | Q(counter__modified_at__gte=since))
+        papers = papers.only('id', 'publication_date', 'citations', 'total_author_citations', 'hot_score',
+                             'counter__clicks')
+
+        batch = []
+        updated = 0
+        for paper in papers.order_by('id').iterator(chunk_size=options['batch_size']):
+            score = paper_hot_score(paper)
+            if score != paper.hot_score:
+                paper.hot_score = score
+                batch.append(paper)
+            if len(batch) >= options['batch_size']:
+                ArxivPaper.objects.bulk_update(batch, ['hot_score'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            ArxivPaper.objects.bulk_update(batch, ['hot_score'])
+            updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} hot scores'))
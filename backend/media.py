@@ -0,0 +1,141 @@
+"""
+Garbage collection of uploaded media. The files under each directory a FileField uploads to and the names the
+database references there are both streamed in sorted order and merged like two sorted lists, so finding the
+orphans of any number of papers takes constant memory.
+"""
+import heapq
+import os
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+
+from .models import ArxivPaper, PaperImage
+
+# models and fields whose files live in MEDIA_ROOT
+FILE_FIELDS = [
+    (ArxivPaper, 'pdf'),
+    (ArxivPaper, 'screenshot'),
+    (ArxivPaper, 'source_tar'),
+    (PaperImage, 'image'),
+]
+
+# sorts names byte-wise, the way Python sorts the paths on disk, whatever the database's default collation is
+BINARY_COLLATIONS = {'postgresql': 'C', 'sqlite': 'BINARY'}
+
+
+def upload_dirs() -> list:
+    return sorted({model._meta.get_field(field).upload_to for model, field in FILE_FIELDS})
+
+
+def stored_files(directory: str):
+    """
+    :param directory: A directory relative to MEDIA_ROOT
+    :return: A generator of (name relative to MEDIA_ROOT, full path) of every file below it, sorted by name
+    """
+    try:
+        entries = list(os.scandir(os.path.join(settings.MEDIA_ROOT, directory)))
+    except FileNotFoundError:
+        return
+    # a directory's files all start with its name and a slash, so that is where they sort between its siblings
+    entries.sort(key=lambda entry: entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name)
+    for entry in entries:
+        name = f'{directory}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from stored_files(name)
+        else:
+            yield name, entry.path
+
+
+def referenced_files(directory: str):
+    """
+    :param directory: A directory relative to MEDIA_ROOT
+    :return: A generator of the distinct names of files below it which the database references, sorted
+    """
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    streams = []
+    for model, field in FILE_FIELDS:
+        names = model.objects.filter(**{f'{field}__startswith': directory + '/'})
+        if collation:
+            names = names.order_by(Collate(F(field), collation))
+        else:
+            names = names.order_by(field)
+        streams.append(names.values_list(field, flat=True).iterator(chunk_size=5000))
+    previous = None
+    for name in heapq.merge(*streams):
+        if name != previous:
+            yield name
+        previous = name
+
+
+def diff(stored, referenced):
+    """
+    Merge the sorted streams of stored_files and referenced_files
+    :return: A generator of (name, path) of files nothing references (path is None for referenced files
+    which are missing)
+    """
+    referenced = iter(referenced)
+    wanted = next(referenced, None)
+    for name, path in stored:
+        while wanted is not None and wanted < name:
+            yield wanted, None
+            wanted = next(referenced, None)
+        if wanted == name:
+            wanted = next(referenced, None)
+        else:
+            yield name, path
+    while wanted is not None:
+        yield wanted, None
+        wanted = next(referenced, None)
+
+
+def collect_garbage(delete: bool = False, min_age: int = 3600, stdout=None) -> dict:
+    """
+    Find the files in MEDIA_ROOT which no paper or image references, and the references to missing files
+    :param delete: Delete the orphaned files, else only count them
+    :param min_age: Skip files modified less than this many seconds ago, the scraper saves a paper's files before
+    the paper itself
+    :param stdout: Optional stream to list the orphaned and missing files on
+    :return: The numbers of orphaned files, their bytes, how many were deleted, and the missing files
+    """
+    stats = {'orphans': 0, 'orphan_bytes': 0, 'deleted': 0, 'missing': 0}
+    cutoff = time.time() - min_age
+    for directory in upload_dirs():
+        for name, path in diff(stored_files(directory), referenced_files(directory)):
+            if path is None:
+                stats['missing'] += 1
+                if stdout:
+                    stdout.write(f'Missing: {name}')
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            stats['orphans'] += 1
+            stats['orphan_bytes'] += stat.st_size
+            if stdout:
+                stdout.write(f'Orphan: {name} ({stat.st_size} bytes)')
+            if delete:
+                try:
+                    os.remove(path)
+                    stats['deleted'] += 1
+                except FileNotFoundError:
+                    pass
+    return stats
+
+
+def delete_paper(paper) -> None:
+    """
+    Delete a paper along with the files of it and its images, deleting the rows alone leaves the files behind
+    :param paper: The ArxivPaper
+    :return: None
+    """
+    for image in PaperImage.objects.filter(paper=paper):
+        image.image.delete(save=False)
+    for field in ('pdf', 'screenshot', 'source_tar'):
+        getattr(paper, field).delete(save=False)
+    paper.delete()
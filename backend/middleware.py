@@ -0,0 +1,210 @@
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# the most queries we keep around per request for slow request logging
+MAX_LOGGED_QUERIES = 200
+
+
+class RequestStats:
+    """
+    Per-process aggregate of request timings, keyed by URL name.
+    Each uWSGI worker keeps its own copy, so numbers are for the worker that serves the stats request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.started_at = time.time()
+
+    def record(self, view_name: str, sql_count: int, sql_time: float, total_time: float, response_size: int) -> None:
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = {
+                    'requests': 0,
+                    'sql_count': 0,
+                    'sql_time': 0.0,
+                    'total_time': 0.0,
+                    'max_time': 0.0,
+                    'response_size': 0,
+                }
+            stats['requests'] += 1
+            stats['sql_count'] += sql_count
+            stats['sql_time'] += sql_time
+            stats['total_time'] += total_time
+            stats['max_time'] = max(stats['max_time'], total_time)
+            stats['response_size'] += response_size
+
+    def snapshot(self) -> dict:
+        """
+        :return: the aggregated stats with per-request averages, times in milliseconds
+        """
+        with self._lock:
+            views = {name: dict(stats) for name, stats in self._views.items()}
+        result = {}
+        for name, stats in sorted(views.items()):
+            requests = stats['requests']
+            result[name] = {
+                'requests': requests,
+                'avg_sql_count': stats['sql_count'] / requests,
+                'avg_sql_ms': stats['sql_time'] * 1000 / requests,
+                'avg_total_ms': stats['total_time'] * 1000 / requests,
+                'max_total_ms': stats['max_time'] * 1000,
+                'avg_response_bytes': stats['response_size'] / requests,
+            }
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._views = {}
+            self.started_at = time.time()
+
+
+request_stats = RequestStats()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper which counts and times every query run on a connection
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.time += duration
+            if len(self.queries) < MAX_LOGGED_QUERIES:
+                self.queries.append((duration, sql))
+
+
+class QueryStatsMiddleware:
+    """
+    Records SQL count, SQL time, total time and response size for a sample of requests.
+    Requests slower than QUERY_STATS_SLOW_MS are logged, the sampled ones along with the queries they ran.
+    Works for sync and async views alike.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.QUERY_STATS_SAMPLE_RATE:
+            start = time.perf_counter()
+            response = self.get_response(request)
+            self.log_if_slow(request, time.perf_counter() - start)
+            return response
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.record_queries(recorder):
+            response = self.get_response(request)
+        self.finish(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.QUERY_STATS_SAMPLE_RATE:
+            start = time.perf_counter()
+            response = await self.get_response(request)
+            self.log_if_slow(request, time.perf_counter() - start)
+            return response
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        # the async ORM runs queries on the request's thread sensitive executor, which has its own connections
+        stack = await sync_to_async(self.record_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.finish(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def record_queries(recorder: QueryRecorder) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    @staticmethod
+    def finish(request, response, recorder: QueryRecorder, total_time: float) -> None:
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        response_size = 0 if response.streaming else len(response.content)
+        request_stats.record(view_name, recorder.count, recorder.time, total_time, response_size)
+
+        if total_time * 1000 >= settings.QUERY_STATS_SLOW_MS:
+            queries = '\n'.join(f'  {duration * 1000:.1f}ms {sql}' for duration, sql in recorder.queries)
+            logger.warning(f'Slow request: {request.method} {request.get_full_path()} [{view_name}] '
+                           f'{total_time * 1000:.0f}ms, {recorder.count} queries in {recorder.time * 1000:.0f}ms, '
+                           f'{response_size} bytes\n{queries}')
+
+    @staticmethod
+    def log_if_slow(request, total_time: float) -> None:
+        # requests outside the sample only know their total time
+        if total_time * 1000 >= settings.QUERY_STATS_SLOW_MS:
+            logger.warning(f'Slow request: {request.method} {request.get_full_path()} {total_time * 1000:.0f}ms')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses JSON responses with brotli when the client accepts it and the brotli package is installed,
+    falling back to Django's gzip handling otherwise. Anything else, HTML with CSRF tokens in particular, is left
+    to GZipMiddleware, which pads it against BREACH.
+    """
+    accepts_br = re.compile(r'\bbr\b')
+
+    def process_response(self, request, response):
+        if brotli is None or not self.accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return super().process_response(request, response)
+
+        # streaming responses are left to gzip, which can compress them incrementally
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return super().process_response(request, response)
+        # same conditions as GZipMiddleware: not worth compressing tiny or already encoded responses
+        if len(response.content) < 200 or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
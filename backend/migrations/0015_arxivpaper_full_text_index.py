@@ -0,0 +1,34 @@
+from django.db import migrations
+
+SEARCH_CONFIG = 'english'
+INDEX_NAME = 'backend_arxivpaper_fts_idx'
+
+
+def full_text_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('title', 'abstract', config=SEARCH_CONFIG), name=INDEX_NAME)
+
+
+def create_index(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL, the local SQLite setup simply goes without
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('backend', 'ArxivPaper'), full_text_index())
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('backend', 'ArxivPaper'), full_text_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_arxivpaper_citations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.5 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_arxivpaper_full_text_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='arxivpaper',
+            index=models.Index(fields=['-hot_score', '-id'], name='arxivpaper_hot_idx'),
+        ),
+    ]
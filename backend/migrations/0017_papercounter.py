@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-19 14:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_arxivpaper_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaperCounter',
+            fields=[
+                ('paper', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='backend.arxivpaper')),
+                ('modified_at', models.DateTimeField(db_index=True)),
+                ('views', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.0.5 on 2026-10-19 14:54
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalize_author_name(name):
+    # frozen copy of backend.names.normalize_author_name as of this migration, "surname initial"
+    folded = unicodedata.normalize('NFKD', name)
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+    parts = [part for part in re.split(r'[^\w\-]+', folded) if part.strip('-_')]
+    while len(parts) > 1 and parts[-1] in ('jr', 'sr', 'ii', 'iii', 'iv', 'phd'):
+        parts.pop()
+    if not parts:
+        return ' '.join(name.casefold().split())[:255]
+    if len(parts) == 1:
+        return parts[0][:255]
+    return f'{parts[-1]} {parts[0][0]}'[:255]
+
+
+def backfill_normalized_names(apps, schema_editor):
+    # only the lookup key, paper counts and co-authors are filled by rebuild_author_stats
+    Author = apps.get_model('backend', 'Author')
+    batch = []
+    for author in Author.objects.only('id', 'name').iterator(chunk_size=2000):
+        author.normalized_name = normalize_author_name(author.name)
+        batch.append(author)
+        if len(batch) >= 2000:
+            Author.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    Author.objects.bulk_update(batch, ['normalized_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_papercounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='latest_paper_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', max_length=255),
+        ),
+        migrations.RunPython(backfill_normalized_names, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='author',
+            name='paper_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CoAuthorship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paper_count', models.IntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coauthorships', to='backend.author')),
+                ('coauthor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.author')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='coauthorship',
+            index=models.Index(fields=['author', '-paper_count'], name='coauthorship_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='coauthorship',
+            constraint=models.UniqueConstraint(fields=('author', 'coauthor'), name='coauthorship_unique'),
+        ),
+    ]
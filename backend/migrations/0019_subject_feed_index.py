@@ -0,0 +1,63 @@
+# Generated by Django 4.0.5 on 2026-10-19 14:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_subject_index(apps, schema_editor):
+    # fill the subject feed index from the existing papers, like backend.subjects.rebuild_index does later on
+    ArxivPaper = apps.get_model('backend', 'ArxivPaper')
+    SubjectPaper = apps.get_model('backend', 'SubjectPaper')
+    rows = ArxivPaper.subjects.through.objects.values_list('subject_id', 'arxivpaper_id',
+                                                           'arxivpaper__publication_date')
+    primary = ArxivPaper.objects.filter(primary_subject__isnull=False).values_list('primary_subject_id', 'id',
+                                                                                   'publication_date')
+    for query in (rows, primary):
+        batch = []
+        for subject_id, paper_id, publication_date in query.iterator(chunk_size=5000):
+            batch.append(SubjectPaper(subject_id=subject_id, paper_id=paper_id, publication_date=publication_date))
+            if len(batch) >= 5000:
+                # a primary subject is usually among the paper's subjects too
+                SubjectPaper.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        SubjectPaper.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_author_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectPaper',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('publication_date', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='arxivpaper',
+            index=models.Index(fields=['-publication_date', '-id'], name='arxivpaper_new_idx'),
+        ),
+        migrations.AddField(
+            model_name='subjectpaper',
+            name='paper',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.arxivpaper'),
+        ),
+        migrations.AddField(
+            model_name='subjectpaper',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='backend.subject'),
+        ),
+        migrations.AddIndex(
+            model_name='subjectpaper',
+            index=models.Index(fields=['subject', '-publication_date', '-paper'], name='subjectpaper_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='subjectpaper',
+            constraint=models.UniqueConstraint(fields=('subject', 'paper'), name='subjectpaper_unique'),
+        ),
+        migrations.RunPython(backfill_subject_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# every summary so far was written by the scraper's original completions prompt
+BACKFILL_SQL = '''
+    UPDATE backend_arxivpaper SET summary_model = 'text-davinci-003', summary_prompt = 'abstract-v1'
+    WHERE summary <> ''
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0019_subject_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='summary_model',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='summary_prompt',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.CreateModel(
+            name='PaperSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt', models.CharField(max_length=50)),
+                ('summary', models.TextField()),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('completion_tokens', models.IntegerField(default=0)),
+                ('paper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_variants', to='backend.arxivpaper')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='papersummary',
+            constraint=models.UniqueConstraint(fields=('paper', 'model', 'prompt'), name='papersummary_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_summary_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaperText',
+            fields=[
+                ('paper', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='backend.arxivpaper')),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('source', models.CharField(blank=True, default='', max_length=10)),
+                ('characters', models.IntegerField(default=0)),
+                ('compressed_text', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermPostings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=32)),
+                ('chunk', models.IntegerField()),
+                ('paper_count', models.IntegerField(default=0)),
+                ('paper_ids', models.BinaryField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='termpostings',
+            constraint=models.UniqueConstraint(fields=('term', 'chunk'), name='termpostings_unique'),
+        ),
+    ]
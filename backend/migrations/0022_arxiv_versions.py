@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0021_paper_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='arxiv_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='etags',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='arxivpaper',
+            name='version',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0022_arxiv_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paperimage',
+            name='bytes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paperimage',
+            name='height',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paperimage',
+            name='width',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0023_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=254, null=True),
+        ),
+        migrations.AlterField(
+            model_name='author',
+            name='scholar_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
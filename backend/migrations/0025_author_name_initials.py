@@ -0,0 +1,62 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:53
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+SUFFIXES = ('jr', 'sr', 'ii', 'iii', 'iv', 'phd')
+
+
+def normalize_author_name(name):
+    # frozen copy of backend.names.normalize_author_name as of this migration, "surname given names"
+    folded = unicodedata.normalize('NFKD', name)
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+    segments = [[part for part in re.split(r'[^\w\-]+', segment) if part.strip('-_')]
+                for segment in folded.split(',')]
+    segments = [segment for segment in segments if segment]
+    while len(segments) > 1 and all(part in SUFFIXES for part in segments[-1]):
+        segments.pop()
+    if len(segments) > 1:
+        segments = segments[1:] + segments[:1]
+    parts = [part for segment in segments for part in segment]
+    while len(parts) > 1 and parts[-1] in SUFFIXES:
+        parts.pop()
+    if not parts:
+        return ' '.join(name.casefold().split())[:255]
+    return ' '.join(parts[-1:] + parts[:-1])[:255]
+
+
+def initials_key(key):
+    surname, _, given = key.partition(' ')
+    return f'{surname} {given[0]}' if given else surname
+
+
+def rekey_authors(apps, schema_editor):
+    # "surname initial" keys merged different people, the full given names are the key now
+    Author = apps.get_model('backend', 'Author')
+    batch = []
+    for author in Author.objects.only('id', 'name').iterator(chunk_size=2000):
+        author.normalized_name = normalize_author_name(author.name)
+        author.name_initials = initials_key(author.normalized_name)
+        batch.append(author)
+        if len(batch) >= 2000:
+            Author.objects.bulk_update(batch, ['normalized_name', 'name_initials'])
+            batch = []
+    Author.objects.bulk_update(batch, ['normalized_name', 'name_initials'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0024_author_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='name_initials',
+            field=models.CharField(db_index=True, default='', max_length=255),
+        ),
+        migrations.RunPython(rekey_authors, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .names import initials_key, normalize_author_name
+
 
 class Author(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -7,10 +9,21 @@ class Author(models.Model):
 
     name = models.CharField(max_length=255, db_index=True)
     affiliation = models.CharField(max_length=255, null=True, blank=True, db_index=True)
-    email = models.EmailField(null=True, blank=True)
+    email = models.EmailField(null=True, blank=True, db_index=True)
     email_domain = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     citations = models.IntegerField(default=0, db_index=True)
-    scholar_id = models.CharField(max_length=255, null=True, blank=True)
+    scholar_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+
+    # maintained by backend.authors as papers are linked
+    normalized_name = models.CharField(max_length=255, db_index=True, default='')
+    name_initials = models.CharField(max_length=255, db_index=True, default='')
+    paper_count = models.IntegerField(default=0)
+    latest_paper_date = models.DateField(null=True, blank=True)
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_author_name(self.name)
+        self.name_initials = initials_key(self.normalized_name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -33,6 +46,10 @@ class PaperImage(models.Model):
 
     image = models.ImageField(upload_to="images")
     paper = models.ForeignKey("ArxivPaper", on_delete=models.CASCADE)
+    # of the stored file, as normalized by scraper.images; 0 for images stored before that, see normalize_images
+    width = models.IntegerField(default=0)
+    height = models.IntegerField(default=0)
+    bytes = models.IntegerField(default=0)
 
 
 class PaperSource(models.Model):
@@ -58,11 +75,21 @@ class ArxivPaper(models.Model):
     doi = models.CharField(max_length=255, null=True, blank=True)
     journal_ref = models.CharField(max_length=255, null=True, blank=True)
     publication_date = models.DateField()
+    # the arxiv version scraped and when arxiv last updated the paper, checked by scrape_abs.py --update
+    version = models.IntegerField(default=1)
+    arxiv_updated_at = models.DateTimeField(null=True, blank=True)
+    # ETag and Last-Modified of the abstract page, pdf and source as fetched, for conditional requests
+    etags = models.JSONField(default=dict, blank=True)
 
     # fields we create
     summary = models.TextField(db_index=True)
+    # what wrote the summary, see scraper.summaries.PROMPTS
+    summary_model = models.CharField(max_length=100, blank=True, default='')
+    summary_prompt = models.CharField(max_length=50, blank=True, default='')
     total_author_citations = models.IntegerField(default=0, db_index=True)
     citations = models.IntegerField(default=0, db_index=True)
+    # precomputed by backend.ranking, see update_hot_scores
+    hot_score = models.FloatField(default=0)
 
     # file fields
     pdf = models.FileField(upload_to="pdfs", null=True, blank=True)
@@ -71,6 +98,14 @@ class ArxivPaper(models.Model):
     images = models.ManyToManyField(PaperImage, related_name="paper_images")
     sources = models.ManyToManyField(PaperSource, related_name="paper_sources")
 
+    class Meta:
+        indexes = [
+            # the hot feed pages through papers in this order
+            models.Index(fields=['-hot_score', '-id'], name='arxivpaper_hot_idx'),
+            # the newest first feed, with the id as a tie breaker for stable pages
+            models.Index(fields=['-publication_date', '-id'], name='arxivpaper_new_idx'),
+        ]
+
     def abstract_link(self) -> str:
         return f"https://arxiv.org/abs/{self.arxiv_id}"
 
@@ -82,3 +117,97 @@ class ArxivPaper(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class SubjectPaper(models.Model):
+    """
+    A paper's primary subject and subjects, with its publication date copied in so every subject's feed is one
+    range of the feed index. Maintained by backend.subjects.
+    """
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name="+")
+    paper = models.ForeignKey(ArxivPaper, on_delete=models.CASCADE, related_name="+")
+    publication_date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subject', 'paper'], name='subjectpaper_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['subject', '-publication_date', '-paper'], name='subjectpaper_feed_idx'),
+        ]
+
+
+class CoAuthorship(models.Model):
+    """
+    How many papers author has written with coauthor. Both directions are stored.
+    """
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="coauthorships")
+    coauthor = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="+")
+    paper_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['author', 'coauthor'], name='coauthorship_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['author', '-paper_count'], name='coauthorship_top_idx'),
+        ]
+
+
+class PaperCounter(models.Model):
+    """
+    View and click counts of a paper. Written in batches by backend.counters, never per request.
+    """
+    paper = models.OneToOneField(ArxivPaper, on_delete=models.CASCADE, primary_key=True, related_name="counter")
+    modified_at = models.DateTimeField(db_index=True)
+
+    views = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+
+
+class PaperSummary(models.Model):
+    """
+    An alternative summary of a paper by another model or prompt, written by resummarize --variant so it can be
+    compared with the paper's own summary before replacing it
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    paper = models.ForeignKey(ArxivPaper, on_delete=models.CASCADE, related_name="summary_variants")
+    model = models.CharField(max_length=100)
+    prompt = models.CharField(max_length=50)
+    summary = models.TextField()
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['paper', 'model', 'prompt'], name='papersummary_unique'),
+        ]
+
+
+class PaperText(models.Model):
+    """
+    The plain text of a paper, extracted from its pdf or TeX source by backend.papertext and stored normalized
+    and zlib compressed. Papers nothing could be extracted from have one with an empty source.
+    """
+    paper = models.OneToOneField(ArxivPaper, on_delete=models.CASCADE, primary_key=True, related_name="text")
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    source = models.CharField(max_length=10, blank=True, default='')
+    characters = models.IntegerField(default=0)
+    compressed_text = models.BinaryField()
+
+
+class TermPostings(models.Model):
+    """
+    One chunk of the body text index: the ids of the papers in one id range whose text contains a term,
+    delta encoded and compressed by backend.papertext
+    """
+    term = models.CharField(max_length=32, db_index=True)
+    chunk = models.IntegerField()
+    paper_count = models.IntegerField(default=0)
+    paper_ids = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'chunk'], name='termpostings_unique'),
+        ]
@@ -0,0 +1,60 @@
+import re
+import unicodedata
+
+# trailing name parts which are not the surname
+SUFFIXES = frozenset(('jr', 'sr', 'ii', 'iii', 'iv', 'phd'))
+
+
+def _name_parts(name: str) -> list:
+    """
+    Casefold a name without accents and split it into words, given names first
+    """
+    folded = unicodedata.normalize('NFKD', name)
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+    segments = [[part for part in re.split(r'[^\w\-]+', segment) if part.strip('-_')]
+                for segment in folded.split(',')]
+    segments = [segment for segment in segments if segment]
+    # "Smith, John, Jr." and "John Smith, Jr."
+    while len(segments) > 1 and all(part in SUFFIXES for part in segments[-1]):
+        segments.pop()
+    if len(segments) > 1:
+        # "Smith, John": the surname comes first
+        segments = segments[1:] + segments[:1]
+    parts = [part for segment in segments for part in segment]
+    while len(parts) > 1 and parts[-1] in SUFFIXES:
+        parts.pop()
+    return parts
+
+
+def normalize_author_name(name: str) -> str:
+    """
+    Reduce an author name to "surname given names", so "John Smith", "Smith, John" and "Jöhn  SMITH" share a
+    key while "Wei Wang" and "Wen Wang" don't. Letters of any script are kept, so "Иван Петров" becomes
+    "петров иван" and "王小明" stays whole.
+    :param name: The author name as scraped
+    :return: The normalized key
+    """
+    parts = _name_parts(name)
+    if not parts:
+        # nothing but punctuation and symbols, the whole name is the key
+        return ' '.join(name.casefold().split())[:255]
+    return ' '.join(parts[-1:] + parts[:-1])[:255]
+
+
+def initials_key(key: str) -> str:
+    """
+    Reduce a normalized name to "surname initial", which "J. Smith" shares with "John Smith" and "Jane Smith".
+    Only a fallback for names no author has spelled out the same way.
+    :param key: A key from normalize_author_name
+    :return: The initials key
+    """
+    surname, _, given = key.partition(' ')
+    return f'{surname} {given[0]}' if given else surname
+
+
+def is_initials_key(key: str) -> bool:
+    """
+    :param key: A key from normalize_author_name
+    :return: Whether the given names are all abbreviated, as in "J. R. Smith"
+    """
+    return all(len(given) == 1 for given in key.split(' ')[1:])
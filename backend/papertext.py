@@ -0,0 +1,271 @@
+"""
+Body text search. The text of every paper is extracted from its pdf with PyMuPDF, or from its TeX sources with
+the commands stripped when the pdf has none, normalized and stored zlib compressed in PaperText.
+
+The index maps every term to the papers containing it. A term's postings are split into chunks of
+CHUNK_PAPERS consecutive paper ids, one TermPostings row each, stored as compressed deltas: indexing a batch of
+new papers only rewrites the newest chunk of each of their terms, however common the term is.
+"""
+import os
+import re
+import time
+import unicodedata
+import zlib
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ArxivPaper, PaperSource, PaperText, TermPostings
+
+# paper ids per TermPostings row
+CHUNK_PAPERS = 16384
+# longer texts are cut, a few hundred pages of appendix add nothing to search
+MAX_TEXT_CHARS = 500000
+# a pdf with less text than this is a scan or broken, try the TeX sources instead
+MIN_PDF_CHARS = 500
+# the most index terms a prefix of the last word typed may expand to before the query counts as too broad
+MAX_PREFIX_TERMS = 200
+# TermPostings rows read and written per query
+WRITE_BATCH_SIZE = 400
+# one backfill at a time, they would overwrite each other's chunks
+LOCK_KEY = 'papertext:lock'
+LOCK_TIMEOUT = 600
+
+TOO_MANY = 'too-many'
+
+# terms start with a letter and are 3 to 32 characters long, anything else isn't indexed
+TERM = re.compile(r'\b[a-z][a-z0-9]{2,31}\b')
+STOPWORDS = frozenset((
+    'and are for from has have into its our that the their this was were which with these those than then such '
+    'can not also been both more most only over under between while when where how what all any each other'
+).split())
+
+TEX_COMMENT = re.compile(r'(?<!\\)%.*')
+TEX_DROPPED_ENVIRONMENTS = re.compile(
+    r'\\begin\{(equation|align|eqnarray|gather|multline|figure|table|tabular|tikzpicture|algorithm|algorithmic|'
+    r'thebibliography)(\*?)\}.*?\\end\{\1\2\}', re.S)
+TEX_MATH = re.compile(r'\$\$.*?\$\$|\$[^$]*\$|\\\[.*?\\\]|\\\(.*?\\\)', re.S)
+# commands whose arguments aren't text
+TEX_DROPPED_COMMANDS = re.compile(
+    r'\\(?:begin|end|label|ref|eqref|cref|Cref|cite[a-zA-Z]*|includegraphics|usepackage|documentclass|'
+    r'bibliography|bibliographystyle|input|include|url|newcommand|renewcommand|def)\*?(?:\[[^\]]*\])*(?:\{[^}]*\})*')
+TEX_COMMAND = re.compile(r'\\[a-zA-Z]+\*?(?:\[[^\]]*\])?')
+
+
+def strip_tex(tex: str) -> str:
+    """
+    Reduce LaTeX to its prose: comments, math, figures, tables and references are dropped, other commands are
+    replaced by their arguments
+    """
+    if '\\begin{document}' in tex:
+        tex = tex.split('\\begin{document}', 1)[1].split('\\end{document}', 1)[0]
+    tex = TEX_COMMENT.sub('', tex)
+    tex = TEX_DROPPED_ENVIRONMENTS.sub(' ', tex)
+    tex = TEX_MATH.sub(' ', tex)
+    tex = TEX_DROPPED_COMMANDS.sub(' ', tex)
+    tex = TEX_COMMAND.sub(' ', tex)
+    return re.sub(r'[{}~]', ' ', tex)
+
+
+def normalize(text: str) -> str:
+    """
+    NFKC (which also splits ligatures), words hyphenated across lines joined, whitespace collapsed
+    """
+    text = unicodedata.normalize('NFKC', text)
+    text = re.sub(r'(\w)-\s*\n\s*(\w)', r'\1\2', text)
+    return ' '.join(text.split())[:MAX_TEXT_CHARS]
+
+
+def extract_text(pdf_path: str, tex_sources: list) -> tuple:
+    """
+    Runs in the backfill's worker processes, so it must not touch the database
+    :param pdf_path: The path to the paper's pdf, or None
+    :param tex_sources: The contents of the paper's TeX files
+    :return: (source, normalized text), source is 'pdf', 'tex' or '' if neither had any text
+    """
+    if pdf_path:
+        # PyMuPDF takes a while to import and only the workers need it
+        import fitz
+        try:
+            with fitz.open(pdf_path) as pdf:
+                text = normalize('\n'.join(page.get_text() for page in pdf))
+            if len(text) >= MIN_PDF_CHARS:
+                return 'pdf', text
+        except Exception as e:
+            print(f'Error occurred while extracting text from pdf: {pdf_path}: {e}')
+    text = normalize(strip_tex('\n'.join(tex_sources)))
+    return ('tex', text) if text else ('', '')
+
+
+def decompress(paper_text: PaperText) -> str:
+    return zlib.decompress(paper_text.compressed_text).decode()
+
+
+def terms(text: str) -> set:
+    return {term for term in TERM.findall(text.lower()) if term not in STOPWORDS}
+
+
+def _encode(paper_ids: list) -> bytes:
+    deltas = array('I', (b - a for a, b in zip([0] + paper_ids, paper_ids)))
+    return zlib.compress(deltas.tobytes())
+
+
+def _decode(data) -> list:
+    deltas = array('I')
+    deltas.frombytes(zlib.decompress(data))
+    return list(accumulate(deltas))
+
+
+def index_texts(texts: dict) -> int:
+    """
+    Add papers to the index. Adding a paper again, e.g. after a new arxiv version, adds its new terms; the terms
+    it no longer contains keep matching it.
+    :param texts: paper id -> normalized text
+    :return: The number of TermPostings rows written
+    """
+    postings = defaultdict(list)
+    for paper_id, text in texts.items():
+        for term in terms(text):
+            postings[(term, paper_id // CHUNK_PAPERS)].append(paper_id)
+    keys = sorted(postings)
+
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(keys), WRITE_BATCH_SIZE):
+            batch = keys[start:start + WRITE_BATCH_SIZE]
+            existing = {(row.term, row.chunk): row for row in TermPostings.objects.filter(
+                term__in={term for term, _ in batch}, chunk__in={chunk for _, chunk in batch})}
+            updated, created = [], []
+            for key in batch:
+                row = existing.get(key)
+                if row:
+                    paper_ids = sorted(set(_decode(row.paper_ids)).union(postings[key]))
+                    row.paper_ids, row.paper_count = _encode(paper_ids), len(paper_ids)
+                    updated.append(row)
+                else:
+                    paper_ids = sorted(postings[key])
+                    created.append(TermPostings(term=key[0], chunk=key[1], paper_ids=_encode(paper_ids),
+                                                paper_count=len(paper_ids)))
+            TermPostings.objects.bulk_update(updated, ['paper_ids', 'paper_count'])
+            TermPostings.objects.bulk_create(created)
+            written += len(batch)
+    return written
+
+
+def _postings(term_list: list) -> set:
+    paper_ids = set()
+    for start in range(0, len(term_list), WRITE_BATCH_SIZE):
+        for data in TermPostings.objects.filter(term__in=term_list[start:start + WRITE_BATCH_SIZE]) \
+                .values_list('paper_ids', flat=True):
+            paper_ids.update(_decode(data))
+    return paper_ids
+
+
+def body_matches(query: str, limit: int):
+    """
+    Find the papers whose text contains every word of a search query, the last one as a prefix unless the query
+    ends with a space, since it may still be being typed. Words which aren't index terms are ignored.
+    :param limit: The most matches worth returning
+    :return: A set of paper ids, TOO_MANY if there are more than limit, or None if no word of the query is an
+    index term
+    """
+    query = query.lower()
+    words = re.findall(r'\w+', query)
+    prefix = words.pop() if words and query[-1].isalnum() else None
+    exact = sorted({word for word in words if TERM.fullmatch(word) and word not in STOPWORDS})
+    if prefix and not TERM.fullmatch(prefix):
+        prefix = None
+    if not exact and not prefix:
+        return None
+
+    matches = None
+    for word in exact:
+        paper_ids = _postings([word])
+        matches = paper_ids if matches is None else matches & paper_ids
+        if not matches:
+            return set()
+    if prefix:
+        expanded = list(TermPostings.objects.filter(term__startswith=prefix).order_by('term')
+                        .values_list('term', flat=True).distinct()[:MAX_PREFIX_TERMS + 1])
+        if len(expanded) > MAX_PREFIX_TERMS:
+            return TOO_MANY
+        paper_ids = _postings(expanded)
+        matches = paper_ids if matches is None else matches & paper_ids
+    return TOO_MANY if len(matches) > limit else matches
+
+
+def _lower_priority() -> None:
+    os.nice(10)
+
+
+def backfill(batch_size: int = 50, workers: int = 2, max_read_mb: float = None, limit: int = None,
+             stdout=None) -> dict:
+    """
+    Extract and index the text of every paper which has none yet, in id order and in batches of batch_size,
+    across worker processes at a lower CPU priority. Each batch is saved before the next one starts, so an
+    interrupted backfill continues where it stopped.
+    :param max_read_mb: Pause between batches to read at most this many MB of pdfs a second on average, so the
+    backfill doesn't starve the web server's disk. None for no limit.
+    :param limit: The most papers to extract, None for all
+    :param stdout: Optional stream to write progress to
+    :return: The numbers of papers extracted and without any text, the MB of pdfs read, and whether another
+    backfill was already running
+    """
+    stats = {'extracted': 0, 'empty': 0, 'read_mb': 0.0, 'locked': False}
+    if not cache.add(LOCK_KEY, os.getpid(), LOCK_TIMEOUT):
+        stats['locked'] = True
+        return stats
+
+    papers = ArxivPaper.objects.filter(text__isnull=True).only('id', 'pdf').order_by('id')
+    started = time.monotonic()
+    last_id = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority) as executor:
+            while True:
+                done = stats['extracted'] + stats['empty']
+                size = batch_size if limit is None else min(batch_size, limit - done)
+                batch = list(papers.filter(id__gt=last_id)[:size]) if size > 0 else []
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                tex_sources = defaultdict(list)
+                for paper_id, content in PaperSource.objects.filter(paper__in=batch).order_by('id') \
+                        .values_list('paper_id', 'content'):
+                    tex_sources[paper_id].append(content)
+                pdf_paths = {}
+                for paper in batch:
+                    if paper.pdf and os.path.exists(paper.pdf.path):
+                        pdf_paths[paper.id] = paper.pdf.path
+                        stats['read_mb'] += os.path.getsize(paper.pdf.path) / 1e6
+
+                results = executor.map(extract_text, [pdf_paths.get(paper.id) for paper in batch],
+                                       [tex_sources[paper.id] for paper in batch])
+                rows, texts = [], {}
+                for paper, (source, text) in zip(batch, results):
+                    rows.append(PaperText(paper_id=paper.id, source=source, characters=len(text),
+                                          compressed_text=zlib.compress(text.encode())))
+                    if text:
+                        texts[paper.id] = text
+                with transaction.atomic():
+                    PaperText.objects.bulk_create(rows)
+                    index_texts(texts)
+                stats['extracted'] += len(texts)
+                stats['empty'] += len(batch) - len(texts)
+                cache.touch(LOCK_KEY, LOCK_TIMEOUT)
+                if stdout:
+                    stdout.write(f'Extracted {stats["extracted"]} papers up to id {last_id}, '
+                                 f'{stats["empty"]} without text, {stats["read_mb"]:.0f} MB read')
+
+                if max_read_mb:
+                    # sleep until the average since the start is back under the limit
+                    ahead = stats['read_mb'] / max_read_mb - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+    finally:
+        cache.delete(LOCK_KEY)
+    return stats
@@ -0,0 +1,34 @@
+import math
+from datetime import date
+
+from django.conf import settings
+
+EPOCH = date(2000, 1, 1)
+
+
+def hot_score(publication_date: date, citations: int, total_author_citations: int, clicks: int = 0) -> float:
+    """
+    Ranking score for the hot feed. Every tenfold increase in citations, author citations or clicks is worth a
+    fixed number of days of recency, so the score never has to decay: a newer paper simply starts higher.
+    That keeps scores valid until the inputs change instead of having to recompute the whole table every day.
+    :param publication_date: The date the paper was published on arxiv
+    :param citations: Citations of the paper itself
+    :param total_author_citations: Sum of its authors' citations
+    :param clicks: Clicks on the paper's card
+    :return: The score, higher is hotter
+    """
+    days = (publication_date - EPOCH).days
+    return (
+        days / settings.HOT_SCORE_DAYS_PER_POINT +
+        settings.HOT_SCORE_CITATIONS_WEIGHT * math.log10(1 + max(citations, 0)) +
+        settings.HOT_SCORE_AUTHOR_CITATIONS_WEIGHT * math.log10(1 + max(total_author_citations, 0)) +
+        settings.HOT_SCORE_CLICKS_WEIGHT * math.log10(1 + max(clicks, 0))
+    )
+
+
+def paper_hot_score(paper) -> float:
+    """
+    The hot score of an ArxivPaper, including clicks if it has a counter
+    """
+    clicks = paper.counter.clicks if hasattr(paper, 'counter') else 0
+    return hot_score(paper.publication_date, paper.citations, paper.total_author_citations, clicks)
@@ -0,0 +1,141 @@
+import hashlib
+import heapq
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .models import ArxivPaper, Subject, SubjectPaper
+
+COUNTS_CACHE_KEY = 'subjects:counts'
+
+# the subjects a single request may filter by
+MAX_SUBJECTS = 10
+
+# how long where a feed page ended is kept for the page after it
+CURSOR_TIMEOUT = 3600
+
+REBUILD_SQL_DELETE = 'DELETE FROM backend_subjectpaper'
+# UNION de-duplicates the papers whose primary subject is also in their subjects
+REBUILD_SQL_INSERT = '''
+    INSERT INTO backend_subjectpaper (subject_id, paper_id, publication_date)
+    SELECT s.subject_id, p.id, p.publication_date
+    FROM backend_arxivpaper_subjects s JOIN backend_arxivpaper p ON p.id = s.arxivpaper_id
+    UNION
+    SELECT p.primary_subject_id, p.id, p.publication_date
+    FROM backend_arxivpaper p WHERE p.primary_subject_id IS NOT NULL
+'''
+
+
+def parse_subjects(value: str) -> list:
+    """
+    Resolve a subject= parameter ("cs.LG+cs.CL", "cs.LG,cs.CL" or "cs.LG cs.CL") to subject ids
+    :param value: The parameter value
+    :return: The subject ids, raises ValueError with a message for unknown subjects
+    """
+    names = [name for name in re.split(r'[\s+,]+', value) if name]
+    if len(names) > MAX_SUBJECTS:
+        raise ValueError(f'At most {MAX_SUBJECTS} subjects can be selected')
+    ids = dict(Subject.objects.filter(short_name__in=names).values_list('short_name', 'id'))
+    unknown = set(names) - set(ids)
+    if unknown:
+        raise ValueError(f'Unknown subjects: {", ".join(sorted(unknown))}')
+    return sorted(set(ids.values()))
+
+
+def subject_filter(subject_ids) -> Q:
+    """
+    Filter ArxivPapers to those with any of the subjects, for queries the subject feed index can't answer
+    """
+    in_subjects = ArxivPaper.subjects.through.objects.filter(arxivpaper_id=OuterRef('pk'), subject_id__in=subject_ids)
+    return Q(primary_subject_id__in=subject_ids) | Q(Exists(in_subjects))
+
+
+def newest_paper_ids(subject_ids, start: int, count: int, date_range=None) -> list:
+    """
+    A page of the newest first feed of papers with any of the subjects. Every subject's slice is read in index
+    order and the slices are merged, so no query has to sort or de-duplicate the papers of a big subject.
+    Where every page ended is cached, so the next page reads count rows of every subject after it rather than
+    every row before it. Without that, pages past SUBJECT_FEED_MAX_START are empty.
+    :param subject_ids: The subject ids
+    :param start: The offset of the page
+    :param count: The page size
+    :param date_range: Optional (start, end) publication dates
+    :return: The paper ids of the page, newest first
+    """
+    # imported here, ingest imports this module
+    from .ingest import content_version
+
+    feed = repr((sorted(subject_ids), date_range)).encode()
+    cursor_key = f'subjects:cursor:{content_version()}:{hashlib.sha1(feed).hexdigest()}:'
+    after = cache.get(cursor_key + str(start)) if start else None
+    if start and after is None and start > settings.SUBJECT_FEED_MAX_START:
+        return []
+
+    slices = []
+    for subject_id in subject_ids:
+        rows = SubjectPaper.objects.filter(subject_id=subject_id)
+        if date_range:
+            rows = rows.filter(publication_date__range=date_range)
+        if after:
+            rows = rows.filter(Q(publication_date__lt=after[0]) | Q(publication_date=after[0], paper_id__lt=after[1]))
+        rows = rows.order_by('-publication_date', '-paper_id').values_list('publication_date', 'paper_id')
+        slices.append(list(rows[:count if after else start + count]))
+    page = []
+    seen = set()
+    for row in heapq.merge(*slices, reverse=True):
+        if row[1] not in seen:
+            seen.add(row[1])
+            page.append(row)
+    page = page[:count] if after else page[start:start + count]
+    if len(page) == count:
+        cache.set(cursor_key + str(start + count), page[-1], CURSOR_TIMEOUT)
+    return [paper_id for _, paper_id in page]
+
+
+def index_paper(paper) -> None:
+    """
+    Add a paper to the feeds of its subjects, and drop the cached counts
+    :param paper: The saved ArxivPaper, with its subjects linked
+    :return: None
+    """
+    subject_ids = set(paper.subjects.values_list('id', flat=True))
+    if paper.primary_subject_id:
+        subject_ids.add(paper.primary_subject_id)
+    with transaction.atomic():
+        SubjectPaper.objects.filter(paper=paper).exclude(subject_id__in=subject_ids).delete()
+        SubjectPaper.objects.filter(paper=paper).update(publication_date=paper.publication_date)
+        SubjectPaper.objects.bulk_create(
+            [SubjectPaper(subject_id=subject_id, paper=paper, publication_date=paper.publication_date)
+             for subject_id in subject_ids], ignore_conflicts=True)
+    cache.delete(COUNTS_CACHE_KEY)
+
+
+def rebuild_index() -> int:
+    """
+    Refill the subject feed index from ArxivPaper.subjects and primary_subject
+    :return: The number of rows in the index
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(REBUILD_SQL_DELETE)
+        cursor.execute(REBUILD_SQL_INSERT)
+    cache.delete(COUNTS_CACHE_KEY)
+    return SubjectPaper.objects.count()
+
+
+def subject_counts() -> list:
+    """
+    The number of papers in every subject, biggest first. Cached until the next paper is ingested.
+    :return: [{'short_name', 'full_name', 'count'}]
+    """
+    counts = cache.get(COUNTS_CACHE_KEY)
+    if counts is None:
+        rows = dict(SubjectPaper.objects.values('subject_id').annotate(count=Count('id'))
+                    .values_list('subject_id', 'count'))
+        counts = [{'short_name': subject.short_name, 'full_name': subject.full_name, 'count': rows[subject.id]}
+                  for subject in Subject.objects.filter(id__in=rows)]
+        counts.sort(key=lambda subject: (-subject['count'], subject['short_name']))
+        cache.set(COUNTS_CACHE_KEY, counts, settings.SUBJECT_COUNTS_CACHE_TIMEOUT)
+    return counts
@@ -0,0 +1,76 @@
+"""
+Fixtures shared by the tests of every app
+"""
+import datetime
+import itertools
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from . import caching
+from .models import ArxivPaper
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+_arxiv_numbers = itertools.count(1)
+
+
+def create_paper(arxiv_id: str = None, title: str = 'A paper', publication_date: datetime.date = None,
+                 **fields) -> ArxivPaper:
+    """
+    Save an ArxivPaper with every required field filled in
+    :param arxiv_id: Defaults to a new one for every paper
+    :param publication_date: Defaults to 2024-01-01
+    :param fields: Any other ArxivPaper fields
+    """
+    fields.setdefault('abstract', '')
+    fields.setdefault('summary', '')
+    return ArxivPaper.objects.create(arxiv_id=arxiv_id or f'2401.{next(_arxiv_numbers):05d}', title=title,
+                                     publication_date=publication_date or datetime.date(2024, 1, 1), **fields)
+
+
+class MediaRootMixin:
+    """
+    Points MEDIA_ROOT, and the feeds and related papers index written next to it, at a temporary directory for
+    the duration of every test
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root, FEEDS_DIR=os.path.join(self.media_root, 'feeds'),
+                                  EMBEDDINGS_DIR=os.path.join(self.media_root, 'embeddings'))
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+
+class LocalCacheMixin:
+    """
+    Gives every test an empty in-memory cache, and an empty per-process LRU in front of it
+    """
+
+    def setUp(self):
+        super().setUp()
+        caches = override_settings(CACHES=LOCMEM_CACHE)
+        caches.enable()
+        self.addCleanup(caches.disable)
+        caching.clear()
+        self.addCleanup(caching.clear)
+
+
+class ScraperStateMixin:
+    """
+    Gives every test its own SCRAPER_STATE_DIR, so the upstreams' rate limits and breakers start out closed and
+    full
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.state_dir = tempfile.mkdtemp()
+        state = override_settings(SCRAPER_STATE_DIR=self.state_dir)
+        state.enable()
+        self.addCleanup(state.disable)
+        self.addCleanup(shutil.rmtree, self.state_dir, True)
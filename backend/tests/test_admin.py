@@ -0,0 +1,41 @@
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
+
+from backend.models import ArxivPaper, Author, PaperImage
+from backend.testing import create_paper
+
+
+class AdminSearchTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/admin/')
+        self.paper = create_paper('2401.00001', 'Attention is all you need')
+        create_paper('2401.00002', 'Attention mechanisms')
+
+    def search(self, model, term: str):
+        model_admin = admin.site._registry[model]
+        results, _ = model_admin.get_search_results(self.request, model.objects.all(), term)
+        return results
+
+    def test_case_insensitive_lookups_are_never_used(self):
+        # UPPER(column) matches no index
+        for model in (ArxivPaper, Author, PaperImage):
+            sql = str(self.search(model, 'Attention is').query)
+            self.assertNotIn('UPPER(', sql)
+
+    def test_arxiv_id_only_uses_the_unique_index(self):
+        results = self.search(ArxivPaper, ' 2401.00001v2 ')
+        self.assertEqual(list(results), [self.paper])
+        sql = str(results.query)
+        self.assertIn('"arxiv_id" = 2401.00001', sql)
+        self.assertNotIn('LIKE', sql)
+        self.assertIn('USING INDEX', results.explain())
+
+    def test_title_prefix_with_spaces(self):
+        self.assertEqual(list(self.search(ArxivPaper, 'Attention is')), [self.paper])
+        self.assertEqual(self.search(ArxivPaper, 'Attention').count(), 2)
+        self.assertIn('LIKE Attention%', str(self.search(ArxivPaper, 'Attention').query))
+
+    def test_author_name_prefix(self):
+        author = Author.objects.create(name='Jane Smith')
+        Author.objects.create(name='John Smith')
+        self.assertEqual(list(self.search(Author, 'Jane Sm')), [author])
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from backend.benchmarks.scenarios import Scenario, ScrapeScenario, run_scenario
+from backend.models import ArxivPaper, Author
+
+
+class CountingScenario(Scenario):
+    group = 'test'
+
+    def __init__(self):
+        super().__init__('counting')
+        self.calls = []
+
+    def setup(self):
+        self.calls.append('setup')
+
+    def run(self):
+        self.calls.append('run')
+        return list(Author.objects.all())
+
+    def teardown(self):
+        self.calls.append('teardown')
+
+
+class RunScenarioTests(TestCase):
+    def test_warmup_runs_are_not_timed(self):
+        scenario = CountingScenario()
+        stats = run_scenario(scenario, repeat=3, warmup=1)
+        self.assertEqual(scenario.calls, ['setup', 'run', 'teardown'] * 4)
+        self.assertEqual((stats['group'], stats['name'], stats['runs'], stats['queries']), ('test', 'counting', 3, 1))
+        self.assertLessEqual(stats['min_ms'], stats['median_ms'])
+        self.assertLessEqual(stats['median_ms'], stats['p95_ms'])
+
+
+class CountingScrapeScenario(ScrapeScenario):
+    def run(self):
+        super().run()
+        self.authors_after_run = Author.objects.count()
+
+
+class ScrapeScenarioTests(TestCase):
+    def test_scrape_removes_what_it_created(self):
+        author = Author.objects.create(name='Jane Smith')
+        scenario = CountingScrapeScenario('scrape_paper', ['2306.00001'])
+        stats = run_scenario(scenario, repeat=1, warmup=0)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(scenario.authors_after_run, 1)
+        self.assertFalse(ArxivPaper.objects.exists())
+        self.assertEqual(list(Author.objects.all()), [author])
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from backend import caching
+from backend.testing import LocalCacheMixin
+
+
+@override_settings(CACHE_LOCK_POLL_INTERVAL=0.01, CACHE_POLICIES={
+    'test': {'timeout': 60, 'stale': 60, 'local_timeout': 0, 'lock_timeout': 0.2}})
+class CachePolicyTests(LocalCacheMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.policy = caching.CachePolicy('test')
+        self.calls = []
+
+    def compute(self, value='new'):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def store_stale(self, key: str, value) -> None:
+        cache.set(key, (time.time() - 1, value), 60)
+
+    def test_miss_computes_once(self):
+        self.assertEqual(self.policy.get_or_compute('key', self.compute()), 'new')
+        self.assertEqual(self.policy.get_or_compute('key', self.compute('other')), 'new')
+        self.assertEqual(self.calls, ['new'])
+
+    def test_stale_entry_is_refreshed_by_one_caller(self):
+        self.store_stale('key', 'old')
+        cache.add('key:lock', 1)
+        # another worker is refreshing it: served stale without computing
+        self.assertEqual(self.policy.get_or_compute('key', self.compute()), 'old')
+        self.assertEqual(self.calls, [])
+        cache.delete('key:lock')
+        self.assertEqual(self.policy.get_or_compute('key', self.compute()), 'new')
+        self.assertEqual(self.policy.get('key'), 'new')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_failed_refresh_serves_stale_value(self):
+        self.store_stale('key', 'old')
+
+        def fail():
+            raise RuntimeError('down')
+        with self.assertLogs('backend.caching', 'ERROR'):
+            self.assertEqual(self.policy.get_or_compute('key', fail), 'old')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_miss_waits_for_lock_holder(self):
+        cache.add('key:lock', 1)
+        # the worker holding the lock stores its value while this one waits
+        timer = threading.Timer(0.05, self.policy.set, ('key', 'theirs'))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(self.policy.get_or_compute('key', self.compute()), 'theirs')
+        self.assertEqual(self.calls, [])
+
+    def test_miss_leaves_others_lock_alone(self):
+        cache.add('key:lock', 'theirs', 60)
+        with override_settings(CACHE_POLICIES={
+                'test': {'timeout': 60, 'stale': 60, 'local_timeout': 0, 'lock_timeout': 0.05}}):
+            self.assertEqual(self.policy.get_or_compute('key', self.compute()), 'new')
+        self.assertEqual(cache.get('key:lock'), 'theirs')
+
+    def test_async_miss_leaves_others_lock_alone(self):
+        cache.add('key:lock', 'theirs', 60)
+
+        async def compute():
+            return 'new'
+        with override_settings(CACHE_POLICIES={
+                'test': {'timeout': 60, 'stale': 60, 'local_timeout': 0, 'lock_timeout': 0.05}}):
+            self.assertEqual(async_to_sync(self.policy.aget_or_compute)('key', compute), 'new')
+        self.assertEqual(cache.get('key:lock'), 'theirs')
+
+    def test_async_miss_releases_own_lock(self):
+        async def compute():
+            return 'new'
+        self.assertEqual(async_to_sync(self.policy.aget_or_compute)('key', compute), 'new')
+        self.assertIsNone(cache.get('key:lock'))
+        self.assertEqual(self.policy.get('key'), 'new')
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from backend import corpus
+from backend.models import ArxivPaper, Author, PaperImage, PaperSource, Subject
+from backend.testing import MediaRootMixin, create_paper
+
+
+class CorpusRoundTripTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_dir, True)
+
+        subject = Subject.objects.create(short_name='cs.LG', full_name='Machine Learning')
+        paper = create_paper('2401.00001', abstract='An abstract', summary='A summary', primary_subject=subject,
+                             version=2, etags={'pdf': {'etag': '"x"'}})
+        paper.subjects.add(subject)
+        paper.authors.add(Author.objects.create(name='Jane Smith', citations=7),
+                          Author.objects.create(name='Wei Chen'))
+        paper.pdf.save('2401.00001.pdf', ContentFile(b'%PDF-1.4 pdf'))
+        PaperImage.objects.create(paper=paper, image=ContentFile(b'png', name='2401.00001_fig.png'), width=3,
+                                  height=2, bytes=3)
+        PaperSource.objects.create(paper=paper, content='\\section{Intro}')
+
+    def clear_database(self):
+        ArxivPaper.objects.all().delete()
+        Author.objects.all().delete()
+        Subject.objects.all().delete()
+        PaperImage.objects.all().delete()
+        PaperSource.objects.all().delete()
+        shutil.rmtree(self.media_root)
+        os.makedirs(self.media_root)
+
+    def test_export_import_round_trip(self):
+        manifest = corpus.export_corpus(self.export_dir)
+        self.assertEqual(manifest['counts'], {'subjects': 1, 'authors': 2, 'papers': 1, 'images': 1, 'sources': 1})
+        self.clear_database()
+
+        counts = corpus.import_corpus(self.export_dir)
+        self.assertEqual(counts, manifest['counts'])
+        paper = ArxivPaper.objects.get(arxiv_id='2401.00001')
+        self.assertEqual((paper.title, paper.version, paper.etags), ('A paper', 2, {'pdf': {'etag': '"x"'}}))
+        self.assertEqual(paper.primary_subject.short_name, 'cs.LG')
+        self.assertEqual(sorted(paper.authors.values_list('name', flat=True)), ['Jane Smith', 'Wei Chen'])
+        self.assertEqual(Author.objects.get(name='Jane Smith').normalized_name, 'smith jane')
+        with paper.pdf.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 pdf')
+        image = PaperImage.objects.get(paper=paper)
+        self.assertEqual((image.width, image.height, image.bytes), (3, 2, 3))
+        self.assertEqual(list(PaperSource.objects.filter(paper=paper).values_list('content', flat=True)),
+                         ['\\section{Intro}'])
+
+    def test_import_twice_updates_in_place(self):
+        corpus.export_corpus(self.export_dir)
+        corpus.import_corpus(self.export_dir)
+        self.assertEqual(ArxivPaper.objects.count(), 1)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(PaperImage.objects.count(), 1)
+
+    def test_incremental_export_only_has_changes(self):
+        first = corpus.export_corpus(self.export_dir, media=False)
+        since_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, since_dir, True)
+        manifest = corpus.export_corpus(since_dir, since=first['watermark'], media=False)
+        self.assertEqual(manifest['counts']['papers'], 0)
+
+    def test_import_needs_a_manifest(self):
+        with self.assertRaises(ValueError):
+            corpus.import_corpus(self.export_dir)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from backend.counters import CounterBuffer
+from backend.models import PaperCounter
+from backend.testing import LocalCacheMixin, create_paper
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=60, COUNTER_FLUSH_MAX_PAPERS=1000)
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = CounterBuffer(background=False)
+        self.paper = create_paper('2401.00001')
+
+    def counts(self) -> tuple:
+        counter = PaperCounter.objects.get(paper=self.paper)
+        return counter.views, counter.clicks
+
+    def test_flush_adds_up_counts(self):
+        self.buffer.add('2401.00001', 'view')
+        self.buffer.add('2401.00001', 'view')
+        self.buffer.add('2401.00001', 'click')
+        self.assertFalse(PaperCounter.objects.exists())
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.counts(), (2, 1))
+        self.buffer.add('2401.00001', 'view', 3)
+        self.buffer.flush()
+        self.assertEqual(self.counts(), (5, 1))
+
+    def test_unknown_papers_are_skipped(self):
+        self.buffer.add('2401.99999', 'view')
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_event_after_the_interval_flushes(self):
+        with mock.patch('backend.counters.time.monotonic', return_value=1000.0):
+            self.buffer.add('2401.00001', 'view')
+        with mock.patch('backend.counters.time.monotonic', return_value=1059.0):
+            self.buffer.add('2401.00001', 'view')
+        self.assertFalse(PaperCounter.objects.exists())
+        with mock.patch('backend.counters.time.monotonic', return_value=1060.0):
+            self.buffer.add('2401.00001', 'click')
+        self.assertEqual(self.counts(), (2, 1))
+
+    @override_settings(COUNTER_FLUSH_MAX_PAPERS=2)
+    def test_many_papers_flush(self):
+        create_paper('2401.00002')
+        self.buffer.add('2401.00001', 'view')
+        self.buffer.add('2401.00002', 'view')
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_failed_write_keeps_counts(self):
+        self.buffer.add('2401.00001', 'view')
+        with mock.patch.object(CounterBuffer, '_write', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+            # an event never fails on a flush
+            with override_settings(COUNTER_FLUSH_MAX_PAPERS=1), self.assertLogs('backend.counters', 'ERROR'):
+                self.buffer.add('2401.00001', 'view')
+        self.buffer.flush()
+        self.assertEqual(self.counts(), (2, 0))
+
+
+@override_settings(EVENTS_RATE_LIMIT=2)
+class EventsApiTests(LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.buffer = CounterBuffer(background=False)
+        patcher = mock.patch('backend.counters.buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.paper = create_paper('2401.00001')
+
+    def post(self, events):
+        return self.client.post('/api/events/', events, content_type='application/json')
+
+    def test_events_count_once_per_request(self):
+        response = self.post([{'arxiv_id': '2401.00001', 'type': 'click'}] * 50 +
+                             [{'arxiv_id': '2401.00001', 'type': 'view'}, {'arxiv_id': '2401.00001', 'type': 'bad'}])
+        self.assertEqual(response.status_code, 204)
+        self.buffer.flush()
+        counter = PaperCounter.objects.get(paper=self.paper)
+        self.assertEqual((counter.views, counter.clicks), (1, 1))
+
+    def test_invalid_events(self):
+        self.assertEqual(self.post({'arxiv_id': '2401.00001'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/events/', 'x', content_type='application/json').status_code, 400)
+
+    def test_clients_are_rate_limited(self):
+        self.assertEqual(self.post([]).status_code, 204)
+        self.assertEqual(self.post([]).status_code, 204)
+        self.assertEqual(self.post([]).status_code, 429)
+        self.assertEqual(self.client.post('/api/events/', [], content_type='application/json',
+                                          REMOTE_ADDR='10.0.0.2').status_code, 204)
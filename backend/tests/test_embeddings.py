@@ -0,0 +1,95 @@
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from backend import embeddings
+from backend.testing import MediaRootMixin
+
+
+def paper(paper_id: int, title: str, abstract: str = '') -> SimpleNamespace:
+    return SimpleNamespace(id=paper_id, title=title, abstract=abstract, summary='')
+
+
+PAPERS = [
+    paper(1, 'Graph neural networks for molecules', 'message passing over molecular graphs'),
+    paper(2, 'Molecular graph neural networks', 'message passing for molecules and proteins'),
+    paper(3, 'Speech recognition with transformers', 'audio transformers for speech'),
+    paper(4, 'Transformers for speech synthesis', 'audio generation with transformers'),
+    paper(5, 'Reinforcement learning for robots', 'reward shaping for robot control'),
+]
+
+
+class EmbeddingsTests(MediaRootMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = embeddings.EmbeddingIndex(refresh_interval=0)
+
+    def related_ids(self, paper_, k: int = 2) -> list:
+        return [paper_id for paper_id, _ in self.index.related(paper_, k)]
+
+    def test_appended_papers_find_each_other(self):
+        self.assertEqual(embeddings.append_papers(PAPERS), 5)
+        self.assertEqual(self.related_ids(PAPERS[0], 1), [2])
+        self.assertEqual(self.related_ids(PAPERS[2], 1), [4])
+        # scores are cosine similarities of normalized vectors
+        score = self.index.related(PAPERS[0], 1)[0][1]
+        self.assertTrue(0 < score <= 1)
+        self.assertAlmostEqual(float(np.linalg.norm(self.index.vector_for(1))), 1, places=5)
+
+    def test_indexed_papers_are_only_replaced_on_request(self):
+        embeddings.append_papers(PAPERS)
+        self.assertEqual(embeddings.append_papers(PAPERS[:1]), 0)
+        moved = paper(1, 'Speech transformers', 'audio transformers for speech recognition')
+        self.assertEqual(embeddings.append_papers([moved], replace=True), 1)
+        self.assertEqual(self.related_ids(moved, 1), [3])
+        # the old row is blanked, and a paper comes up once
+        self.assertFalse(self.index.rows.weights[:self.index.rows.ends[0]].any())
+        self.assertEqual(self.related_ids(PAPERS[1], 5).count(1), 1)
+        self.assertEqual(len(self.index.rows.ids), 6)
+
+    def test_rebuild_matches_appends_and_drops_the_old_generation(self):
+        embeddings.append_papers(PAPERS)
+        old_generation = os.path.realpath(os.path.join(settings.EMBEDDINGS_DIR, 'current'))
+        appended = [self.related_ids(p) for p in PAPERS]
+        self.assertEqual(embeddings.rebuild(lambda: iter(PAPERS)), 5)
+        self.assertFalse(os.path.exists(old_generation))
+        self.assertEqual([self.related_ids(p) for p in PAPERS], appended)
+
+    def test_nearest_scores_across_chunks(self):
+        embeddings.append_papers(PAPERS + [paper(6, '')])
+        vector = self.index.vector_for(3)
+        everything = self.index.nearest(vector, 6)
+        with mock.patch.object(embeddings, 'SCORE_CHUNK_ROWS', 2):
+            self.assertEqual(self.index.nearest(vector, 6), everything)
+        self.assertEqual(everything[0], (3, mock.ANY))
+        self.assertEqual(dict(everything)[6], 0)
+        self.assertNotIn(3, dict(self.index.nearest(vector, 6, exclude=(3,))))
+
+    def test_unindexed_paper_is_weighed_on_the_fly(self):
+        embeddings.append_papers(PAPERS)
+        self.assertEqual(self.related_ids(paper(7, 'Robot control with reinforcement learning'), 1), [5])
+
+    def test_interrupted_append_is_dropped(self):
+        embeddings.append_papers(PAPERS[:2])
+        generation = os.path.realpath(os.path.join(settings.EMBEDDINGS_DIR, 'current'))
+        # entries and an end written, the id never was
+        with open(os.path.join(generation, 'weights.f32'), 'ab') as f:
+            f.write(bytes(40))
+        with open(os.path.join(generation, 'ends.i64'), 'ab') as f:
+            f.write(np.int64(10 ** 6).tobytes())
+        embeddings.append_papers(PAPERS[2:])
+        self.assertEqual(self.related_ids(PAPERS[0], 1), [2])
+        self.assertEqual(self.related_ids(PAPERS[3], 1), [3])
+
+    def test_other_dimension_needs_a_rebuild(self):
+        embeddings.append_papers(PAPERS)
+        with self.settings(EMBEDDING_DIM=1024):
+            with self.assertRaises(ValueError):
+                embeddings.append_papers([paper(7, 'New paper')])
+            self.assertEqual(self.index.related(paper(7, 'New paper')), [])
+            embeddings.rebuild(lambda: iter(PAPERS))
+            self.assertEqual(self.related_ids(PAPERS[0], 1), [2])
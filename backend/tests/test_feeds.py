@@ -0,0 +1,68 @@
+import datetime
+import json
+import os
+from io import StringIO
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from backend import feeds, subjects
+from backend.models import Author, Subject
+from backend.testing import LocalCacheMixin, MediaRootMixin, create_paper
+
+
+@override_settings(FEED_SIZE=3)
+class FeedsTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lg = Subject.objects.create(short_name='cs.LG', full_name='Machine Learning')
+        self.papers = []
+        for day in range(1, 6):
+            paper = create_paper(f'2401.0000{day}', f'Paper {day} & more', datetime.date(2024, 1, day),
+                                 summary=f'Summary {day}', abstract=f'Abstract {day}',
+                                 primary_subject=self.lg if day % 2 else None)
+            paper.authors.add(Author.objects.create(name=f'Author {day}'))
+            subjects.index_paper(paper)
+            self.papers.append(paper)
+
+    def read(self, name: str, extension: str) -> bytes:
+        with open(feeds.feed_path(name, extension), 'rb') as f:
+            return f.read()
+
+    def test_newest_papers_in_every_format(self):
+        self.assertEqual(feeds.regenerate(), 6)
+        items = json.loads(self.read('all', 'json'))['items']
+        self.assertEqual([item['title'] for item in items], ['Paper 5 & more', 'Paper 4 & more', 'Paper 3 & more'])
+        self.assertEqual(items[0]['authors'], [{'name': 'Author 5'}])
+        self.assertEqual((items[0]['tags'], items[1]['tags']), (['cs.LG'], []))
+        self.assertEqual(items[0]['url'], self.papers[4].abstract_link())
+
+        rss = ElementTree.fromstring(self.read('all', 'rss'))
+        self.assertEqual([item.findtext('title') for item in rss.iter('item')],
+                         ['Paper 5 & more', 'Paper 4 & more', 'Paper 3 & more'])
+        atom = ElementTree.fromstring(self.read('all', 'atom'))
+        self.assertEqual(len(atom.findall('{http://www.w3.org/2005/Atom}entry')), 3)
+
+    def test_subject_feeds(self):
+        feeds.regenerate([self.lg.id])
+        items = json.loads(self.read('subjects/cs.LG', 'json'))['items']
+        self.assertEqual([item['title'] for item in items], ['Paper 5 & more', 'Paper 3 & more', 'Paper 1 & more'])
+        self.assertEqual(json.loads(self.read('subjects/cs.LG', 'json'))['title'], 'papers.day: Machine Learning')
+        self.assertEqual(feeds.subject_feed_name('math/AG x'), 'subjects/math_AG_x')
+
+    def test_unchanged_feeds_are_not_rewritten(self):
+        feeds.regenerate()
+        path = feeds.feed_path('all', 'rss')
+        os.utime(path, (0, 0))
+        self.assertEqual(feeds.regenerate(), 0)
+        self.assertEqual(os.path.getmtime(path), 0)
+        self.assertEqual(sorted(name for name in os.listdir(settings.FEEDS_DIR) if name.startswith('.')), [])
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('generate_feeds', '-s', 'cs.LG', stdout=stdout)
+        self.assertIn('Wrote 6 feed files', stdout.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Unknown subjects: cs.XX'):
+            call_command('generate_feeds', '-s', 'cs.XX')
@@ -0,0 +1,109 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, override_settings
+
+from scraper import images
+from scraper.images import normalize_image, normalize_images
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def fake_normalize_image(path: str, *limits):
+    # stands in for normalize_image in the worker processes, it is pickled by name
+    if path.endswith('slow'):
+        time.sleep(30)
+    if path.endswith('crash'):
+        # the images submitted before it are done by then
+        time.sleep(0.2)
+        os._exit(1)
+    return path
+
+
+@skipUnless(Image, 'Pillow is not installed')
+class NormalizeImageTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def save(self, image, name: str, **options) -> str:
+        path = os.path.join(self.directory, name)
+        image.save(path, **options)
+        return path
+
+    def normalize(self, path: str, max_pixels: int = 10000000, max_dimension: int = 2048,
+                  max_bytes: int = 500000):
+        with mock.patch('builtins.print'):
+            return normalize_image(path, max_pixels, max_dimension, max_bytes)
+
+    def test_too_many_pixels_are_rejected(self):
+        path = self.save(Image.new('RGB', (200, 100)), 'large.png')
+        self.assertIsNone(self.normalize(path, max_pixels=200 * 100 - 1))
+        self.assertEqual(self.normalize(path, max_pixels=200 * 100)[2:], (200, 100))
+
+    def test_large_images_are_scaled_down(self):
+        path = self.save(Image.new('RGB', (400, 100), 'white'), 'wide.jpg')
+        normalized = self.normalize(path, max_dimension=200)
+        self.assertEqual((normalized.extension, normalized.width, normalized.height), ('jpg', 200, 50))
+
+    def test_metadata_is_dropped(self):
+        from PIL import PngImagePlugin
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Author', 'Jane Smith')
+        normalized = self.normalize(self.save(Image.new('RGB', (10, 10)), 'figure.png', pnginfo=info))
+        self.assertEqual(normalized.extension, 'png')
+        self.assertNotIn(b'Jane Smith', normalized.content)
+
+    def test_animations_keep_their_first_frame(self):
+        frames = [Image.new('P', (20, 10), color) for color in (1, 2, 3)]
+        path = self.save(frames[0], 'animated.gif', save_all=True, append_images=frames[1:])
+        normalized = self.normalize(path)
+        self.assertEqual((normalized.extension, normalized.width, normalized.height), ('png', 20, 10))
+        with Image.open(path) as first, Image.open(io.BytesIO(normalized.content)) as result:
+            self.assertEqual(getattr(result, 'n_frames', 1), 1)
+            self.assertEqual(list(result.convert('RGB').getdata()), list(first.convert('RGB').getdata()))
+
+    def test_large_opaque_pngs_become_jpegs(self):
+        noise = Image.effect_noise((300, 300), 100).convert('RGB')
+        self.assertEqual(self.normalize(self.save(noise, 'photo.png'), max_bytes=1000).extension, 'jpg')
+        transparent = noise.convert('RGBA')
+        self.assertEqual(self.normalize(self.save(transparent, 'cutout.png'), max_bytes=1000).extension, 'png')
+
+    def test_broken_files_are_skipped(self):
+        path = os.path.join(self.directory, 'truncated.png')
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + b'\x00' * 20)
+        self.assertIsNone(self.normalize(path))
+
+
+@override_settings(IMAGE_WORKERS=2, IMAGE_TIMEOUT=1)
+class NormalizeImagesTests(SimpleTestCase):
+    def setUp(self):
+        images._replace_pool()
+        self.addCleanup(images._replace_pool)
+        patch = mock.patch.object(images, 'normalize_image', fake_normalize_image)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def normalize(self, paths: list) -> list:
+        with mock.patch('builtins.print') as output:
+            results = normalize_images(paths)
+        self.messages = [call.args[0] for call in output.call_args_list]
+        return results
+
+    def test_slow_images_are_skipped(self):
+        self.assertEqual(self.normalize(['a', 'slow', 'b']), ['a', None, 'b'])
+        self.assertEqual(self.messages, ['Skipped image which timed out: slow'])
+
+    def test_crashed_worker_pool_is_replaced(self):
+        self.assertEqual(self.normalize(['a', 'crash', 'b']), ['a', None, 'b'])
+        self.assertEqual(self.messages, ['Skipped image which crashed its worker: crash'])
+        # the replacement pool works
+        self.assertEqual(self.normalize(['c']), ['c'])
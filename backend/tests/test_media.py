@@ -0,0 +1,56 @@
+import os
+import time
+
+from django.test import SimpleTestCase, TestCase
+
+from backend import media
+from backend.models import PaperImage
+from backend.testing import MediaRootMixin, create_paper
+
+
+class MediaDiffTests(SimpleTestCase):
+    def test_diff_merges_sorted_streams(self):
+        stored = [('images/a.png', '/m/images/a.png'), ('images/b.png', '/m/images/b.png'),
+                  ('images/d.png', '/m/images/d.png')]
+        referenced = ['images/b.png', 'images/c.png', 'images/d.png', 'images/e.png']
+        self.assertEqual(list(media.diff(stored, referenced)), [
+            ('images/a.png', '/m/images/a.png'), ('images/c.png', None), ('images/e.png', None)])
+
+    def test_diff_of_empty_streams(self):
+        self.assertEqual(list(media.diff([], ['pdfs/a.pdf'])), [('pdfs/a.pdf', None)])
+        self.assertEqual(list(media.diff([('pdfs/a.pdf', '/m/pdfs/a.pdf')], [])), [('pdfs/a.pdf', '/m/pdfs/a.pdf')])
+        self.assertEqual(list(media.diff([('pdfs/a.pdf', '/m/pdfs/a.pdf')], ['pdfs/a.pdf'])), [])
+
+
+class MediaGarbageTests(MediaRootMixin, TestCase):
+    def write(self, name: str, age: int = 7200) -> str:
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 10)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_stored_files_sort_like_names(self):
+        for name in ('images/a.png', 'images/a-b.png', 'images/a/x.png', 'images/a0.png'):
+            self.write(name)
+        names = [name for name, _ in media.stored_files('images')]
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(names), 4)
+
+    def test_collect_garbage(self):
+        paper = create_paper(pdf='pdfs/kept.pdf', screenshot='screenshots/missing.png')
+        PaperImage.objects.create(paper=paper, image='images/kept.png')
+        kept = [self.write('pdfs/kept.pdf'), self.write('images/kept.png')]
+        orphan = self.write('images/orphan.png')
+        fresh = self.write('pdfs/fresh.pdf', age=0)
+
+        stats = media.collect_garbage(delete=False, min_age=3600)
+        self.assertEqual(stats, {'orphans': 1, 'orphan_bytes': 10, 'deleted': 0, 'missing': 1})
+        self.assertTrue(os.path.exists(orphan))
+
+        stats = media.collect_garbage(delete=True, min_age=3600)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(all(os.path.exists(path) for path in kept + [fresh]))
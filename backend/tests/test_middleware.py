@@ -0,0 +1,81 @@
+from django.http import HttpResponse
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase, override_settings
+
+from backend.middleware import QueryStatsMiddleware, request_stats
+from backend.models import Author
+from backend.testing import LocalCacheMixin
+
+
+def count_authors(request):
+    return HttpResponse(str(Author.objects.count()))
+
+
+async def acount_authors(request):
+    return HttpResponse(str(await Author.objects.acount()))
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=1.0, QUERY_STATS_SLOW_MS=1000)
+class QueryStatsMiddlewareTests(TestCase):
+    def setUp(self):
+        request_stats.reset()
+        self.addCleanup(request_stats.reset)
+        self.request = RequestFactory().get('/api/papers/')
+
+    def test_requests_record_their_queries(self):
+        Author.objects.create(name='Jane Smith')
+        response = QueryStatsMiddleware(count_authors)(self.request)
+        self.assertEqual(response.content, b'1')
+        stats = request_stats.snapshot()['unresolved']
+        self.assertEqual((stats['requests'], stats['avg_sql_count'], stats['avg_response_bytes']), (1, 1, 1))
+        self.assertGreaterEqual(stats['max_total_ms'], stats['avg_sql_ms'])
+
+    @override_settings(QUERY_STATS_SLOW_MS=0)
+    def test_slow_requests_are_logged_with_their_queries(self):
+        with self.assertLogs('backend.middleware', 'WARNING') as logs:
+            QueryStatsMiddleware(count_authors)(self.request)
+        self.assertIn('1 queries in', logs.output[0])
+        self.assertIn('FROM "backend_author"', logs.output[0])
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0.0)
+    def test_requests_outside_the_sample_are_not_recorded(self):
+        QueryStatsMiddleware(count_authors)(self.request)
+        self.assertEqual(request_stats.snapshot(), {})
+
+    async def test_async_requests_record_their_queries(self):
+        middleware = QueryStatsMiddleware(acount_authors)
+        response = await middleware(self.request)
+        self.assertEqual(response.content, b'0')
+        stats = request_stats.snapshot()['unresolved']
+        self.assertEqual((stats['requests'], stats['avg_sql_count'], stats['avg_response_bytes']), (1, 1, 1))
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0.0, QUERY_STATS_SLOW_MS=0)
+    def test_slow_requests_outside_the_sample_are_logged(self):
+        with self.assertLogs('backend.middleware', 'WARNING') as logs:
+            QueryStatsMiddleware(count_authors)(self.request)
+        self.assertEqual(request_stats.snapshot(), {})
+        self.assertIn('Slow request: GET /api/papers/', logs.output[0])
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0.0, QUERY_STATS_SLOW_MS=0)
+    async def test_slow_async_requests_outside_the_sample_are_logged(self):
+        with self.assertLogs('backend.middleware', 'WARNING'):
+            await QueryStatsMiddleware(acount_authors)(self.request)
+        self.assertEqual(request_stats.snapshot(), {})
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=1.0)
+class RequestStatsApiTests(LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        request_stats.reset()
+        self.addCleanup(request_stats.reset)
+
+    def test_stats_per_view_for_staff_only(self):
+        self.client.get('/api/subjects/')
+        self.client.get('/api/subjects/')
+        self.assertEqual(self.client.get('/api/stats/').status_code, 302)
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        stats = self.client.get('/api/stats/?reset=1').json()
+        self.assertEqual(stats['views']['homepage:subjects_api']['requests'], 2)
+        self.assertIn('cache', stats)
+        self.assertNotIn('homepage:subjects_api', self.client.get('/api/stats/').json()['views'])
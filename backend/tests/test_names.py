@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+
+from backend.names import initials_key, is_initials_key, normalize_author_name
+
+
+class NormalizeAuthorNameTests(SimpleTestCase):
+    def test_spellings_of_a_name_share_a_key(self):
+        for name in ('John Smith', 'Jöhn  SMITH', 'Smith, John', 'John Smith, Jr.', 'Smith, John, Jr.',
+                     'John Smith III'):
+            self.assertEqual(normalize_author_name(name), 'smith john', name)
+
+    def test_given_names_tell_people_apart(self):
+        keys = {normalize_author_name(name) for name in ('W. Wang', 'Wei Wang', 'Wen Wang')}
+        self.assertEqual(keys, {'wang w', 'wang wei', 'wang wen'})
+        self.assertEqual(normalize_author_name('Smith, John'), normalize_author_name('John Smith'))
+        self.assertNotEqual(normalize_author_name('Smith, John'), normalize_author_name('Smith John'))
+
+    def test_middle_names_and_other_scripts(self):
+        self.assertEqual(normalize_author_name('J. R. R. Tolkien'), 'tolkien j r r')
+        self.assertEqual(normalize_author_name('Jean-Pierre Dupont'), 'dupont jean-pierre')
+        self.assertEqual(normalize_author_name('Иван Петров'), 'петров иван')
+        self.assertEqual(normalize_author_name('王小明'), '王小明')
+        self.assertEqual(normalize_author_name(' ?! '), '?!')
+
+    def test_initials(self):
+        self.assertEqual(initials_key(normalize_author_name('John Smith')), 'smith j')
+        self.assertEqual(initials_key(normalize_author_name('J. Smith')), 'smith j')
+        self.assertEqual(initials_key('王小明'), '王小明')
+        self.assertTrue(is_initials_key('smith j r'))
+        self.assertFalse(is_initials_key('smith john'))
@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from backend import papertext
+
+
+class PaperTextTests(TestCase):
+    def test_postings_round_trip(self):
+        for paper_ids in ([], [7], [1, 2, 3, 100000, 4000000000]):
+            self.assertEqual(papertext._decode(papertext._encode(paper_ids)), paper_ids)
+
+    def test_strip_tex_keeps_prose(self):
+        tex = ('\\documentclass{article}\\begin{document}\\section{Intro} We study $x^2$ \\emph{graphs} % note\n'
+               '\\begin{equation}E=mc^2\\end{equation} as in~\\cite{smith}.\\end{document}')
+        self.assertEqual(papertext.normalize(papertext.strip_tex(tex)), 'Intro We study graphs as in .')
+
+    def index(self, texts: dict) -> None:
+        papertext.index_texts({paper_id: papertext.normalize(text) for paper_id, text in texts.items()})
+
+    def test_body_matches(self):
+        self.index({1: 'Sparse attention for long documents', 2: 'Dense attention in vision transformers',
+                    3: 'Sparse graph transformers'})
+        self.assertEqual(papertext.body_matches('sparse transformers ', 10), {3})
+        self.assertEqual(papertext.body_matches('attention', 10), {1, 2})
+        self.assertEqual(papertext.body_matches('nothing here ', 10), set())
+
+    def test_last_word_is_a_prefix_until_followed_by_a_space(self):
+        self.index({1: 'transformers', 2: 'transfer learning'})
+        self.assertEqual(papertext.body_matches('trans', 10), {1, 2})
+        self.assertEqual(papertext.body_matches('trans ', 10), set())
+        self.assertEqual(papertext.body_matches('transf', 10), {1, 2})
+
+    def test_queries_without_index_terms(self):
+        self.index({1: 'the cat'})
+        self.assertIsNone(papertext.body_matches('the of', 10))
+        self.assertIsNone(papertext.body_matches('a', 10))
+
+    def test_too_many_matches(self):
+        self.index({paper_id: 'common words' for paper_id in range(1, 6)})
+        self.assertEqual(papertext.body_matches('common ', 4), papertext.TOO_MANY)
+        self.assertEqual(papertext.body_matches('common ', 5), {1, 2, 3, 4, 5})
+
+    def test_indexing_again_adds_to_chunks(self):
+        self.index({1: 'quantum', papertext.CHUNK_PAPERS + 1: 'quantum'})
+        self.index({2: 'quantum computing'})
+        self.assertEqual(papertext.body_matches('quantum ', 10), {1, 2, papertext.CHUNK_PAPERS + 1})
+        self.assertEqual(papertext.body_matches('quantum comp', 10), {2})
@@ -0,0 +1,77 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from backend import ingest
+from backend.models import ArxivPaper, PaperCounter
+from backend.ranking import hot_score
+from backend.testing import LocalCacheMixin, MediaRootMixin, create_paper
+
+DAY = datetime.date(2024, 1, 10)
+
+
+@override_settings(HOT_SCORE_DAYS_PER_POINT=3.0, HOT_SCORE_CITATIONS_WEIGHT=1.0,
+                   HOT_SCORE_AUTHOR_CITATIONS_WEIGHT=0.5, HOT_SCORE_CLICKS_WEIGHT=1.0)
+class HotScoreTests(SimpleTestCase):
+    def test_tenfold_inputs_are_worth_days_of_recency(self):
+        base = hot_score(DAY, 9, 0)
+        self.assertAlmostEqual(hot_score(DAY, 99, 0) - base, 1)
+        self.assertAlmostEqual(hot_score(DAY + datetime.timedelta(days=3), 9, 0) - base, 1)
+        self.assertAlmostEqual(hot_score(DAY, 9, 99) - base, 0.5 * 2)
+        self.assertAlmostEqual(hot_score(DAY, 9, 0, clicks=9) - base, 1)
+
+    def test_negative_inputs_count_as_zero(self):
+        self.assertEqual(hot_score(DAY, -5, -1, -3), hot_score(DAY, 0, 0, 0))
+
+
+class HotFeedTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def create_paper(self, arxiv_id: str, publication_date: datetime.date, citations: int = 0) -> ArxivPaper:
+        paper = create_paper(arxiv_id, publication_date=publication_date, citations=citations,
+                             screenshot=f'screenshots/{arxiv_id}.png')
+        paper.hot_score = hot_score(paper.publication_date, paper.citations, paper.total_author_citations)
+        paper.save()
+        return paper
+
+    def hot_feed(self) -> list:
+        return [paper['arxiv_id'] for paper in self.client.get('/api/papers/?sort=hot').json()]
+
+    def update_hot_scores(self, *args) -> str:
+        stdout = StringIO()
+        call_command('update_hot_scores', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_cited_papers_outrank_newer_ones(self):
+        self.create_paper('2401.00001', DAY, citations=1000)
+        self.create_paper('2401.00002', DAY + datetime.timedelta(days=1))
+        self.assertEqual(self.hot_feed(), ['2401.00001', '2401.00002'])
+        self.assertEqual([paper['arxiv_id'] for paper in self.client.get('/api/papers/').json()],
+                         ['2401.00002', '2401.00001'])
+
+    def test_clicks_are_picked_up_by_the_update(self):
+        older = self.create_paper('2401.00001', DAY)
+        self.create_paper('2401.00002', DAY + datetime.timedelta(days=1))
+        PaperCounter.objects.create(paper=older, clicks=1000, modified_at=timezone.now())
+        self.assertIn('Updated 1 hot scores', self.update_hot_scores())
+        self.assertGreater(ArxivPaper.objects.get(id=older.id).hot_score,
+                           ArxivPaper.objects.get(arxiv_id='2401.00002').hot_score)
+        self.assertIn('Updated 0 hot scores', self.update_hot_scores())
+
+    def test_only_recent_changes_unless_all(self):
+        paper = self.create_paper('2401.00001', DAY)
+        ArxivPaper.objects.filter(id=paper.id).update(hot_score=0,
+                                                      modified_at=timezone.now() - datetime.timedelta(days=2))
+        self.assertIn('Updated 0 hot scores', self.update_hot_scores())
+        self.assertIn('Updated 1 hot scores', self.update_hot_scores('--all'))
+        self.assertEqual(ArxivPaper.objects.get(id=paper.id).hot_score, paper.hot_score)
+
+    def test_ingest_scores_a_paper_when_another_step_fails(self):
+        paper = create_paper('2401.00001', publication_date=DAY, citations=10)
+        with mock.patch('backend.subjects.index_paper', side_effect=RuntimeError('down')), \
+                mock.patch('sys.stdout', new_callable=StringIO) as stdout:
+            ingest.paper_ingested(paper)
+        self.assertIn('[2401.00001] Error occurred while adding paper to the subject index: down', stdout.getvalue())
+        self.assertEqual(ArxivPaper.objects.get(id=paper.id).hot_score, hot_score(DAY, 10, 0))
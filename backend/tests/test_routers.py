@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase
+
+from backend.models import ArxivPaper
+from papers.routers import ReplicaRouter, use_replica
+
+router = ReplicaRouter()
+
+
+def databases(request):
+    return router.db_for_read(ArxivPaper), router.db_for_write(ArxivPaper)
+
+
+@mock.patch('papers.routers.replica_configured', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/api/papers/')
+
+    def test_reads_of_replica_views_go_to_the_replica(self, _):
+        self.assertEqual(use_replica(databases)(self.request), ('replica', 'default'))
+        # and nothing else's
+        self.assertEqual(databases(self.request), ('default', 'default'))
+
+    def test_without_a_replica_everything_goes_to_the_primary(self, replica_configured):
+        replica_configured.return_value = False
+        self.assertEqual(use_replica(databases)(self.request), ('default', 'default'))
+
+    def test_failing_view_resets_the_routing(self, _):
+        def fail(request):
+            raise RuntimeError('broken view')
+        with self.assertRaises(RuntimeError):
+            use_replica(fail)(self.request)
+        self.assertEqual(databases(self.request), ('default', 'default'))
+
+    async def test_async_views_and_their_sync_calls(self, _):
+        @use_replica
+        async def view(request):
+            return databases(request), await sync_to_async(databases)(request)
+        self.assertEqual(await view(self.request), (('replica', 'default'), ('replica', 'default')))
+        self.assertEqual(databases(self.request), ('default', 'default'))
+
+    def test_only_the_primary_is_migrated(self, _):
+        self.assertTrue(router.allow_migrate('default', 'backend'))
+        self.assertFalse(router.allow_migrate('replica', 'backend'))
+
+
+class AsgiSettingsTests(SimpleTestCase):
+    def test_asgi_turns_on_async_views_without_persistent_connections(self):
+        env = {name: value for name, value in os.environ.items()
+               if name not in ('DJANGO_SETTINGS_MODULE', 'ASYNC_VIEWS', 'DB_CONN_MAX_AGE')}
+        code = ('import papers.asgi; from django.conf import settings; '
+                'print(settings.ASYNC_VIEWS, settings.DATABASES["default"]["CONN_MAX_AGE"])')
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env, capture_output=True,
+                                text=True, check=True)
+        self.assertEqual(result.stdout.split(), ['True', '0'])
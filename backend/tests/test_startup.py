@@ -0,0 +1,16 @@
+from django.test import SimpleTestCase
+
+from backend.benchmarks.scenarios import StartupScenario, startup_scenarios
+
+
+class StartupTests(SimpleTestCase):
+    def test_heavy_dependencies_are_imported_lazily(self):
+        # each scenario fails if its interpreter imported PyMuPDF, openai, scholarly and friends at startup
+        for scenario in startup_scenarios():
+            with self.subTest(scenario.name):
+                scenario.run()
+
+    def test_eager_imports_are_caught(self):
+        scenario = StartupScenario('import:json', ['-c', 'import json'], ('json',))
+        with self.assertRaisesRegex(AssertionError, 'json'):
+            scenario.run()
@@ -0,0 +1,53 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from papers import storage
+
+STORAGES = dict(settings.STORAGES, staticfiles={'BACKEND': 'papers.storage.CompressedManifestStaticFilesStorage'})
+SOURCE = os.path.join(settings.BASE_DIR, 'homepage', 'static')
+
+
+class CompressedManifestStorageTests(SimpleTestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root, True)
+        static = override_settings(STATIC_ROOT=self.static_root, STORAGES=STORAGES)
+        static.enable()
+        self.addCleanup(static.disable)
+        call_command('collectstatic', '--noinput', '-i', 'admin', verbosity=0)
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as f:
+            self.paths = json.load(f)['paths']
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.static_root, name), 'rb') as f:
+            return f.read()
+
+    def test_files_get_hashed_names(self):
+        hashed = self.paths['js/main.js']
+        self.assertRegex(hashed, r'^js/main\.[0-9a-f]{12}\.js$')
+        self.assertEqual(staticfiles_storage.url('js/main.js'), settings.STATIC_URL + hashed)
+
+    @skipUnless(storage.rjsmin and storage.rcssmin, 'rjsmin or rcssmin is not installed')
+    def test_css_and_js_are_minified(self):
+        for name in ('js/main.js', 'css/main.css'):
+            with open(os.path.join(SOURCE, name), 'rb') as f:
+                original = f.read()
+            self.assertLess(len(self.read(self.paths[name])), len(original), name)
+
+    def test_compressed_variants_match_the_hashed_file(self):
+        hashed = self.paths['js/main.js']
+        self.assertEqual(gzip.decompress(self.read(hashed + '.gz')), self.read(hashed))
+        if storage.brotli:
+            self.assertEqual(storage.brotli.decompress(self.read(hashed + '.br')), self.read(hashed))
+        # already compressed
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, self.paths['favicon.png'] + '.gz')))
+        self.assertEqual(storage.gzip_compress(b'same input'), storage.gzip_compress(b'same input'))
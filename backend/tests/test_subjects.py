@@ -0,0 +1,87 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from backend import ingest, subjects
+from backend.models import Subject, SubjectPaper
+from backend.testing import LocalCacheMixin, MediaRootMixin, create_paper
+
+
+class SubjectIndexTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lg = Subject.objects.create(short_name='cs.LG', full_name='Machine Learning')
+        self.cl = Subject.objects.create(short_name='cs.CL', full_name='Computation and Language')
+        self.cv = Subject.objects.create(short_name='cs.CV', full_name='Computer Vision')
+        # day n: odd days are cs.LG, every third day cs.CL too, primary subject cs.CL on even days
+        self.papers = []
+        for day in range(1, 21):
+            paper = create_paper(publication_date=datetime.date(2024, 1, day),
+                                 primary_subject=self.cl if day % 2 == 0 else None)
+            if day % 2:
+                paper.subjects.add(self.lg)
+            if day % 3 == 0:
+                paper.subjects.add(self.cl)
+            subjects.index_paper(paper)
+            self.papers.append(paper)
+
+    def expected(self, *subject_ids) -> list:
+        ids = [paper.id for paper in self.papers if (paper.primary_subject_id in subject_ids or
+               paper.subjects.filter(id__in=subject_ids).exists())]
+        return ids[::-1]
+
+    def test_parse_subjects(self):
+        self.assertEqual(subjects.parse_subjects('cs.LG+cs.CL'), sorted([self.lg.id, self.cl.id]))
+        self.assertEqual(subjects.parse_subjects('cs.CL, cs.CL cs.LG'), sorted([self.lg.id, self.cl.id]))
+        with self.assertRaisesMessage(ValueError, 'Unknown subjects: cs.XX'):
+            subjects.parse_subjects('cs.LG+cs.XX')
+        with self.assertRaisesMessage(ValueError, 'At most'):
+            subjects.parse_subjects('+'.join(['cs.LG'] * (subjects.MAX_SUBJECTS + 1)))
+
+    def test_merged_feed_has_every_paper_once(self):
+        feed = subjects.newest_paper_ids([self.lg.id, self.cl.id], 0, 50)
+        self.assertEqual(feed, self.expected(self.lg.id, self.cl.id))
+        self.assertEqual(len(feed), 20)
+        self.assertEqual(subjects.newest_paper_ids([self.cl.id], 0, 50), self.expected(self.cl.id))
+        self.assertEqual(subjects.newest_paper_ids([self.cv.id], 0, 50), [])
+
+    def test_date_range(self):
+        feed = subjects.newest_paper_ids([self.lg.id], 0, 50, (datetime.date(2024, 1, 5), datetime.date(2024, 1, 9)))
+        self.assertEqual(feed, [self.papers[8].id, self.papers[6].id, self.papers[4].id])
+
+    def test_next_pages_continue_from_the_previous_one(self):
+        subject_ids = [self.lg.id, self.cl.id]
+        pages = [subjects.newest_paper_ids(subject_ids, start, 6) for start in range(0, 24, 6)]
+        self.assertEqual(sum(pages, []), self.expected(self.lg.id, self.cl.id))
+        # a continued page reads one page of rows per subject, not every row before it
+        subjects.newest_paper_ids(subject_ids, 0, 3)
+        with CaptureQueriesContext(connection) as queries:
+            subjects.newest_paper_ids(subject_ids, 3, 3)
+        self.assertTrue(all('LIMIT 3' in query['sql'] for query in queries.captured_queries
+                            if 'backend_subjectpaper' in query['sql']))
+
+    @override_settings(SUBJECT_FEED_MAX_START=10)
+    def test_deep_pages_need_the_page_before(self):
+        self.assertEqual(subjects.newest_paper_ids([self.lg.id, self.cl.id], 12, 6), [])
+        self.assertEqual(subjects.newest_paper_ids([self.lg.id, self.cl.id], 6, 6),
+                         self.expected(self.lg.id, self.cl.id)[6:12])
+        self.assertEqual(subjects.newest_paper_ids([self.lg.id, self.cl.id], 12, 6),
+                         self.expected(self.lg.id, self.cl.id)[12:18])
+
+    def test_rebuild_matches_the_incremental_index(self):
+        incremental = set(SubjectPaper.objects.values_list('subject_id', 'paper_id', 'publication_date'))
+        self.assertEqual(subjects.rebuild_index(), len(incremental))
+        self.assertEqual(set(SubjectPaper.objects.values_list('subject_id', 'paper_id', 'publication_date')),
+                         incremental)
+
+    def test_counts_are_cached_until_a_paper_is_indexed(self):
+        counts = {row['short_name']: row['count'] for row in subjects.subject_counts()}
+        self.assertEqual(counts, {'cs.LG': 10, 'cs.CL': 13})
+        paper = create_paper(publication_date=datetime.date(2024, 2, 1))
+        paper.subjects.add(self.cv)
+        self.assertNotIn('cs.CV', [row['short_name'] for row in subjects.subject_counts()])
+        ingest.paper_ingested(paper)
+        self.assertEqual(subjects.subject_counts()[-1], {'short_name': 'cs.CV', 'full_name': 'Computer Vision',
+                                                          'count': 1})
@@ -0,0 +1,95 @@
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from backend.models import ArxivPaper, PaperSummary
+from backend.testing import LocalCacheMixin, MediaRootMixin, ScraperStateMixin, create_paper
+from scraper import summaries
+from scraper.summaries import TokenBudget, estimate_tokens, resummarize
+
+
+class FakeClient:
+    """
+    Stands in for the OpenAI client, every completion uses 10 prompt and 5 completion tokens
+    """
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+        self.requests = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: list, **options):
+        content = messages[-1]['content']
+        with self._lock:
+            self.requests.append(content)
+        if self.fail_on and self.fail_on in content:
+            raise RuntimeError('rate limited')
+        message = SimpleNamespace(content=f' Summary of {content.splitlines()[0]} ')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+
+class TokenBudgetTests(SimpleTestCase):
+    def test_total_budget_refuses_what_doesnt_fit(self):
+        budget = TokenBudget(total=100)
+        self.assertTrue(budget.reserve(60))
+        self.assertFalse(budget.reserve(60))
+        self.assertEqual(budget.used, 60)
+
+    def test_settling_returns_the_unused_reservation(self):
+        budget = TokenBudget(total=100)
+        budget.reserve(60)
+        budget.settle(60, 15)
+        self.assertEqual(budget.used, 15)
+        self.assertTrue(budget.reserve(60))
+
+    def test_per_minute_budget_waits_for_the_window(self):
+        budget = TokenBudget(per_minute=100)
+        with mock.patch('scraper.summaries.time.sleep') as sleep, \
+                mock.patch('scraper.summaries.time.monotonic', side_effect=[0, 0, 1, 61, 61]):
+            self.assertTrue(budget.reserve(60))
+            self.assertTrue(budget.reserve(60))
+        sleep.assert_called_once_with(59)
+
+
+class ResummarizeTests(ScraperStateMixin, MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # the same lengths, so every paper reserves the same estimate
+        self.papers = [create_paper(f'2401.0000{number}', f'Paper {number}', abstract=f'Abstract {number}')
+                       for number in range(1, 5)]
+        self.client_patch = mock.patch.object(summaries, 'openai_client', return_value=FakeClient())
+        self.client = self.client_patch.start().return_value
+        self.addCleanup(self.client_patch.stop)
+
+    def test_papers_are_summarized_once(self):
+        stats = resummarize('test-model', 'abstract-v2', batch_size=3, concurrency=2)
+        self.assertEqual(stats, {'summarized': 4, 'failed': 0, 'tokens': 60, 'budget_exhausted': False})
+        paper = ArxivPaper.objects.get(arxiv_id='2401.00001')
+        self.assertEqual((paper.summary, paper.summary_model, paper.summary_prompt),
+                         ('Summary of Title: Paper 1', 'test-model', 'abstract-v2'))
+        # a second run finds nothing left to do
+        self.assertEqual(resummarize('test-model', 'abstract-v2')['summarized'], 0)
+        self.assertEqual(len(self.client.requests), 4)
+
+    def test_stops_at_the_token_budget(self):
+        estimate = estimate_tokens('Paper 1', 'Abstract 1', 'abstract-v2')
+        # room for the estimate of one request next to what the first one actually used, not for a third
+        stats = resummarize('test-model', 'abstract-v2', concurrency=1, token_budget=estimate + 20)
+        self.assertEqual(stats, {'summarized': 2, 'failed': 0, 'tokens': 30, 'budget_exhausted': True})
+        self.assertEqual(ArxivPaper.objects.filter(summary_model='test-model').count(), 2)
+
+    def test_failed_papers_are_left_for_the_next_run(self):
+        self.client.fail_on = 'Paper 2'
+        stats = resummarize('test-model', 'abstract-v2')
+        self.assertEqual((stats['summarized'], stats['failed']), (3, 1))
+        self.client.fail_on = None
+        self.assertEqual(resummarize('test-model', 'abstract-v2')['summarized'], 1)
+
+    def test_variants_keep_the_papers_own_summaries(self):
+        resummarize('test-model', 'abstract-v1', variant=True, limit=2)
+        self.assertEqual(PaperSummary.objects.filter(model='test-model', prompt='abstract-v1').count(), 2)
+        self.assertFalse(ArxivPaper.objects.exclude(summary='').exists())
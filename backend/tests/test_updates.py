@@ -0,0 +1,94 @@
+import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from backend.authors import link_authors, unlink_authors
+from backend.models import ArxivPaper, Author, CoAuthorship
+from backend.testing import LocalCacheMixin, MediaRootMixin, ScraperStateMixin, create_paper
+from scraper.summaries import Summary
+from scraper.updates import update_papers
+
+
+def coauthors(author: Author) -> dict:
+    return dict(CoAuthorship.objects.filter(author=author).values_list('coauthor__name', 'paper_count'))
+
+
+class UnlinkAuthorsTests(TestCase):
+    def setUp(self):
+        self.ada, self.bob, self.cy = [Author.objects.create(name=name) for name in ('Ada', 'Bob', 'Cy')]
+        self.old = create_paper(publication_date=datetime.date(2024, 1, 1))
+        self.new = create_paper(publication_date=datetime.date(2024, 2, 1))
+        link_authors(self.old, [self.ada, self.bob])
+        link_authors(self.new, [self.ada, self.bob, self.cy])
+
+    def test_unlinking_undoes_the_counts(self):
+        unlink_authors(self.new, [self.bob.id])
+        self.assertEqual(list(self.new.authors.order_by('name')), [self.ada, self.cy])
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.paper_count, self.bob.latest_paper_date), (1, datetime.date(2024, 1, 1)))
+        self.assertEqual(coauthors(self.bob), {'Ada': 1})
+        self.assertEqual(coauthors(self.ada), {'Bob': 1, 'Cy': 1})
+        self.assertEqual(coauthors(self.cy), {'Ada': 1})
+
+    def test_authors_left_without_papers(self):
+        unlink_authors(self.new, [self.cy.id])
+        self.cy.refresh_from_db()
+        self.assertEqual((self.cy.paper_count, self.cy.latest_paper_date), (0, None))
+        self.assertEqual(coauthors(self.cy), {})
+        # not linked, nothing to undo
+        unlink_authors(self.new, [self.cy.id])
+        self.cy.refresh_from_db()
+        self.assertEqual(self.cy.paper_count, 0)
+
+
+class UpdatePapersTests(ScraperStateMixin, MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.updated = timezone.now()
+        self.paper = create_paper('2401.00001', 'Old title', abstract='Old abstract', summary='Old summary')
+        self.unchanged = create_paper('2401.00002')
+        link_authors(self.paper, [Author.objects.create(name=name) for name in ('Ada', 'Bob')])
+        self.metadata = {'title': 'New title', 'abstract': 'New abstract', 'jref': '', 'comments': '', 'doi': '',
+                         'date': None, 'primary_subject': ('cs.LG', 'Machine Learning'),
+                         'subjects': [('cs.LG', 'Machine Learning')], 'authors': ['Ada', 'Cy']}
+        self.requested = []
+        for target, value in (('list_versions', mock.Mock(return_value={'2401.00001': (2, self.updated),
+                                                                         '2401.00002': (1, self.updated)})),
+                              ('conditional_get', self.conditional_get),
+                              ('parse_abstract_page', mock.Mock(return_value=self.metadata)),
+                              ('summarize', mock.Mock(return_value=Summary('New summary', 'model', 'prompt', 1, 1)))):
+            patch = mock.patch(f'scraper.updates.{target}', value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def conditional_get(self, url: str, validators: dict):
+        self.requested.append((url, validators))
+        if 'abs' in url:
+            return SimpleNamespace(status_code=200, content=b'<html></html>', headers={'ETag': '"v2"'})
+        return SimpleNamespace(status_code=304, headers={})
+
+    def test_newer_versions_are_updated(self):
+        self.assertEqual(update_papers(), [self.paper])
+        paper = ArxivPaper.objects.get(id=self.paper.id)
+        self.assertEqual((paper.version, paper.arxiv_updated_at, paper.etags['abs']),
+                         (2, self.updated, {'etag': '"v2"'}))
+        self.assertEqual((paper.title, paper.summary, paper.primary_subject.short_name),
+                         ('New title', 'New summary', 'cs.LG'))
+        # only the unchanged paper's publication time is remembered
+        self.assertEqual(ArxivPaper.objects.get(id=self.unchanged.id).arxiv_updated_at, self.updated)
+        self.assertEqual(len(self.requested), 3)
+
+    def test_dropped_authors_are_unlinked(self):
+        update_papers()
+        self.assertEqual(sorted(self.paper.authors.values_list('name', flat=True)), ['Ada', 'Cy'])
+        self.assertEqual(Author.objects.get(name='Bob').paper_count, 0)
+        self.assertEqual(coauthors(Author.objects.get(name='Ada')), {'Cy': 1})
+
+    def test_known_versions_are_not_fetched_again(self):
+        update_papers()
+        self.requested.clear()
+        self.assertEqual(update_papers(), [])
+        self.assertEqual(self.requested, [])
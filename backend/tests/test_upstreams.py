@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from backend.testing import ScraperStateMixin
+from scraper.upstreams import CircuitOpen, Upstream
+
+HOST = 'example.org'
+
+
+class FakeClock:
+    """
+    time.time which only moves when time.sleep is called
+    """
+
+    def __init__(self):
+        self.now = 1000000.0
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class UpstreamTests(ScraperStateMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        fake_time = SimpleNamespace(time=self.clock.time, sleep=self.clock.sleep, strftime=time.strftime,
+                                    localtime=time.localtime)
+        patch = mock.patch('scraper.upstreams.time', fake_time)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def configure(self, **options):
+        options = {'rate': 1.0, 'burst': 2, 'failures': 2, 'cooldown': 60, 'pause': False, **options}
+        upstreams = override_settings(SCRAPER_UPSTREAMS={HOST: options})
+        upstreams.enable()
+        self.addCleanup(upstreams.disable)
+
+    def fail(self, upstream: Upstream) -> None:
+        with self.assertRaises(RuntimeError), upstream.request():
+            raise RuntimeError('502 Bad Gateway')
+
+    def test_token_bucket_allows_a_burst_then_paces(self):
+        self.configure()
+        upstream = Upstream(HOST)
+        for _ in range(3):
+            upstream.acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+        # a quiet spell refills the bucket up to the burst, not beyond
+        self.clock.now += 60
+        for _ in range(2):
+            upstream.acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+        self.assertEqual(upstream.stats['requests'], 5)
+
+    def test_processes_share_the_bucket(self):
+        self.configure()
+        Upstream(HOST).acquire()
+        Upstream(HOST).acquire()
+        Upstream(HOST).acquire()
+        self.assertEqual(self.clock.slept, [1.0])
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        self.configure(rate=None)
+        upstream = Upstream(HOST)
+        self.fail(upstream)
+        with upstream.request():
+            pass
+        # a success in between starts the count over
+        self.fail(upstream)
+        upstream.acquire()
+        self.fail(upstream)
+        with self.assertRaises(CircuitOpen):
+            upstream.acquire()
+        self.assertEqual(upstream.stats['rejected'], 1)
+        self.assertIn('breaker open', upstream.describe())
+
+    def test_half_open_breaker_closes_or_opens_on_the_first_request(self):
+        self.configure(rate=None)
+        upstream = Upstream(HOST)
+        self.fail(upstream)
+        self.fail(upstream)
+        self.clock.now += 60
+        self.assertIn('half-open', upstream.describe())
+        self.fail(upstream)
+        with self.assertRaises(CircuitOpen):
+            upstream.acquire()
+        self.clock.now += 60
+        with upstream.request():
+            pass
+        self.assertIn('breaker closed', upstream.describe())
+
+    def test_pausing_stages_wait_for_the_cooldown(self):
+        self.configure(rate=None, pause=True)
+        upstream = Upstream(HOST)
+        self.fail(upstream)
+        self.fail(upstream)
+        with mock.patch('builtins.print'):
+            upstream.acquire()
+        self.assertEqual(self.clock.slept, [60])
+
+    def test_server_errors_count_as_failures(self):
+        self.configure(rate=None)
+        upstream = Upstream(HOST)
+        with mock.patch('scraper.upstreams.requests.get', return_value=SimpleNamespace(status_code=503)):
+            upstream.get('https://example.org/')
+            upstream.get('https://example.org/')
+        with self.assertRaises(CircuitOpen):
+            upstream.get('https://example.org/')
+        self.assertEqual(upstream.stats['failures'], 2)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = "backend"
+
+urlpatterns = [
+    path("api/stats/", views.request_stats_api, name="request_stats_api"),
+]
@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 
-# Create your views here.
+from . import caching
+from .middleware import request_stats
+
+
+@staff_member_required
+def request_stats_api(request):
+    """
+    Per-view request stats collected by QueryStatsMiddleware and per policy cache hits and misses, both for this
+    worker. Pass reset=1 to clear them.
+    """
+    data = {
+        'since': request_stats.started_at,
+        'views': request_stats.snapshot(),
+        'cache': caching.stats.snapshot(),
+    }
+    if request.GET.get('reset'):
+        request_stats.reset()
+        caching.stats.reset()
+    return JsonResponse(data)
@@ -0,0 +1,103 @@
+import hashlib
+import string
+
+from django.conf import settings
+from django.db.models import Q
+
+from backend import ingest, papertext
+from backend.caching import search_results
+from backend.models import ArxivPaper
+
+# cached in place of a match list when a query matches too many papers to be worth caching
+TOO_BROAD = 'too-broad'
+
+# prefixes shorter than this match most of the corpus and are never cached
+MIN_PREFIX_LENGTH = 3
+
+# SQLite allows at most 999 parameters per query in older builds
+REFINE_BATCH_SIZE = 900
+
+# SQLite's LIKE only folds the case of ASCII letters, str.lower() would fold "Ü" into a query which doesn't match
+# "Ü" any more. Folding just these is right for PostgreSQL's UPPER() too, which folds the rest on its own.
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def search_filter(query: str) -> Q:
+    """
+    The filter behind a search box query, matching the summary, abstract, title or an author's name
+    """
+    return (
+        Q(summary__icontains=query) |
+        Q(abstract__icontains=query) |
+        Q(title__icontains=query) |
+        Q(authors__name__icontains=query)
+    )
+
+
+def _cache_key(query: str, version: int) -> str:
+    # keyed on the content version, so neither a query nor the queries refined from it miss newly ingested papers
+    return f'search:{version}:' + hashlib.sha1(query.encode()).hexdigest()
+
+
+def _scan(query: str, candidate_ids=None):
+    """
+    Run the search query, optionally only over candidate_ids. Body text matches come from their own index and are
+    looked up in full rather than refined: words too short or too common to be index terms are ignored there, so a
+    longer query's body matches need not be among its prefix's.
+    :return: (id, publication date ordinal) pairs, newest first, or TOO_BROAD
+    """
+    limit = settings.SEARCH_CACHE_MAX_RESULTS
+    if candidate_ids is None:
+        batches = [None]
+    else:
+        batches = [candidate_ids[i:i + REFINE_BATCH_SIZE] for i in range(0, len(candidate_ids), REFINE_BATCH_SIZE)]
+
+    matches = set()
+    for batch in batches:
+        papers = ArxivPaper.objects.filter(search_filter(query))
+        if batch is not None:
+            papers = papers.filter(id__in=batch)
+        matches.update(papers.values_list('id', 'publication_date').distinct()[:limit + 1])
+        if len(matches) > limit:
+            return TOO_BROAD
+
+    body_ids = papertext.body_matches(query, limit)
+    if body_ids == papertext.TOO_MANY:
+        return TOO_BROAD
+    if body_ids:
+        missing = sorted(body_ids - {paper_id for paper_id, _ in matches})
+        if len(matches) + len(missing) > limit:
+            return TOO_BROAD
+        for start in range(0, len(missing), REFINE_BATCH_SIZE):
+            matches.update(ArxivPaper.objects.filter(id__in=missing[start:start + REFINE_BATCH_SIZE])
+                           .values_list('id', 'publication_date'))
+    return sorted(((paper_id, day.toordinal()) for paper_id, day in matches), key=lambda m: (-m[1], -m[0]))
+
+
+def search_matches(query: str):
+    """
+    Find every paper matching a search query. Results are cached per query, and a longer query is answered
+    by refining the cached results of its longest cached prefix: anything containing "transformer" also
+    contains "transf", so there is no need to scan the whole table again as the user types.
+    :param query: The search box text
+    :return: (id, publication date ordinal) pairs, newest first, or None if the query matches too many
+    papers to cache and should be run directly
+    """
+    query = query.translate(ASCII_LOWER)
+    if len(query) < MIN_PREFIX_LENGTH:
+        return None
+    version = ingest.content_version()
+
+    def scan():
+        prefixes = [query[:length] for length in range(len(query) - 1, MIN_PREFIX_LENGTH - 1, -1)]
+        cached = search_results.get_many([_cache_key(prefix, version) for prefix in prefixes])
+        candidates = None
+        for prefix in prefixes:
+            prefix_matches = cached.get(_cache_key(prefix, version))
+            if prefix_matches is not None and prefix_matches != TOO_BROAD:
+                candidates = [paper_id for paper_id, _ in prefix_matches]
+                break
+        return _scan(query, candidates)
+
+    matches = search_results.get_or_compute(_cache_key(query, version), scan)
+    return None if matches == TOO_BROAD else matches
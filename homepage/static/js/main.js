@@ -1,3 +1,185 @@
+// how many papers the api returns per page
+const PAGE_SIZE = 15;
+// the fields a card renders, the api skips everything else
+const CARD_FIELDS = 'arxiv_id,image_url,title,summary,authors,publication_date,citations';
+// recent pages kept in memory and sessionStorage, and how long they stay fresh
+const PAGE_CACHE_SIZE = 50;
+const PAGE_CACHE_TTL = 5 * 60 * 1000;
+const PAGE_CACHE_PREFIX = 'papers-page:';
+
+// LRU of api responses keyed by url, mirrored into sessionStorage so it survives reloads
+var pageCache = new Map();
+// requests currently on the wire, so a prefetch and a scroll for the same page share one fetch
+var inflightPages = new Map();
+// aborts every request of the current query when the query or date range changes
+var queryController = new AbortController();
+var loadingMore = false;
+// short names of the selected subject filters, empty for all papers
+var selectedSubjects = [];
+// how many of the biggest subjects get a filter button
+const SUBJECT_BUTTONS = 8;
+
+function pageUrl(query, range, start) {
+    var url = '/api/papers/?d=' + range + '&fields=' + CARD_FIELDS;
+    if (query) {
+        url += '&q=' + encodeURIComponent(query);
+    }
+    if (selectedSubjects.length) {
+        url += '&subject=' + selectedSubjects.map(encodeURIComponent).join(',');
+    }
+    if (start) {
+        url += '&s=' + start;
+    }
+    return url;
+}
+
+function getCachedPage(url) {
+    var entry = pageCache.get(url);
+    if (!entry) {
+        try {
+            entry = JSON.parse(sessionStorage.getItem(PAGE_CACHE_PREFIX + url));
+        } catch (e) {
+            entry = null;
+        }
+    }
+    if (!entry || Date.now() - entry.time > PAGE_CACHE_TTL) {
+        return null;
+    }
+    // re-insert to mark as most recently used
+    pageCache.delete(url);
+    pageCache.set(url, entry);
+    return entry.data;
+}
+
+function setCachedPage(url, data) {
+    var entry = {time: Date.now(), data: data};
+    pageCache.delete(url);
+    pageCache.set(url, entry);
+    while (pageCache.size > PAGE_CACHE_SIZE) {
+        var oldest = pageCache.keys().next().value;
+        pageCache.delete(oldest);
+        sessionStorage.removeItem(PAGE_CACHE_PREFIX + oldest);
+    }
+    try {
+        sessionStorage.setItem(PAGE_CACHE_PREFIX + url, JSON.stringify(entry));
+    } catch (e) {
+        // storage full or disabled, the in-memory copy is enough
+    }
+}
+
+// fetch a page of papers, from the cache if possible
+function fetchPage(url) {
+    var cached = getCachedPage(url);
+    if (cached) {
+        return Promise.resolve(cached);
+    }
+    if (inflightPages.has(url)) {
+        return inflightPages.get(url);
+    }
+    var request = fetch(url, {signal: queryController.signal})
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        })
+        .then(data => {
+            setCachedPage(url, data);
+            return data;
+        })
+        .finally(() => {
+            if (inflightPages.get(url) === request) {
+                inflightPages.delete(url);
+            }
+        });
+    inflightPages.set(url, request);
+    return request;
+}
+
+// warm the cache with the page after the one just rendered
+function prefetchNextPage(query, start) {
+    if (!active_query) {
+        return;
+    }
+    fetchPage(pageUrl(query, date_range, start)).catch(() => {
+        // a failed prefetch is retried for real when the user scrolls there
+    });
+}
+
+// only load card images once they are close to the viewport
+var imageObserver = 'IntersectionObserver' in window ? new IntersectionObserver(function(entries, observer) {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            entry.target.src = entry.target.dataset.src;
+            observer.unobserve(entry.target);
+        }
+    });
+}, {rootMargin: '600px 0px'}) : null;
+
+// card views and clicks, reported to the server in batches
+const EVENT_FLUSH_INTERVAL = 5000;
+var pendingEvents = [];
+var viewedPapers = new Set();
+
+function recordEvent(arxivId, type) {
+    pendingEvents.push({arxiv_id: arxivId, type: type});
+    if (pendingEvents.length >= 100) {
+        flushEvents();
+    }
+}
+
+function flushEvents() {
+    if (pendingEvents.length === 0) {
+        return;
+    }
+    var body = JSON.stringify(pendingEvents.splice(0, 100));
+    if (!(navigator.sendBeacon && navigator.sendBeacon('/api/events/', body))) {
+        fetch('/api/events/', {method: 'POST', body: body, keepalive: true}).catch(() => {});
+    }
+}
+
+setInterval(flushEvents, EVENT_FLUSH_INTERVAL);
+document.addEventListener('visibilitychange', function() {
+    if (document.visibilityState === 'hidden') {
+        flushEvents();
+    }
+});
+
+// a card counts as viewed once half of it has been on screen
+var viewObserver = 'IntersectionObserver' in window ? new IntersectionObserver(function(entries, observer) {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            var arxivId = entry.target.dataset.arxivId;
+            if (!viewedPapers.has(arxivId)) {
+                viewedPapers.add(arxivId);
+                recordEvent(arxivId, 'view');
+            }
+            observer.unobserve(entry.target);
+        }
+    });
+}, {threshold: 0.5}) : null;
+
+function observeCards(container) {
+    if (!viewObserver) {
+        return;
+    }
+    container.querySelectorAll('.card[data-arxiv-id]:not([data-observed])').forEach(card => {
+        card.dataset.observed = '1';
+        viewObserver.observe(card);
+    });
+}
+
+function observeImages(container) {
+    container.querySelectorAll('img[data-src]:not([src])').forEach(img => {
+        if (imageObserver) {
+            imageObserver.observe(img);
+        }
+        else {
+            img.src = img.dataset.src;
+        }
+    });
+}
+
 // toggle showing all authors
 function toggleAuthors(event) {
       event.preventDefault();
@@ -33,9 +215,9 @@ function populatePapers(papersData, clear_old_papers=true) {
         }
       var paper = papersData[i];
       var paperHTML = `
-  <div class="card">
-    <a class="paper-link" href="https://arxiv.org/abs/${paper.arxiv_id}" target="_blank">
-      <img src="${paper.image_url}" class="card-img-top" alt="Paper Image">
+  <div class="card" data-arxiv-id="${paper.arxiv_id}">
+    <a class="paper-link" href="https://arxiv.org/abs/${paper.arxiv_id}" target="_blank" onclick="if (!event.defaultPrevented) recordEvent('${paper.arxiv_id}', 'click')">
+      <img data-src="${paper.image_url}" class="card-img-top" alt="Paper Image">
       <div class="card-body d-flex flex-column">
         <div class="card-title">${paper.title}</div>
         <p class="card-text paper-summary">${paper.summary}
@@ -98,6 +280,8 @@ function populatePapers(papersData, clear_old_papers=true) {
       papersContainer.insertAdjacentHTML('beforeend', paperHTML);
       all_papers.push(paper.arxiv_id);
     }
+    observeImages(papersContainer);
+    observeCards(papersContainer);
 }
 
 // format paper publication date
@@ -109,24 +293,84 @@ function formatPublicationDate(dateString) {
 
 // update the present papers
 function update(query=null, delete_old_papers=true) {
-    if (query) {
-      var url = '/api/papers/?q=' + encodeURIComponent(query) + '&d=' + date_range;
+    if (delete_old_papers) {
+        // a new query or date range, drop whatever the previous one still has in flight
+        queryController.abort();
+        queryController = new AbortController();
+        inflightPages.clear();
+        loadingMore = false;
     }
-    else {
-        var url = '/api/papers/?d=' + date_range;
-    }
-    if (!delete_old_papers) {
-        url += '&s=' + papers_displayed;
+    else if (loadingMore) {
+        return;
     }
-      fetch(url)
-        .then(response => response.json())
-        .then(data => populatePapers(data, delete_old_papers))
+    var start = delete_old_papers ? 0 : papers_displayed;
+    var controller = queryController;
+    loadingMore = !delete_old_papers;
+    fetchPage(pageUrl(query, date_range, start))
+        .then(data => {
+            if (controller !== queryController) {
+                return;
+            }
+            populatePapers(data, delete_old_papers);
+            if (data.length === PAGE_SIZE) {
+                prefetchNextPage(query, papers_displayed);
+            }
+        })
         .catch(error => {
+            if (error.name === 'AbortError') {
+                return;
+            }
             alert("Error fetching papers. Please try again later.");
             console.error("Error fetching papers:", error);
+        })
+        .finally(() => {
+            if (controller === queryController) {
+                loadingMore = false;
+            }
+        });
+}
+
+// subject filter buttons, the biggest subjects first
+function loadSubjects() {
+    fetch('/api/subjects/')
+        .then(response => response.ok ? response.json() : [])
+        .then(subjects => {
+            var container = document.getElementById('subject-buttons');
+            subjects.slice(0, SUBJECT_BUTTONS).forEach(subject => {
+                var button = document.createElement('button');
+                button.type = 'button';
+                button.className = 'btn btn-sm btn-select';
+                button.dataset.value = subject.short_name;
+                button.title = subject.full_name + ' (' + subject.count.toLocaleString() + ' papers)';
+                button.textContent = subject.short_name;
+                container.appendChild(button);
+            });
+        })
+        .catch(() => {
+            // the feed works without the filters
         });
 }
 
+// pick up the first page the server rendered into the document instead of requesting it again
+function hydratePapers() {
+    var script = document.getElementById('initial-papers');
+    if (!script) {
+        return false;
+    }
+    var data = JSON.parse(script.textContent);
+    script.remove();
+    all_papers = data.map(paper => paper.arxiv_id);
+    papers_displayed = data.length;
+    setCachedPage(pageUrl('', date_range, 0), data);
+    var papersContainer = document.getElementById("papers-container");
+    observeImages(papersContainer);
+    observeCards(papersContainer);
+    if (data.length === PAGE_SIZE) {
+        prefetchNextPage('', papers_displayed);
+    }
+    return true;
+}
+
 // show all authors button
 function handleAuthorClick(event) {
     event.preventDefault();
@@ -147,7 +391,10 @@ $(document).ready(function() {
         $('#search-input').focus();
     }, 350);
 
-    update();
+    if (!hydratePapers()) {
+        update();
+    }
+    loadSubjects();
 
     // search box reset button
     var searchBox = $("#search-input");
@@ -209,6 +456,17 @@ $(document).ready(function() {
         update(search_input);
     });
 
+    // subject buttons, any number of them can be selected
+    $('#subject-buttons').on('click', 'button', function() {
+        active_query = true;
+        $(this).toggleClass('active');
+        selectedSubjects = $('#subject-buttons button.active').map(function() {
+            return $(this).data('value');
+        }).get();
+        search_input = document.getElementById("search-input").value;
+        update(search_input);
+    });
+
       window.addEventListener('scroll', function() {
       if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 250) {
           if (active_query) {
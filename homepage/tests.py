@@ -1,3 +1,210 @@
-from django.test import TestCase
+import datetime
+import json
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, TestCase, override_settings
+
+from backend import ingest
+from backend.models import ArxivPaper, Author
+from backend.names import normalize_author_name
+from backend.testing import LocalCacheMixin, MediaRootMixin, create_paper
+from . import views
+from .search import search_matches
+from .views import get_author_profile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def day(number: int) -> datetime.date:
+    return datetime.date(2024, 1, number)
+
+
+class SearchMatchesTests(LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.transformer = create_paper('2401.00001', 'Transformers for tabular data', day(1))
+        self.transfer = create_paper('2401.00002', 'Transfer learning in robotics', day(2))
+        create_paper('2401.00003', 'Graph neural networks', day(3))
+
+    def ids(self, query: str) -> list:
+        return [paper_id for paper_id, _ in search_matches(query)]
+
+    def test_matches_newest_first(self):
+        self.assertEqual(self.ids('trans'), [self.transfer.id, self.transformer.id])
+
+    def test_short_queries_are_not_cached(self):
+        self.assertIsNone(search_matches('tr'))
+
+    def test_longer_query_is_refined_from_cached_prefix(self):
+        self.ids('trans')
+        # not among the prefix's matches and the content version didn't change, so the refinement can't see it
+        create_paper('2401.00004', 'Transformers in vision', day(4))
+        self.assertEqual(self.ids('transformer'), [self.transformer.id])
+
+    def test_ingest_starts_searches_over(self):
+        self.ids('trans')
+        late = create_paper('2401.00004', 'Transformers in vision', day(4))
+        ingest.bump_content_version()
+        self.assertEqual(self.ids('transformer'), [late.id, self.transformer.id])
+
+    @override_settings(SEARCH_CACHE_MAX_RESULTS=1)
+    def test_too_broad_queries_are_run_directly(self):
+        self.assertIsNone(search_matches('trans'))
+        self.assertEqual(self.ids('transformer'), [self.transformer.id])
+
+    def test_queries_fold_like_the_database(self):
+        umlaut = create_paper('2401.00004', 'Über transformers', day(4))
+        self.assertEqual(self.ids('TRANS'), self.ids('trans'))
+        # SQLite only folds ASCII, "über" would miss "Über"
+        self.assertEqual(self.ids('Übe'), [umlaut.id])
+        self.assertEqual(self.ids('Über'), [umlaut.id])
+        self.assertEqual(self.ids('ÜBER TRANS'), [umlaut.id])
+
+
+class FeedCacheTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def create_paper(self, arxiv_id: str, number: int):
+        # papers without any image aren't shown
+        return create_paper(arxiv_id, publication_date=day(number), screenshot=f'screenshots/{arxiv_id}.png')
+
+    def arxiv_ids(self, url: str = '/api/papers/') -> list:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [paper['arxiv_id'] for paper in response.json()]
+
+    def test_cached_page_changes_after_ingest(self):
+        self.create_paper('2401.00001', 1)
+        self.assertEqual(self.arxiv_ids(), ['2401.00001'])
+        # cached: a paper saved without being ingested doesn't show up
+        late = self.create_paper('2401.00002', 2)
+        self.assertEqual(self.arxiv_ids(), ['2401.00001'])
+        ingest.paper_ingested(late)
+        self.assertEqual(self.arxiv_ids(), ['2401.00002', '2401.00001'])
+
+
+class AuthorProfileTests(TestCase):
+    def setUp(self):
+        self.john = Author.objects.create(name='John Smith', paper_count=3, latest_paper_date=day(2))
+        Author.objects.create(name='Smith, John', paper_count=2, latest_paper_date=day(5))
+
+    def test_spellings_are_summed(self):
+        profile = get_author_profile(normalize_author_name('John  Smith'), ['arxiv_id'])
+        self.assertEqual(profile['name'], 'John Smith')
+        self.assertEqual(sorted(profile['variants']), ['John Smith', 'Smith, John'])
+        self.assertEqual((profile['paper_count'], profile['latest_paper_date']), (5, day(5)))
+
+    def test_initials_fall_back_to_the_only_match(self):
+        self.assertEqual(get_author_profile(normalize_author_name('J. Smith'), ['arxiv_id'])['paper_count'], 5)
+        Author.objects.create(name='J. Smith', paper_count=1)
+        # someone spelled it like this, so it is their profile
+        self.assertEqual(get_author_profile(normalize_author_name('J. Smith'), ['arxiv_id'])['paper_count'], 1)
+        self.assertEqual(get_author_profile(normalize_author_name('John Smith'), ['arxiv_id'])['paper_count'], 5)
+
+    def test_ambiguous_initials_match_nobody(self):
+        Author.objects.create(name='Jane Smith', paper_count=1)
+        self.assertEqual(get_author_profile(normalize_author_name('J. Smith'), ['arxiv_id']), {})
+        self.assertEqual(get_author_profile(normalize_author_name('Wei Wang'), ['arxiv_id']), {})
+
+
+class AsyncViewTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        for number in (1, 2):
+            create_paper(f'2401.0000{number}', f'Paper {number}', day(number), screenshot=f'screenshots/{number}.png')
+
+    async def get(self, view, path: str = '/api/papers/', data=None):
+        response = await view(self.factory.get(path, data))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    async def test_async_feed_matches_sync_feed(self):
+        response = await self.get(views.papers_api_async)
+        sync_response = await sync_to_async(self.client.get)('/api/papers/')
+        self.assertEqual(json.loads(response.content), sync_response.json())
+        self.assertEqual([paper['arxiv_id'] for paper in json.loads(response.content)], ['2401.00002', '2401.00001'])
+
+    async def test_async_feed_is_cached(self):
+        await self.get(views.papers_api_async)
+        await ArxivPaper.objects.filter(arxiv_id='2401.00002').aupdate(title='Renamed')
+        response = await self.get(views.papers_api_async)
+        self.assertEqual(json.loads(response.content)[0]['title'], 'Paper 2')
+
+    async def test_async_search(self):
+        response = await self.get(views.papers_api_async, data={'q': 'paper 1'})
+        self.assertEqual([paper['arxiv_id'] for paper in json.loads(response.content)], ['2401.00001'])
+
+    async def test_async_feed_is_get_only(self):
+        response = await views.papers_api_async(self.factory.post('/api/papers/'))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_async_index_renders_first_page(self):
+        # the first page shows this month's papers
+        await sync_to_async(create_paper)('2401.00003', 'Recent paper', datetime.date.today(),
+                                          screenshot='screenshots/3.png')
+        response = await self.get(views.index_async, '/')
+        self.assertIn(b'Recent paper', response.content)
+        self.assertNotIn(b'Paper 2', response.content)
+
+
+
+class FeedResponseTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(1, 6):
+            paper = create_paper(f'2401.0000{number}', f'A paper about compression number {number}', day(number),
+                                 summary='Summaries are long enough to be worth compressing. ' * 3,
+                                 screenshot=f'screenshots/{number}.png')
+            paper.authors.set([Author.objects.create(name=f'Author {number}.{i}') for i in range(15)])
+
+    def test_fields_and_compact_authors(self):
+        response = self.client.get('/api/papers/?fields=arxiv_id,authors,author_count&compact=1')
+        paper = response.json()[0]
+        self.assertEqual(set(paper), {'arxiv_id', 'authors', 'author_count'})
+        self.assertEqual((len(paper['authors']), paper['author_count']), (views.COMPACT_MAX_AUTHORS, 15))
+        self.assertEqual(len(self.client.get('/api/papers/?max_authors=2').json()[0]['authors']), 2)
+        self.assertNotIn(b', ', response.content)
+        self.assertEqual(self.client.get('/api/papers/?fields=arxiv_id,password').status_code, 400)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_json_is_compressed_with_brotli(self):
+        plain = self.client.get('/api/papers/')
+        response = self.client.get('/api/papers/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        self.assertEqual(self.client.get('/api/papers/', HTTP_ACCEPT_ENCODING='gzip')['Content-Encoding'], 'gzip')
+
+    def test_html_is_left_to_gzip(self):
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class FirstPageTests(MediaRootMixin, LocalCacheMixin, TestCase):
+    def create_paper(self, arxiv_id: str, title: str):
+        # the first page shows this month's papers
+        return create_paper(arxiv_id, title, datetime.date.today(), screenshot=f'screenshots/{arxiv_id}.png')
+
+    def initial_papers(self, content: bytes) -> list:
+        start = content.index(b'<script id="initial-papers" type="application/json">')
+        data = content[start:content.index(b'</script>', start)].split(b'>', 1)[1]
+        return json.loads(data)
+
+    def test_first_page_embeds_the_cards_and_their_data(self):
+        self.create_paper('2401.00001', 'Attention <script>alert(1)</script>')
+        content = self.client.get('/').content
+        self.assertIn(b'data-arxiv-id="2401.00001"', content)
+        self.assertNotIn(b'<script>alert(1)</script>', content)
+        api = self.client.get(f'/api/papers/?d={views.FIRST_PAGE_DATE_FILTER}&fields={",".join(views.CARD_FIELDS)}')
+        self.assertEqual(self.initial_papers(content), api.json())
+
+    def test_first_page_is_cached_until_ingest(self):
+        self.create_paper('2401.00001', 'First paper')
+        self.client.get('/')
+        late = self.create_paper('2401.00002', 'Second paper')
+        self.assertNotIn(b'Second paper', self.client.get('/').content)
+        ingest.paper_ingested(late)
+        self.assertIn(b'Second paper', self.client.get('/').content)
@@ -7,6 +7,10 @@ from . import views
 app_name = "homepage"
 
 urlpatterns = [
-    path("", views.index, name="index"),
-    path("api/papers/", views.papers_api, name="papers_api"),
+    path("", views.index_async if settings.ASYNC_VIEWS else views.index, name="index"),
+    path("api/papers/", views.papers_api_async if settings.ASYNC_VIEWS else views.papers_api, name="papers_api"),
+    path("api/papers/<str:arxiv_id>/related/", views.related_papers_api, name="related_papers_api"),
+    path("api/authors/", views.author_api, name="author_api"),
+    path("api/subjects/", views.subjects_api, name="subjects_api"),
+    path("api/events/", views.events_api, name="events_api"),
 ]
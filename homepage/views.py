@@ -1,79 +1,482 @@
-from django.shortcuts import render
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
-from django.db.models import Q
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, Sum
 from datetime import date, timedelta
 
-from backend.models import ArxivPaper
+from backend import caching, counters, embeddings, ingest, subjects
+from backend.models import ArxivPaper, Author, CoAuthorship, PaperImage
+from backend.names import initials_key, is_initials_key, normalize_author_name
+from papers.routers import use_replica
+from .search import search_filter, search_matches
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def index(request):
+PAGE_SIZE = 15
+
+# the most related papers a single request may ask for
+MAX_RELATED = 50
+
+# the most card events a single request may report
+MAX_EVENTS = 100
+
+# what the homepage renders server side, the same page main.js would request first
+FIRST_PAGE_DATE_FILTER = 'this-month'
+CARD_FIELDS = ('arxiv_id', 'image_url', 'title', 'summary', 'authors', 'publication_date', 'citations')
+
+# the number of authors a card shows before "show all", used when compact=1 and max_authors is not given
+COMPACT_MAX_AUTHORS = 10
+
+# the latest papers and top co-authors shown on an author profile
+AUTHOR_PAPERS = 10
+AUTHOR_COAUTHORS = 20
+
+# sort= values of the feed, 'hot' pages through the precomputed ranking index
+FEED_ORDERINGS = {
+    'new': ('-publication_date', '-id'),
+    'hot': ('-hot_score', '-id'),
+}
+
+FEED_FIELDS = ('arxiv_id', 'image_url', 'title', 'summary', 'first_author', 'authors', 'author_count',
+               'publication_date', 'citations', 'total_author_citations', 'views', 'clicks')
+
+# fields read from the paper's counter, which is only joined when one of them is requested
+COUNTER_FIELDS = ('views', 'clicks')
+
+
+def fast_json_response(data, status=200) -> HttpResponse:
     """
-    The only page of the app!
+    Like JsonResponse, but uses orjson when it is installed and never pads the output with whitespace
     """
-    return render(request, "homepage/index.html")
+    if orjson:
+        content = orjson.dumps(data)
+    else:
+        content = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return HttpResponse(content, content_type='application/json', status=status)
 
 
-@require_GET
-def papers_api(request):
+def serialize_paper(paper: ArxivPaper, fields, max_authors=None) -> dict:
+    """
+    Build the feed representation of a paper. Expects authors and images to be prefetched,
+    and the counter to be selected if views or clicks are requested.
+    :param paper: The paper to serialize
+    :param fields: The FEED_FIELDS to include
+    :param max_authors: If given, only the first max_authors names are returned in 'authors'
+    :return: The paper data
     """
-    API endpoint for papers. Either gets the most recent 50 or takes a query, 'q'
+    authors = [author.name for author in paper.authors.all()]
+    images = paper.images.all()
+    values = {
+        'arxiv_id': lambda: paper.arxiv_id,
+        # a first figure too large for a feed card falls back to the screenshot
+        'image_url': lambda: images[0].image.url if images and images[0].bytes <= settings.IMAGE_FEED_MAX_BYTES
+        else paper.screenshot.url,
+        'title': lambda: paper.title,
+        'summary': lambda: paper.summary,
+        'first_author': lambda: authors[0] if authors else '',
+        'authors': lambda: authors[:max_authors] if max_authors is not None else authors,
+        'author_count': lambda: len(authors),
+        'publication_date': lambda: paper.publication_date,
+        'citations': lambda: paper.citations,
+        'total_author_citations': lambda: paper.total_author_citations,
+        'views': lambda: paper.counter.views if hasattr(paper, 'counter') else 0,
+        'clicks': lambda: paper.counter.clicks if hasattr(paper, 'counter') else 0,
+    }
+    return {field: values[field]() for field in fields}
+
+
+def get_feed_options(request):
+    """
+    Parse the 'fields', 'max_authors' and 'compact' options shared by the feed endpoints
+    :return: (fields, max_authors), raises ValueError with a message for invalid options
+    """
+    fields = FEED_FIELDS
+    if request.GET.get('fields'):
+        fields = [field for field in request.GET['fields'].split(',') if field]
+        unknown = set(fields) - set(FEED_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+
+    max_authors = COMPACT_MAX_AUTHORS if request.GET.get('compact') else None
+    if request.GET.get('max_authors'):
+        try:
+            max_authors = max(int(request.GET['max_authors']), 0)
+        except ValueError:
+            raise ValueError('Invalid max authors')
+    return fields, max_authors
+
+
+def get_date_range(date_filter: str):
+    """
+    :param date_filter: One of the date buttons: 'today', 'this-week', 'this-month', 'this-year' or 'forever'
+    :return: The (start, end) publication dates it covers, or None for no restriction
+    """
+    days = {
+        'today': 1.5,
+        'this-week': 6,
+        'this-month': 29,
+        'this-year': 364,
+    }.get(date_filter)
+    if days is None:
+        return None
+    today = date.today()
+    return today - timedelta(days=days), today
+
+
+def get_papers_options(request) -> dict:
+    """
+    Parse the query string of papers_api
+    :return: The keyword arguments for get_papers_page, raises ValueError with a message for invalid options
     """
-    search_query = request.GET.get('q', '')
-    date_filter = request.GET.get('d', '')
     try:
         start_item = int(request.GET.get('s', 0))
     except ValueError:
-        return JsonResponse({'error': 'Invalid start item'}, status=400)
-
-    if search_query:
-        papers = ArxivPaper.objects.filter(
-            Q(summary__icontains=search_query) |
-            Q(abstract__icontains=search_query) |
-            Q(title__icontains=search_query) |
-            Q(authors__name__icontains=search_query)
-        )
+        raise ValueError('Invalid start item')
+    fields, max_authors = get_feed_options(request)
+    sort = request.GET.get('sort', 'new')
+    if sort not in FEED_ORDERINGS:
+        raise ValueError('Invalid sort')
+    subject_ids = None
+    if request.GET.get('subject'):
+        subject_ids = subjects.parse_subjects(request.GET['subject'])
+    return {
+        'search_query': request.GET.get('q', ''),
+        'date_range': get_date_range(request.GET.get('d', '')),
+        'start_item': start_item,
+        'sort': sort,
+        'subject_ids': subject_ids,
+        'fields': fields,
+        'max_authors': max_authors,
+    }
+
+
+def find_page_ids(search_query: str, date_range, start_item: int, sort='new', subject_ids=None):
+    """
+    Look up the ids of a feed page where an index or a cache has them, so only the page itself is loaded
+    :return: The paper ids of the page in order, or None if the page has to be queried from the papers table
+    """
+    if subject_ids and sort == 'new' and not search_query:
+        # the newest papers of a subject come straight from its feed index
+        return subjects.newest_paper_ids(subject_ids, start_item, PAGE_SIZE, date_range)
+    if not search_query or sort != 'new' or subject_ids:
+        return None
+    # cached matches are kept in publication order, ranked searches go to the database
+    matches = search_matches(search_query)
+    if matches is None:
+        return None
+    if date_range:
+        start_ordinal, end_ordinal = date_range[0].toordinal(), date_range[1].toordinal()
+        matches = [match for match in matches if start_ordinal <= match[1] <= end_ordinal]
+    return [paper_id for paper_id, _ in matches[start_item:start_item + PAGE_SIZE]]
+
+
+def get_papers_queryset(search_query: str, date_range, start_item: int, sort='new', subject_ids=None,
+                        fields=FEED_FIELDS, page_ids=None):
+    """
+    The (unevaluated) queryset of a feed page, see get_papers_page for the parameters
+    :param page_ids: The ids found by find_page_ids, if any
+    """
+    if page_ids is not None:
+        papers = ArxivPaper.objects.filter(id__in=page_ids)
     else:
-        papers = ArxivPaper.objects.all()
-
-    if date_filter == 'today':
-        today = date.today()
-        start_of_period = today - timedelta(days=1.5)
-        papers = papers.filter(publication_date__range=[start_of_period, today])
-    elif date_filter == 'this-week':
-        today = date.today()
-        start_of_period = today - timedelta(days=6)
-        papers = papers.filter(publication_date__range=[start_of_period, today])
-    elif date_filter == 'this-month':
-        today = date.today()
-        start_of_period = today - timedelta(days=29)
-        papers = papers.filter(publication_date__range=[start_of_period, today])
-    elif date_filter == 'this-year':
-        today = date.today()
-        start_of_period = today - timedelta(days=364)
-        papers = papers.filter(publication_date__range=[start_of_period, today])
-    elif date_filter == 'forever':
-        pass
-
-    papers = papers.order_by('-publication_date').distinct()[start_item:start_item + 15]
+        if search_query:
+            papers = ArxivPaper.objects.filter(search_filter(search_query))
+        else:
+            papers = ArxivPaper.objects.all()
+        if date_range:
+            papers = papers.filter(publication_date__range=date_range)
+        if subject_ids:
+            papers = papers.filter(subjects.subject_filter(subject_ids))
+        papers = papers.order_by(*FEED_ORDERINGS[sort]).distinct()[start_item:start_item + PAGE_SIZE]
+    papers = papers.prefetch_related('authors', Prefetch('images', queryset=PaperImage.objects.order_by('id')))
+    if set(fields) & set(COUNTER_FIELDS):
+        papers = papers.select_related('counter')
+    return papers
+
+
+def serialize_papers(papers, fields, max_authors=None, page_ids=None) -> list:
+    """
+    Serialize a loaded feed page, in the order of page_ids if given
+    """
+    if page_ids is not None:
+        papers = sorted(papers, key=lambda paper: page_ids.index(paper.id))
     papers_data = []
     for paper in papers:
         try:
-            paper_data = {
-                'arxiv_id': paper.arxiv_id,
-                'image_url': paper.images.first().image.url if paper.images.exists() else paper.screenshot.url,
-                'title': paper.title,
-                'summary': paper.summary,
-                'first_author': paper.authors.first().name if paper.authors.exists() else '',
-                'authors': [author.name for author in paper.authors.all()],
-                'author_count': paper.authors.count(),
-                'publication_date': paper.publication_date,
-                'citations': paper.citations,
-                'total_author_citations': paper.total_author_citations
-            }
+            paper_data = serialize_paper(paper, fields, max_authors)
         except ValueError:
             # some papers may be in the DB but missing some information, for now we skip over them
             continue
         papers_data.append(paper_data)
+    return papers_data
+
+
+def get_papers_page(search_query: str, date_range, start_item: int, sort='new', subject_ids=None,
+                    fields=FEED_FIELDS, max_authors=None) -> list:
+    """
+    Load and serialize one page of the feed
+    :param search_query: The search box text, may be empty
+    :param date_range: (start, end) publication dates as returned by get_date_range, or None
+    :param start_item: The offset of the page
+    :param sort: One of FEED_ORDERINGS
+    :param subject_ids: Optional subject ids to limit the feed to
+    :param fields: The FEED_FIELDS to include
+    :param max_authors: If given, the author lists are truncated to this many names
+    :return: The serialized papers
+    """
+    page_ids = find_page_ids(search_query, date_range, start_item, sort, subject_ids)
+    papers = get_papers_queryset(search_query, date_range, start_item, sort, subject_ids, fields, page_ids)
+    return serialize_papers(papers, fields, max_authors, page_ids)
+
+
+async def aget_papers_page(search_query: str, date_range, start_item: int, sort='new', subject_ids=None,
+                           fields=FEED_FIELDS, max_authors=None) -> list:
+    """
+    get_papers_page for async views, the queries run through the async ORM
+    """
+    page_ids = await sync_to_async(find_page_ids)(search_query, date_range, start_item, sort, subject_ids)
+    papers = get_papers_queryset(search_query, date_range, start_item, sort, subject_ids, fields, page_ids)
+    return serialize_papers([paper async for paper in papers], fields, max_authors, page_ids)
+
+
+def feed_page_key(options: dict) -> str:
+    # keyed on the content version like the first page, or the API would serve pages older than the homepage
+    return f'feed:{ingest.content_version()}:' + hashlib.sha1(repr(sorted(options.items())).encode()).hexdigest()
+
+
+def first_page_key() -> str:
+    return f'homepage:first-page:{ingest.content_version()}'
+
+
+def render_first_page() -> str:
+    papers = get_papers_page('', get_date_range(FIRST_PAGE_DATE_FILTER), 0, fields=CARD_FIELDS)
+    return render_to_string("homepage/first_page.html", {'papers': papers})
+
+
+async def arender_first_page() -> str:
+    papers = await aget_papers_page('', get_date_range(FIRST_PAGE_DATE_FILTER), 0, fields=CARD_FIELDS)
+    return render_to_string("homepage/first_page.html", {'papers': papers})
+
+
+@use_replica
+def index(request):
+    """
+    The only page of the app! The first page of cards is rendered in, along with its data for main.js,
+    from a fragment cached until the next paper is ingested.
+    """
+    first_page = caching.fragments.get_or_compute(first_page_key(), render_first_page)
+    return render(request, "homepage/index.html", {'first_page': first_page})
 
-    return JsonResponse(papers_data, safe=False)
+
+@use_replica
+async def index_async(request):
+    """
+    index for ASGI servers
+    """
+    key = await sync_to_async(first_page_key)()
+    first_page = await caching.fragments.aget_or_compute(key, arender_first_page)
+    return render(request, "homepage/index.html", {'first_page': first_page})
+
+
+@require_GET
+@use_replica
+def papers_api(request):
+    """
+    API endpoint for papers. Either gets the most recent 15 or takes a query, 'q'.
+    'sort=hot' orders by the precomputed ranking score instead of publication date.
+    'subject' limits the feed to papers in any of the given subjects, e.g. 'cs.LG+cs.CL'.
+    'fields' limits the returned keys and 'max_authors' (or 'compact=1') truncates the author lists.
+    """
+    try:
+        options = get_papers_options(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if options['search_query']:
+        # searches are cached by search_matches, as the ids of every match
+        return fast_json_response(get_papers_page(**options))
+    papers = caching.feed_pages.get_or_compute(feed_page_key(options), lambda: get_papers_page(**options))
+    return fast_json_response(papers)
+
+
+@use_replica
+async def papers_api_async(request):
+    """
+    papers_api for ASGI servers. A slow search waits on its own thread instead of holding a worker process,
+    so browsing requests keep being served next to it.
+    """
+    # require_GET doesn't wrap coroutines before Django 5.0
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        options = await sync_to_async(get_papers_options)(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if options['search_query']:
+        return fast_json_response(await aget_papers_page(**options))
+    key = await sync_to_async(feed_page_key)(options)
+    papers = await caching.feed_pages.aget_or_compute(key, lambda: aget_papers_page(**options))
+    return fast_json_response(papers)
+
+
+@require_GET
+@use_replica
+def related_papers_api(request, arxiv_id):
+    """
+    API endpoint for the papers most similar to the given one, 'k' of them (default 10).
+    Takes the same 'fields', 'max_authors' and 'compact' options as papers_api, and adds a 'score' to every paper.
+    """
+    paper = get_object_or_404(ArxivPaper, arxiv_id=arxiv_id)
+    try:
+        k = int(request.GET.get('k', 10))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid k'}, status=400)
+    if not 1 <= k <= MAX_RELATED:
+        return JsonResponse({'error': f'k must be between 1 and {MAX_RELATED}'}, status=400)
+    try:
+        fields, max_authors = get_feed_options(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    scores = dict(embeddings.index.related(paper, k))
+    papers = ArxivPaper.objects.filter(id__in=scores).prefetch_related(
+        'authors', Prefetch('images', queryset=PaperImage.objects.order_by('id')))
+    if set(fields) & set(COUNTER_FIELDS):
+        papers = papers.select_related('counter')
+    papers_data = []
+    for paper in sorted(papers, key=lambda p: -scores[p.id]):
+        try:
+            paper_data = serialize_paper(paper, fields, max_authors)
+        except ValueError:
+            continue
+        paper_data['score'] = round(scores[paper.id], 4)
+        papers_data.append(paper_data)
+
+    return fast_json_response(papers_data)
+
+
+def get_author_profile(key: str, fields, max_authors=None) -> dict:
+    """
+    Build the profile author_api returns
+    :param key: A normalized author name
+    :param fields: The FEED_FIELDS to include for the papers
+    :param max_authors: If given, the author lists of the papers are truncated to this many names
+    :return: The profile, or an empty dict if no author has that name
+    """
+    variants = list(Author.objects.filter(normalized_name=key).order_by('-paper_count', 'id'))
+    if not variants:
+        # nobody spelled the name like this: "J. Smith" still finds John Smith, and "John Smith" finds J. Smith,
+        # unless the initials are just as well someone else's
+        variants = list(Author.objects.filter(name_initials=initials_key(key)).order_by('-paper_count', 'id'))
+        full_names = {author.normalized_name for author in variants if not is_initials_key(author.normalized_name)}
+        if not is_initials_key(key):
+            full_names.add(key)
+        if not variants or len(full_names) > 1:
+            return {}
+    author_ids = [author.id for author in variants]
+    best_known = max(variants, key=lambda author: author.citations)
+
+    papers = (ArxivPaper.objects.filter(authors__in=author_ids).order_by('-publication_date', '-id').distinct()
+              .prefetch_related('authors', Prefetch('images', queryset=PaperImage.objects.order_by('id'))))
+    if set(fields) & set(COUNTER_FIELDS):
+        papers = papers.select_related('counter')
+    papers_data = []
+    for paper in papers[:AUTHOR_PAPERS]:
+        try:
+            papers_data.append(serialize_paper(paper, fields, max_authors))
+        except ValueError:
+            continue
+
+    coauthors = CoAuthorship.objects.filter(author__in=author_ids).exclude(coauthor__in=author_ids)
+    if len(author_ids) > 1:
+        coauthors = coauthors.values('coauthor__name').annotate(paper_count=Sum('paper_count'))
+    else:
+        coauthors = coauthors.values('coauthor__name', 'paper_count')
+    coauthors = coauthors.order_by('-paper_count', 'coauthor__name')[:AUTHOR_COAUTHORS]
+
+    dates = [author.latest_paper_date for author in variants if author.latest_paper_date]
+    return {
+        'name': variants[0].name,
+        'key': key,
+        'variants': [author.name for author in variants],
+        'affiliation': best_known.affiliation,
+        'citations': best_known.citations,
+        'paper_count': sum(author.paper_count for author in variants),
+        'latest_paper_date': max(dates) if dates else None,
+        'papers': papers_data,
+        'coauthors': [{'name': row['coauthor__name'], 'paper_count': row['paper_count']} for row in coauthors],
+    }
+
+
+@require_GET
+@use_replica
+def author_api(request):
+    """
+    API endpoint for an author profile, looked up by 'name'. Every spelling of the name which normalizes to the
+    same key ("John Smith", "Smith, John") is treated as the same author, abbreviated ones ("J. Smith") only when
+    no other author has those initials. Returns the paper count, the latest papers
+    and the most frequent co-authors, all read from the aggregates the scraper maintains.
+    Takes the same 'fields', 'max_authors' and 'compact' options as papers_api for the papers.
+    """
+    key = normalize_author_name(request.GET.get('name', ''))
+    if not key:
+        return JsonResponse({'error': 'Missing name'}, status=400)
+    try:
+        fields, max_authors = get_feed_options(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    options = repr((key, fields, max_authors)).encode()
+    cache_key = f'author:{ingest.content_version()}:{hashlib.sha1(options).hexdigest()}'
+    profile = caching.authors.get_or_compute(cache_key, lambda: get_author_profile(key, fields, max_authors))
+    if not profile:
+        return JsonResponse({'error': 'Author not found'}, status=404)
+    return fast_json_response(profile)
+
+
+@require_GET
+@use_replica
+def subjects_api(request):
+    """
+    API endpoint for the subjects papers can be filtered by, with the number of papers in each, biggest first
+    """
+    return fast_json_response(subjects.subject_counts())
+
+
+@csrf_exempt
+@require_POST
+def events_api(request):
+    """
+    API endpoint the homepage cards report views and clicks to, as a JSON list of
+    {"arxiv_id": ..., "type": "view" or "click"}. Counts are buffered and written in batches. Every paper's view
+    and click count once per request, and clients are rate limited.
+    """
+    if not counters.allow_events(request.META.get('REMOTE_ADDR', '')):
+        return JsonResponse({'error': 'Too many requests'}, status=429)
+    try:
+        events = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(events, list) or len(events) > MAX_EVENTS:
+        return JsonResponse({'error': f'Expected a list of at most {MAX_EVENTS} events'}, status=400)
+
+    counted = set()
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        arxiv_id, event_type = event.get('arxiv_id'), event.get('type')
+        if event_type in counters.EVENT_TYPES and isinstance(arxiv_id, str) and 0 < len(arxiv_id) <= 20 and \
+                (arxiv_id, event_type) not in counted:
+            counted.add((arxiv_id, event_type))
+            counters.buffer.add(arxiv_id, event_type)
+    return HttpResponse(status=204)
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'papers.settings')
+# the feed views have async versions, which only pay off under an ASGI server
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+# sync code runs in executor threads, each would hold its own persistent connection
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,64 @@
+"""
+Database routing between the primary and an optional read replica.
+
+Everything goes to the primary ('default') unless it runs inside a view decorated with use_replica, whose reads
+go to the 'replica' alias when one is configured. The scraper, management commands and the admin never see the
+replica, so they always read their own writes.
+"""
+import contextvars
+import functools
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+REPLICA = 'replica'
+
+# a contextvar rather than a thread local: it follows async views into their sync_to_async calls
+_reading_from_replica = contextvars.ContextVar('reading_from_replica', default=False)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def use_replica(view):
+    """
+    Send the read queries of a read-only view to the replica, for sync and async views
+    """
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            token = _reading_from_replica.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _reading_from_replica.reset(token)
+    else:
+        def wrapper(request, *args, **kwargs):
+            token = _reading_from_replica.set(True)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _reading_from_replica.reset(token)
+    return functools.wraps(view)(wrapper)
+
+
+class ReplicaRouter:
+    """
+    Routes reads made under use_replica to the replica, all other queries and every write to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if _reading_from_replica.get() and replica_configured():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replica gets its schema from the primary
+        return db == 'default'
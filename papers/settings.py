@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 from pathlib import Path
 from decouple import config
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,6 +54,111 @@ elif SERVER_TYPE in ['development', 'production']:
     SECURE_SSL_REDIRECT = True
 
 OPENAI_API_KEY = config('OPENAI_API_KEY')
+
+# the chat model and prompt version (see scraper/summaries.py) new papers are summarized with,
+# python manage.py resummarize brings existing papers up to date after changing them
+SUMMARY_MODEL = config('SUMMARY_MODEL', default='gpt-4o-mini')
+SUMMARY_PROMPT = config('SUMMARY_PROMPT', default='abstract-v2')
+
+# rate limits and circuit breakers of the hosts the scraper calls, shared by every scraper process on the machine
+# through lock files in SCRAPER_STATE_DIR (see scraper/upstreams.py). rate: requests a second (None for no limit),
+# burst: requests allowed at once after a quiet spell, failures: consecutive failures which open the breaker,
+# cooldown: seconds it stays open, pause: wait while it is open, else fail fast and carry on without the host
+SCRAPER_STATE_DIR = config('SCRAPER_STATE_DIR', default=os.path.join(tempfile.gettempdir(), 'papers-scraper'))
+SCRAPER_UPSTREAMS = {
+    'arxiv.org': {'rate': config('ARXIV_RATE_LIMIT', default=1.0, cast=float), 'burst': 4,
+                  'failures': 5, 'cooldown': 120, 'pause': True},
+    # the export API asks for at most one request every three seconds
+    'export.arxiv.org': {'rate': 1 / 3, 'burst': 1, 'failures': 3, 'cooldown': 300, 'pause': True},
+    'api.openai.com': {'rate': config('OPENAI_RATE_LIMIT', default=8.0, cast=float), 'burst': 16,
+                       'failures': 5, 'cooldown': 60, 'pause': True},
+    'scholar.google.com': {'rate': config('SCHOLAR_RATE_LIMIT', default=0.2, cast=float), 'burst': 1,
+                           'failures': 3, 'cooldown': 900, 'pause': False},
+}
+
+# serve the feed views as coroutines on the async ORM, set by papers/asgi.py so WSGI workers keep the sync views
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# fraction of requests which record SQL/latency stats (wrapping every query of a request costs time, set it to 1
+# to see every request while profiling), and the threshold for logging slow requests
+QUERY_STATS_SAMPLE_RATE = config('QUERY_STATS_SAMPLE_RATE', default=0.01, cast=float)
+QUERY_STATS_SLOW_MS = config('QUERY_STATS_SLOW_MS', default=1000, cast=int)
+
+# the cache shared by all workers: Redis when CACHE_REDIS_URL is set (e.g. redis://127.0.0.1:6379/1, needs the
+# redis package), otherwise files under CACHE_DIR
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHE_DIR = config('CACHE_DIR', default=os.path.join(BASE_DIR, 'cache'))
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)},
+        }
+    }
+
+# the per-process LRU in front of the shared cache, and how often workers check for a value another one computes
+CACHE_LOCAL_MAX_ENTRIES = config('CACHE_LOCAL_MAX_ENTRIES', default=1000, cast=int)
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+# how long search results are cached, and the most matches a query may have to be cached at all
+SEARCH_CACHE_TIMEOUT = config('SEARCH_CACHE_TIMEOUT', default=300, cast=int)
+SEARCH_CACHE_MAX_RESULTS = config('SEARCH_CACHE_MAX_RESULTS', default=5000, cast=int)
+
+# how long feed pages (without a search) are cached, new papers show up in them after at most this long
+FEED_CACHE_TIMEOUT = config('FEED_CACHE_TIMEOUT', default=30, cast=int)
+
+# how long author profiles are cached, ingesting a paper also replaces them
+AUTHOR_CACHE_TIMEOUT = config('AUTHOR_CACHE_TIMEOUT', default=600, cast=int)
+
+# how long the server rendered first page of the homepage is cached, ingesting a paper also replaces it
+FIRST_PAGE_CACHE_TIMEOUT = config('FIRST_PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# see backend/caching.py. timeout: seconds an entry is fresh, stale: seconds after that it is still served while
+# one worker recomputes it, local_timeout: seconds a worker keeps it in its own LRU, lock_timeout: the longest
+# other workers wait for a missing entry to be computed
+CACHE_POLICIES = {
+    'feed': {'timeout': FEED_CACHE_TIMEOUT, 'stale': 300, 'local_timeout': 5, 'lock_timeout': 30},
+    'search': {'timeout': SEARCH_CACHE_TIMEOUT, 'stale': 600, 'local_timeout': 30, 'lock_timeout': 30},
+    'author': {'timeout': AUTHOR_CACHE_TIMEOUT, 'stale': 0, 'local_timeout': 60, 'lock_timeout': 30},
+    'fragment': {'timeout': FIRST_PAGE_CACHE_TIMEOUT, 'stale': 0, 'local_timeout': 60, 'lock_timeout': 30},
+}
+
+# how long the per subject paper counts are cached, ingesting a paper also clears them
+SUBJECT_COUNTS_CACHE_TIMEOUT = config('SUBJECT_COUNTS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# subject feed pages continue from where the page before ended, a page requested without one past this offset
+# (e.g. after a paper was ingested mid scroll) would read every row before it and comes back empty instead
+SUBJECT_FEED_MAX_START = config('SUBJECT_FEED_MAX_START', default=1500, cast=int)
+
+# where the related papers index lives and how many buckets its hashed TF-IDF vectors have, vectors are stored
+# sparse so more buckets (fewer colliding terms) only cost a dense query vector,
+# changing the dimension needs a rebuild: python manage.py rebuild_embeddings
+EMBEDDINGS_DIR = config('EMBEDDINGS_DIR', default=os.path.join(BASE_DIR, 'embeddings'))
+EMBEDDING_DIM = config('EMBEDDING_DIM', default=16384, cast=int)
+
+# hot feed ranking, see backend/ranking.py: a tenfold increase in a weighted input is worth
+# weight * HOT_SCORE_DAYS_PER_POINT days of recency
+HOT_SCORE_DAYS_PER_POINT = config('HOT_SCORE_DAYS_PER_POINT', default=3.0, cast=float)
+HOT_SCORE_CITATIONS_WEIGHT = config('HOT_SCORE_CITATIONS_WEIGHT', default=1.0, cast=float)
+HOT_SCORE_AUTHOR_CITATIONS_WEIGHT = config('HOT_SCORE_AUTHOR_CITATIONS_WEIGHT', default=0.5, cast=float)
+HOT_SCORE_CLICKS_WEIGHT = config('HOT_SCORE_CLICKS_WEIGHT', default=1.0, cast=float)
+
+# view/click counters are buffered per worker and written once the oldest pending event is this old (or once this
+# many papers are pending); clients may report events this many times a minute
+COUNTER_FLUSH_INTERVAL = config('COUNTER_FLUSH_INTERVAL', default=10, cast=int)
+COUNTER_FLUSH_MAX_PAPERS = config('COUNTER_FLUSH_MAX_PAPERS', default=1000, cast=int)
+EVENTS_RATE_LIMIT = config('EVENTS_RATE_LIMIT', default=30, cast=int)
+
+# brotli quality for compressed responses, 4-5 is about gzip's speed at a better ratio
+BROTLI_QUALITY = config('BROTLI_QUALITY', default=5, cast=int)
 # Application definition
 
 INSTALLED_APPS = [
@@ -65,9 +171,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.QueryStatsMiddleware',
+    'backend.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,11 +209,18 @@ WSGI_APPLICATION = 'papers.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
+# connections are kept open for DB_CONN_MAX_AGE seconds and checked before being reused after a request,
+# papers/asgi.py defaults it to 0: under ASGI every request's queries run on an executor thread with its own connection
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 if SERVER_TYPE == 'local':
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 else:
@@ -116,9 +232,25 @@ else:
             'PASSWORD':config('DB_PASSWORD'),
             'HOST': 'localhost',
             'PORT': '',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 
+# optional read replica for the feed and search views, see papers/routers.py. Locally DB_REPLICA_NAME is the
+# path of a second SQLite file (e.g. a copy of db.sqlite3), elsewhere DB_REPLICA_HOST is the replica's Postgres host
+DB_REPLICA_NAME = config('DB_REPLICA_NAME', default='')
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+if SERVER_TYPE == 'local' and DB_REPLICA_NAME:
+    DATABASES['replica'] = {**DATABASES['default'], 'NAME': DB_REPLICA_NAME}
+elif SERVER_TYPE != 'local' and DB_REPLICA_HOST:
+    DATABASES['replica'] = {**DATABASES['default'], 'HOST': DB_REPLICA_HOST,
+                            'PORT': config('DB_REPLICA_PORT', default='')}
+if 'replica' in DATABASES:
+    # tests read the replica alias from the test primary instead of creating a second test database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['papers.routers.ReplicaRouter']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -127,11 +259,22 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': 'errors.log'
         },
+        'slow_requests_log': {
+            'class': 'logging.FileHandler',
+            'filename': 'slow_requests.log'
+        },
     },
     'root': {
         'handlers': ['uwsgi_log'],
         'level': 'ERROR',
     },
+    'loggers': {
+        'backend.middleware': {
+            'handlers': ['slow_requests_log'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
 # Password validation
@@ -170,10 +313,38 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if SERVER_TYPE != 'local':
+    # minified, content-hashed and precompressed by collectstatic, see papers/storage.py
+    STORAGES['staticfiles']['BACKEND'] = 'papers.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# pre-rendered RSS, Atom and JSON feeds, served from MEDIA_ROOT by the web server; and how many papers they list
+FEEDS_DIR = os.path.join(MEDIA_ROOT, 'feeds')
+FEED_SIZE = config('FEED_SIZE', default=50, cast=int)
+
+# figures from paper sources are decoded and re-encoded by IMAGE_WORKERS processes as they are ingested (see
+# scraper/images.py): images of more than IMAGE_MAX_PIXELS are rejected before decoding, larger sides than
+# IMAGE_MAX_DIMENSION are scaled down, and PNGs over IMAGE_MAX_BYTES without transparency become JPEGs if that
+# is smaller. An image which takes longer than IMAGE_TIMEOUT seconds is skipped and its worker replaced.
+# Feed cards show the screenshot instead of a first figure of more than IMAGE_FEED_MAX_BYTES.
+IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+IMAGE_TIMEOUT = config('IMAGE_TIMEOUT', default=30, cast=int)
+IMAGE_MAX_PIXELS = config('IMAGE_MAX_PIXELS', default=50000000, cast=int)
+IMAGE_MAX_DIMENSION = config('IMAGE_MAX_DIMENSION', default=2048, cast=int)
+IMAGE_MAX_BYTES = config('IMAGE_MAX_BYTES', default=500000, cast=int)
+IMAGE_FEED_MAX_BYTES = config('IMAGE_FEED_MAX_BYTES', default=1000000, cast=int)
+
+# delete media files no paper references after every scraped batch (see backend/media.py), once they are older
+# than MEDIA_GC_MIN_AGE seconds
+MEDIA_GC_AFTER_INGEST = config('MEDIA_GC_AFTER_INGEST', default=True, cast=bool)
+MEDIA_GC_MIN_AGE = config('MEDIA_GC_MIN_AGE', default=3600, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
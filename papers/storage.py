@@ -0,0 +1,124 @@
+"""
+Static files storage for deployed servers: collectstatic minifies CSS and JS, losslessly shrinks PNGs,
+writes every file under a content-hashed name (so it can be cached forever) and precompresses
+the hashed files to .gz and .br for the web server to send as they are.
+"""
+import gzip
+import io
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# files worth precompressing, images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.ico')
+
+# a compressed variant has to be at least this much smaller than the original to be kept
+MIN_COMPRESSION_RATIO = 0.95
+
+
+def minify_css(content: str) -> str:
+    return rcssmin.cssmin(content)
+
+
+def minify_js(content: str) -> str:
+    return rjsmin.jsmin(content)
+
+
+def optimize_png(content: bytes) -> bytes:
+    from PIL import Image
+    image = Image.open(io.BytesIO(content))
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def gzip_compress(content: bytes) -> bytes:
+    # mtime=0 so the same input always produces the same file
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def brotli_compress(content: bytes) -> bytes:
+    return brotli.compress(content, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage which minifies before hashing and precompresses after
+    """
+
+    def minifiers(self) -> dict:
+        """
+        :return: extension -> (minify function, True if it works on text)
+        """
+        minifiers = {'.png': (optimize_png, False)}
+        if rcssmin:
+            minifiers['.css'] = (minify_css, True)
+        if rjsmin:
+            minifiers['.js'] = (minify_js, True)
+        return minifiers
+
+    def minify(self, path: str, source) -> bool:
+        """
+        Minify the collected copy of a file in place
+        :param path: The path of the file relative to STATIC_ROOT
+        :param source: The (storage, path) it was collected from
+        :return: True if the copy was replaced with a smaller version
+        """
+        minify, text = self.minifiers().get(os.path.splitext(path)[1].lower(), (None, None))
+        if not minify:
+            return False
+        storage, source_path = source
+        with storage.open(source_path) as f:
+            original = f.read()
+        try:
+            minified = minify(original.decode()).encode() if text else minify(original)
+        except Exception:
+            # an asset the minifier can't handle is shipped as it is
+            return False
+        if len(minified) >= len(original):
+            return False
+        self.delete(path)
+        self._save(path, ContentFile(minified))
+        return True
+
+    def compress(self, name: str) -> None:
+        """
+        Write .gz and .br variants next to a file, when they are worth it
+        """
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as f:
+            content = f.read()
+        compressors = [('.gz', gzip_compress)]
+        if brotli:
+            compressors.append(('.br', brotli_compress))
+        for extension, compress in compressors:
+            compressed = compress(content)
+            if len(compressed) < len(content) * MIN_COMPRESSION_RATIO:
+                with open(self.path(name + extension), 'wb') as f:
+                    f.write(compressed)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            # hash the minified copies rather than the app's originals
+            paths = {path: (self, path) if self.minify(path, source) else source for path, source in paths.items()}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
@@ -0,0 +1,11 @@
+"""
+The arxiv scraper behind scrape_abs.py, split by stage so a run only imports what it uses:
+
+- arxiv: list and abstract pages, downloads
+- sources: the PDF screenshot and the images and TeX files in the source tarball (PyMuPDF)
+- summaries: the OpenAI summary
+- scholar: Google Scholar lookups (scholarly, and its proxies)
+- pipeline: scrape_paper and scrape_papers_from_list, tying the stages together
+
+Every module except arxiv needs Django to be set up before it is imported.
+"""
@@ -0,0 +1,176 @@
+import re
+from datetime import datetime
+from xml.etree import ElementTree
+
+from bs4 import BeautifulSoup
+
+from .upstreams import ARXIV, EXPORT, upstream
+
+EXPORT_API_URL = 'https://export.arxiv.org/api/query'
+ATOM = '{http://www.w3.org/2005/Atom}'
+# ids per export API request, it takes up to 2000 but answers long lists slowly
+VERSIONS_BATCH_SIZE = 200
+
+
+def list_paper_ids(section: str, num_papers: int, page: str) -> list:
+    """
+    Given a list url such as https://arxiv.org/list/cs.LG/pastweek?show=557, get all paper IDs on the results page
+    :param section: the section of the paper, e.g. cs.LG
+    :param num_papers: the number of papers to list
+    :param page: the page to get papers from
+    :return: The arxiv ids, in the order of the page
+    """
+    # Send a GET request to the webpage
+    list_url = f'https://arxiv.org/list/{section}/{page}?show={num_papers}'
+    response = upstream(ARXIV).get(list_url)
+
+    # Create a BeautifulSoup object to parse the HTML content
+    soup = BeautifulSoup(response.content, 'html.parser')
+
+    # Find all span tags with class "list-identifier"
+    span_tags = soup.find_all('span', class_='list-identifier')
+
+    # Extract the paper IDs from the anchor tags
+    paper_ids = []
+    for span_tag in span_tags:
+        # Find the 'a' element within the span tag
+        a_tag = span_tag.find('a')
+        if a_tag and '/abs/' in a_tag['href']:
+            # Extract the text from the 'a' element
+            paper_id = a_tag.text.strip()
+            paper_id = paper_id.replace('arXiv:', '')
+            paper_ids.append(paper_id)
+    return paper_ids
+
+
+def parse_abstract_page(arxiv_id: str, html_content: bytes) -> dict:
+    """
+    Parse the metadata of a paper out of its arxiv abstract page
+    :param arxiv_id: The arxiv_id of the paper, for logging
+    :param html_content: The HTML of https://arxiv.org/abs/<arxiv_id>
+    :return: title, abstract, authors, primary_subject and subjects as (short name, full name) pairs, jref,
+    comments, doi, date and version
+    """
+    # Create a BeautifulSoup object to parse the HTML
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Get the title
+    title_tag = soup.find('h1', class_='title')
+    title = title_tag.get_text(strip=True)
+    title = re.sub(r'Title:', '', title)
+    print(f'[{arxiv_id}] Title: {title}')
+
+    # Get the abstract
+    abstract_tag = soup.find('blockquote', class_='abstract')
+    abstract = abstract_tag.get_text(strip=True)
+    # remove various things
+    abstract = re.sub(r'Abstract:', '', abstract)
+    abstract = re.sub(r'\n', ' ', abstract)
+    abstract = re.sub(r'  ', ' ', abstract)
+
+    # Get the authors
+    author_div = soup.find('div', class_='authors')
+    author_tags = author_div.find_all('a')
+    authors = [author.get_text(strip=True) for author in author_tags]
+
+    # Get the primary subject
+    primary_subject = soup.find('span', class_='primary-subject').get_text(strip=True)
+    short_name = primary_subject.split('(')[1].replace(')', '').strip()
+    full_name = primary_subject.split('(')[0].strip()
+    print(f'[{arxiv_id}] Primary subject: {short_name} - {full_name}')
+
+    # get everything inside of 'subjects' that is not in a <span>:
+    subject_div = soup.find('td', class_='subjects')
+    subject_text = subject_div.get_text(strip=True)
+    subject_text = re.sub(r'<span.*span>', '', subject_text)
+    subject_list = subject_text.split(';')
+    subject_list = [subject.strip() for subject in subject_list]
+    subjects = []
+    for subject_name in subject_list:
+        if subject_name:
+            subjects.append((subject_name.split('(')[1].replace(')', '').strip(), subject_name.split('(')[0].strip()))
+
+    jref = soup.find('td', class_='tablecell jref')
+    if jref:
+        jref = jref.get_text(strip=True)
+        jref = re.sub(r'Journal ref:', '', jref)
+        jref = re.sub(r'\n', '', jref)
+        jref = re.sub(r'  ', '', jref)
+        print(f'[{arxiv_id}] Journal ref: {jref}')
+    else:
+        jref = None
+
+    comments = soup.find('td', class_='tablecell comments')
+    if comments:
+        comments = comments.get_text(strip=True)
+        comments = re.sub(r'Comments:', '', comments)
+        comments = re.sub(r'\n', '', comments)
+        comments = re.sub(r'  ', '', comments)
+        print(f'[{arxiv_id}] Comments: {comments}')
+    else:
+        comments = None
+
+    doi = soup.find('td', class_='tablecell arxivdoi')
+    if doi:
+        doi = doi.find('a')
+        doi = doi.get_text(strip=True)
+        doi = re.sub(r'DOI:', '', doi)
+        doi = re.sub(r'\n', '', doi)
+        doi = re.sub(r'  ', '', doi)
+        print(f'[{arxiv_id}] DOI: {doi}')
+    else:
+        doi = None
+
+    # Get the date
+    date_tag = soup.find('div', class_='dateline')
+    date_string = date_tag.get_text(strip=True)
+    # [Submitted on 1 Jun 2023 (v1), last revised 5 Jun 2023 (this version, v2)]
+    version = max([int(v) for v in re.findall(r'v(\d+)\)', date_string)], default=1)
+    date_string = re.sub(r' \(v.*\)', '', date_string)
+    date_match = re.search(r'\[Submitted on (.+)\]', date_string)
+    if date_match:
+        date_string = date_match.group(1)
+        date = datetime.strptime(date_string, '%d %b %Y').date()
+    else:
+        date = None
+
+    return {
+        'title': title,
+        'abstract': abstract,
+        'authors': authors,
+        'primary_subject': (short_name, full_name),
+        'subjects': subjects,
+        'jref': jref,
+        'comments': comments,
+        'doi': doi,
+        'date': date,
+        'version': version,
+    }
+
+
+def list_versions(arxiv_ids: list) -> dict:
+    """
+    Look up the latest versions of papers through the arxiv export API, VERSIONS_BATCH_SIZE papers a request
+    :param arxiv_ids: The arxiv ids, without versions
+    :return: arxiv id -> (latest version, when it was published), papers arxiv doesn't know are left out
+    """
+    versions = {}
+    for start in range(0, len(arxiv_ids), VERSIONS_BATCH_SIZE):
+        batch = arxiv_ids[start:start + VERSIONS_BATCH_SIZE]
+        try:
+            response = upstream(EXPORT).get(EXPORT_API_URL, params={'id_list': ','.join(batch),
+                                                                     'max_results': len(batch)})
+            if response.status_code != 200:
+                print(f'Error occurred while looking up versions: {response.status_code} from {EXPORT_API_URL}')
+                continue
+            feed = ElementTree.fromstring(response.content)
+        except Exception as e:
+            print(f'Error occurred while looking up versions from {EXPORT_API_URL}: {e}')
+            continue
+        for entry in feed.iter(f'{ATOM}entry'):
+            # errors, e.g. for a malformed id, come back as entries without a version
+            match = re.search(r'/abs/(.+)v(\d+)$', entry.findtext(f'{ATOM}id', ''))
+            updated = entry.findtext(f'{ATOM}updated')
+            if match and updated:
+                versions[match.group(1)] = (int(match.group(2)), datetime.fromisoformat(updated.replace('Z', '+00:00')))
+    return versions
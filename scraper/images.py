@@ -0,0 +1,184 @@
+"""
+Normalization of the figures in paper sources. Tarballs contain anything from tiny icons to uncompressed
+100 megapixel PNGs, animated GIFs and truncated files, so every image is decoded and re-encoded before it is
+stored: too many pixels and it is rejected before decoding, too large and it is scaled down, and the stored
+file never carries metadata. Decoding is CPU bound and a hostile file may be slow to decode or crash it, so it
+runs in a pool of worker processes (IMAGE_WORKERS) which lives as long as the scraper. An image which takes longer
+than IMAGE_TIMEOUT or kills its worker is skipped, and the pool is replaced.
+"""
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from backend.models import PaperImage
+
+NormalizedImage = namedtuple('NormalizedImage', ['content', 'extension', 'width', 'height'])
+
+# image.info entries which aren't metadata: dropping them would change how the image looks
+KEPT_INFO = ('transparency', 'icc_profile')
+EXIF_ORIENTATION = 0x0112
+# the quality of JPEGs which have to be encoded again, visually lossless for figures
+JPEG_QUALITY = 90
+
+_executor = None
+
+
+def _encode(image, image_format: str, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def normalize_image(path: str, max_pixels: int, max_dimension: int, max_bytes: int):
+    """
+    Decode an image and encode it again without metadata: JPEGs as JPEG (keeping their quantization unless they
+    had to be scaled or rotated), anything else as an optimized PNG of its first frame, which becomes a JPEG if
+    it is larger than max_bytes, has no transparency and the JPEG is smaller.
+    Runs in the worker processes, so it must not touch the database.
+    :param path: The path to the image
+    :param max_pixels: Reject images with more pixels than this without decoding them
+    :param max_dimension: Scale images down to at most this many pixels wide and high
+    :param max_bytes: PNGs larger than this are tried as JPEG
+    :return: A NormalizedImage, None if the image was rejected or couldn't be decoded
+    """
+    # Pillow is only needed once a paper has images
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path) as original:
+            # the header alone has the size, a decompression bomb is never decoded
+            if original.width * original.height > max_pixels:
+                print(f'Rejected image with {original.width}x{original.height} pixels: {path}')
+                return None
+            image_format = original.format
+            original.seek(0)
+            original.load()
+
+            image = original
+            if image_format == 'JPEG' and image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            if max(image.size) > max_dimension:
+                image = image.copy()
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            image.info = {key: value for key, value in image.info.items() if key in KEPT_INFO}
+
+            if image_format == 'JPEG':
+                if image is original and image.mode in ('RGB', 'L'):
+                    content = _encode(image, 'JPEG', quality='keep', optimize=True)
+                else:
+                    image = image if image.mode in ('RGB', 'L') else image.convert('RGB')
+                    content = _encode(image, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+                return NormalizedImage(content, 'jpg', image.width, image.height)
+
+            content = _encode(image, 'PNG', optimize=True)
+            transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            if len(content) > max_bytes and not transparent:
+                jpeg = _encode(image.convert('RGB') if image.mode not in ('RGB', 'L') else image, 'JPEG',
+                               quality=JPEG_QUALITY, optimize=True)
+                if len(jpeg) < len(content):
+                    return NormalizedImage(jpeg, 'jpg', image.width, image.height)
+            return NormalizedImage(content, 'png', image.width, image.height)
+    except Exception as e:
+        print(f'Error occurred while decoding image: {path}: {e}')
+        return None
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _executor
+
+
+def _replace_pool() -> None:
+    global _executor
+    if _executor is None:
+        return
+    # shutdown() leaves a worker stuck on an image running, and the pool has no public way to stop one
+    for process in list((_executor._processes or {}).values()):
+        process.kill()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def normalize_images(paths: list) -> list:
+    """
+    Normalize images in the worker pool
+    :param paths: The paths to the images
+    :return: A NormalizedImage or None for each path, in order
+    """
+    results = [None] * len(paths)
+    # a crash breaks every future in the pool, not just the crashing image's, so each image gets a second try
+    attempts = [0] * len(paths)
+    pending = list(range(len(paths)))
+    while pending:
+        pool = _pool()
+        futures = [(i, pool.submit(normalize_image, paths[i], settings.IMAGE_MAX_PIXELS,
+                                   settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_BYTES)) for i in pending]
+        pending = []
+        for n, (i, future) in enumerate(futures):
+            try:
+                results[i] = future.result(timeout=settings.IMAGE_TIMEOUT)
+            except (TimeoutError, BrokenProcessPool) as e:
+                attempts[i] += 1
+                if attempts[i] < 2:
+                    pending.append(i)
+                else:
+                    reason = 'timed out' if isinstance(e, TimeoutError) else 'crashed its worker'
+                    print(f'Skipped image which {reason}: {paths[i]}')
+                # the images after it which weren't done go to a new pool, their futures die with this one
+                for j, later in futures[n + 1:]:
+                    if later.done() and not later.exception():
+                        results[j] = later.result()
+                    else:
+                        pending.append(j)
+                _replace_pool()
+                break
+    return results
+
+
+def normalize_stored_images(batch_size: int = 100, limit: int = None, stdout=None) -> dict:
+    """
+    Normalize the images stored before they were normalized at ingest, in id order, replacing their files.
+    Images which are rejected or can't be decoded are deleted; images whose file is missing are left alone, the
+    media may just not be mounted, gc_media reports them.
+    :param limit: The most images to normalize, None for all
+    :param stdout: Optional stream to write progress to
+    :return: The numbers of images normalized, deleted and missing, and the bytes saved
+    """
+    images = PaperImage.objects.filter(bytes=0).order_by('id')
+    stats = {'normalized': 0, 'deleted': 0, 'missing': 0, 'saved_bytes': 0}
+    last_id = 0
+    while True:
+        done = stats['normalized'] + stats['deleted'] + stats['missing']
+        size = batch_size if limit is None else min(batch_size, limit - done)
+        batch = list(images.filter(id__gt=last_id)[:size]) if size > 0 else []
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        stored = [image for image in batch if image.image and os.path.exists(image.image.path)]
+        stats['missing'] += len(batch) - len(stored)
+        paths = [image.image.path for image in stored]
+        for image, path, normalized in zip(stored, paths, normalize_images(paths)):
+            if normalized is None:
+                image.image.delete(save=False)
+                image.delete()
+                stats['deleted'] += 1
+                continue
+            stats['saved_bytes'] += os.path.getsize(path) - len(normalized.content)
+            name = os.path.splitext(os.path.basename(image.image.name))[0] + '.' + normalized.extension
+            image.image.delete(save=False)
+            image.image.save(name, ContentFile(normalized.content), save=False)
+            image.width, image.height, image.bytes = normalized.width, normalized.height, len(normalized.content)
+            image.save()
+            stats['normalized'] += 1
+        if stdout:
+            stdout.write(f'Normalized {stats["normalized"]} images up to id {last_id}, {stats["deleted"]} deleted, '
+                         f'{stats["missing"]} missing')
+    return stats
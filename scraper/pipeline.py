@@ -0,0 +1,217 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+
+from backend.models import ArxivPaper, Author, Subject
+from backend.authors import link_authors
+from backend.ingest import batch_ingested, paper_ingested
+from backend.media import delete_paper
+from . import scholar, upstreams
+from .arxiv import list_paper_ids, parse_abstract_page
+from .sources import create_image_objects, create_tex_files, extract_tar_gz, get_paper_screenshot_from_pdf
+from .summaries import summarize
+from .upstreams import ARXIV, upstream
+
+
+def get_or_create_subject(arxiv_id: str, short_name: str, full_name: str):
+    subject = Subject.objects.filter(short_name=short_name).first()
+    if not subject:
+        subject = Subject.objects.create(short_name=short_name, full_name=full_name)
+        print(f'[{arxiv_id}] Creating subject: {short_name} - {full_name}')
+    return subject
+
+
+def response_validators(response) -> dict:
+    """
+    :return: The ETag and Last-Modified headers of a response, to make the next request for the url conditional
+    """
+    return {key: response.headers[header] for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+            if response.headers.get(header)}
+
+
+def extract_source(paper) -> None:
+    """
+    Create the PaperImage and PaperSource objects of a paper from its source_tar
+    :param paper: The saved ArxivPaper
+    :return: None
+    """
+    arxiv_id = paper.arxiv_id
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            extract_tar_gz(paper.source_tar.path, temp_dir)
+            # grab all images from the source:
+            images = create_image_objects(temp_dir, paper)
+            for image in images:
+                paper.images.add(image)
+            print(f'[{arxiv_id}] Added {len(images)} images')
+            sources = create_tex_files(temp_dir, paper)
+            for source in sources:
+                paper.sources.add(source)
+            print(f'[{arxiv_id}] Added {len(sources)} sources')
+        except Exception as e:
+            print(f'[{arxiv_id}] Error occurred while extracting source: {e}')
+            # not a fatal exception, some papers do not provide tar.gz files and the source can just be e.g. a pdf
+
+
+def scrape_paper(arxiv_id, google_scholar=False):
+    """
+    Scrape the paper with the given arxiv_id and save it to the database
+    :param arxiv_id: The arxiv_id of the paper
+    :param google_scholar: True if google scholar lookups should be performed, else false
+    :return: The saved ArxivPaper object
+    """
+    # Send a GET request to the URL and retrieve the HTML content
+    url = f'https://arxiv.org/abs/{arxiv_id}'
+    if ArxivPaper.objects.filter(arxiv_id=arxiv_id).exists():
+        print(f'[{arxiv_id}] Paper with id {arxiv_id} already exists')
+        return None
+    else:
+        print(f'[{arxiv_id}] Scraping paper: {url}')
+
+    try:
+        response = upstream(ARXIV).get(url)
+        html_content = response.content
+    except Exception as e:
+        print(f'[{arxiv_id}] Error occurred while scraping {url}')
+        return None
+
+    metadata = parse_abstract_page(arxiv_id, html_content)
+    prim_subject = get_or_create_subject(arxiv_id, *metadata['primary_subject'])
+
+    # Download the pdf
+    pdf_url = f'https://arxiv.org/pdf/{arxiv_id}.pdf'
+    try:
+        pdf_response = upstream(ARXIV).get(pdf_url)
+        if pdf_response.status_code != 200:
+            print(f'[{arxiv_id}] Error occurred while downloading pdf from {pdf_url}')
+            return None
+    except Exception as e:
+        print(f'[{arxiv_id}] Error occurred while downloading pdf from {pdf_url}: {e}')
+        return None
+    pdf_content = pdf_response.content
+    pdf_file = ContentFile(pdf_content, name=f'{arxiv_id}.pdf')
+
+    # Download the source
+    source_url = f'https://arxiv.org/e-print/{arxiv_id}'
+    try:
+        source_response = upstream(ARXIV).get(source_url)
+        print(f'[{arxiv_id}] Downloading source from {source_url}')
+        if source_response.status_code != 200:
+            print(f'[{arxiv_id}] Error occurred while downloading source from {source_url}')
+            return None
+    except Exception as e:
+        print(f'[{arxiv_id}] Error occurred while downloading source from {source_url}: {e}')
+        return None
+
+    source_content = source_response.content
+    source_tar = ContentFile(source_content, name=f'{arxiv_id}.tar.gz')
+
+    etags = {'abs': response_validators(response), 'pdf': response_validators(pdf_response),
+             'source': response_validators(source_response)}
+    paper = ArxivPaper.objects.create(title=metadata['title'], abstract=metadata['abstract'],
+                                      publication_date=metadata['date'], arxiv_id=arxiv_id, doi=metadata['doi'],
+                                      pdf=pdf_file, primary_subject=prim_subject, journal_ref=metadata['jref'],
+                                      comment=metadata['comments'], source_tar=source_tar,
+                                      version=metadata['version'], etags=etags)
+
+    extract_source(paper)
+
+    # Get a screenshot
+    screenshot = get_paper_screenshot_from_pdf(paper.pdf.path)
+    if screenshot:
+        paper.screenshot = ContentFile(screenshot, name=f'{arxiv_id}.png')
+
+    # get a summary
+    try:
+        summary = summarize(paper.title, paper.abstract)
+        paper.summary, paper.summary_model, paper.summary_prompt = summary.text, summary.model, summary.prompt
+        paper.save()
+    except Exception as e:
+        print(f"Exception while generating completion: {e}")
+        delete_paper(paper)
+        return None
+
+    # get number of citations
+    if google_scholar:
+        try:
+            citations = scholar.search_citations(paper.title)
+            paper.citations = citations
+            paper.save()
+            print(f'[{arxiv_id}] Citations: {citations}')
+            if citations > 1000:
+                interesting_paper = True
+                print(f'[{arxiv_id}] Interesting paper: {citations} citations')
+        except Exception as e:
+            print(f'[{arxiv_id}] Could not find paper on Google Scholar')
+
+    total_author_citations = 0
+    paper_authors = []
+    for author_name in metadata['authors']:
+        # get author if exists:
+        author = Author.objects.filter(name=author_name).first()
+        if not author and google_scholar:
+            try:
+                first_author_result = scholar.search_author(author_name)
+                affiliation = first_author_result['affiliation']
+                email_domain = first_author_result['email_domain'].replace('@', '')
+                scolar_id = first_author_result['scholar_id']
+                citations = first_author_result['citedby']
+
+                author = Author.objects.create(name=author_name, affiliation=affiliation, email_domain=email_domain,
+                                               scholar_id=scolar_id, citations=citations)
+                print(f'[{arxiv_id}] Author created: {author} [affiliation: {affiliation}, email_domain: {email_domain}, citations: {citations}]')
+            except StopIteration:
+                author = Author.objects.create(name=author_name)
+                print(f'[{arxiv_id}] Author created: {author}, could not find more information')
+            except KeyError:
+                author = Author.objects.create(name=author_name)
+                print(f'[{arxiv_id}] Author created: {author}, key error')
+            except Exception as e:
+                author = Author.objects.create(name=author_name)
+                print(f'[{arxiv_id}] [Google Scholar Lookup Failed] Author created: {author}')
+        elif not author:
+            author = Author.objects.create(name=author_name)
+            print(f'[{arxiv_id}] Author created: {author}, no GS lookup')
+        total_author_citations += author.citations
+        paper_authors.append(author)
+    link_authors(paper, paper_authors)
+
+    paper.total_author_citations = total_author_citations
+    if total_author_citations > 100000:
+        print(f'[{arxiv_id}] Interesting paper: {total_author_citations} total author citations')
+
+    for short_name, full_name in metadata['subjects']:
+        print(f'[{arxiv_id}] Subject: {short_name} - {full_name}')
+        paper.subjects.add(get_or_create_subject(arxiv_id, short_name, full_name))
+
+    paper.save()
+    paper_ingested(paper)
+    print(f'[{arxiv_id}] Paper saved: {paper}')
+    print(f'[{arxiv_id}] [INTERESTING] Paper was interesting!: {paper}')
+    return paper
+
+
+def scrape_papers_from_list(section, num_papers, page, google_scholar=False):
+    """
+    Given a list url such as https://arxiv.org/list/cs.LG/pastweek?show=557, we get all paper IDs on the results
+    page and then scrape each paper into our DB
+    :param section: the section of the paper, e.g. cs.LG
+    :param num_papers: the number of papers to scrape
+    :param page: the page to get papers to scrape from
+    :param google_scholar: whether to scrape google scholar for citations
+    :return: None
+    """
+    paper_ids = list_paper_ids(section, num_papers, page)
+
+    # Print the extracted paper IDs
+    papers = []
+    for paper_id in paper_ids:
+        print(f'Found paper ID: {paper_id}')
+        paper = scrape_paper(paper_id, google_scholar)
+        if paper:
+            papers.append(paper)
+    batch_ingested(papers)
+
+    print(f'Scraped {len(papers)} of {len(paper_ids)} papers')
+    for line in upstreams.summary():
+        print(line)
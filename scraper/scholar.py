@@ -0,0 +1,60 @@
+"""
+Google Scholar lookups through scholarly. Importing scholarly and probing free proxies takes seconds, so both
+happen on the first lookup rather than when the scraper starts, and never for runs that find no new papers.
+"""
+from .upstreams import SCHOLAR, upstream
+
+_scholarly = None
+_use_proxies = False
+
+
+def use_proxies() -> None:
+    """
+    Route lookups through free proxies, set up on the first lookup
+    :return: None
+    """
+    global _use_proxies
+    _use_proxies = True
+
+
+def get_scholarly():
+    """
+    :return: The scholarly client, imported and configured on first use
+    """
+    global _scholarly
+    if _scholarly is None:
+        from scholarly import scholarly  # if this breaks, run pip install --upgrade httpx
+        if _use_proxies:
+            from scholarly import ProxyGenerator
+            pg = ProxyGenerator()
+            pg.FreeProxies()
+            scholarly.use_proxy(pg)
+        _scholarly = scholarly
+    return _scholarly
+
+
+def search_citations(title: str) -> int:
+    """
+    :param title: The title of a paper
+    :return: The citation count of the first Google Scholar result for the exact title
+    :raises StopIteration: if nothing was found
+    """
+    with upstream(SCHOLAR).request():
+        search_query = get_scholarly().search_pubs(f'"{title}"', patents=False, citations=False)
+        first_paper_result = next(search_query, None)
+    if first_paper_result is None:
+        raise StopIteration
+    return first_paper_result['num_citations']
+
+
+def search_author(name: str) -> dict:
+    """
+    :param name: The name of an author
+    :return: The first Google Scholar author result
+    :raises StopIteration: if nothing was found
+    """
+    with upstream(SCHOLAR).request():
+        first_author_result = next(get_scholarly().search_author(name), None)
+    if first_author_result is None:
+        raise StopIteration
+    return first_author_result
@@ -0,0 +1,81 @@
+import os
+import tarfile
+
+from django.core.files.base import ContentFile
+
+from backend.models import PaperImage, PaperSource
+from .images import normalize_images
+
+
+def extract_tar_gz(file_path: str, output_dir: str) -> None:
+    """
+    Extract a tar.gz file to the specified output directory
+    :param file_path: The path to the tar.gz file
+    :param output_dir: The directory to extract the tar.gz file to
+    :return: None
+    """
+    with tarfile.open(file_path, 'r:gz') as tar:
+        tar.extractall(output_dir)
+
+
+def create_image_objects(directory: str, paper) -> list:
+    """
+    Given a directory which contains images, this function will create PaperImage objects for each image,
+    normalized by scraper.images. Images which can't be decoded or have too many pixels are skipped.
+    :param directory: The directory containing the images
+    :return: The list of PaperImage objects
+    """
+    image_files = [os.path.join(root, f) for root, _, files in os.walk(directory) for f in files if
+                   f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+
+    images = []
+    for image_path, normalized in zip(image_files, normalize_images(image_files)):
+        if normalized is None:
+            print(f'[{paper.arxiv_id}] Skipped image {os.path.basename(image_path)}')
+            continue
+        name = os.path.splitext(os.path.basename(image_path))[0] + '.' + normalized.extension
+        django_file = ContentFile(normalized.content, name=paper.arxiv_id + '_' + name)
+        image = PaperImage(image=django_file, paper=paper, width=normalized.width, height=normalized.height,
+                           bytes=len(normalized.content))
+        image.save()
+        images.append(image)
+
+    return images
+
+
+def create_tex_files(directory: str, paper) -> list:
+    """
+    Given a directory which contains tex files, this function will create PaperSource objects for each tex file
+    :param directory: The directory containing the tex files
+    :return: The list of PaperSource objects
+    """
+    tex_files = [f for f in os.listdir(directory) if f.lower().endswith('.tex')]
+    sources = []
+    for tex_file in tex_files:
+        tex_path = os.path.join(directory, tex_file)
+        with open(tex_path, 'r') as f:
+            tex_content = f.read()
+        source = PaperSource(content=tex_content, paper=paper)
+        source.save()
+        sources.append(source)
+
+    return sources
+
+
+def get_paper_screenshot_from_pdf(pdf_path) -> bytes:
+    """
+    Get a screenshot of the first page of the pdf
+    :param pdf_path: The path to the pdf
+    :return: The screenshot as png, None if the pdf couldn't be rendered
+    """
+    # PyMuPDF takes a while to import and only this stage needs it
+    import fitz
+
+    try:
+        with fitz.open(pdf_path) as pdf:
+            page = pdf.load_page(0)
+            pix = page.get_pixmap(alpha=False)
+            return pix.tobytes("png")
+    except Exception as e:
+        print(f'Error occurred while getting screenshot of pdf: {pdf_path}')
+        return None
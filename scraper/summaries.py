@@ -0,0 +1,221 @@
+"""
+Paper summaries from the OpenAI chat completions API. Every summary records the model and the PROMPTS version
+which wrote it, so resummarize can find the papers a new model or prompt hasn't summarized yet.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.utils import timezone
+
+from backend.ingest import bump_content_version
+from backend.models import ArxivPaper, PaperSummary
+from .upstreams import OPENAI, upstream
+
+# never change a prompt in place, add a new version: the version is stored with every summary it wrote
+PROMPTS = {
+    # the original text-davinci-003 completions prompt, as a single chat message
+    'abstract-v1': {
+        'messages': [
+            {'role': 'user',
+             'content': 'Summarize the following AI paper abstract in two sentences:\nAbstract: {abstract}\nSummary:'},
+        ],
+        'temperature': 0.9,
+        'max_tokens': 512,
+        'presence_penalty': 0.6,
+    },
+    'abstract-v2': {
+        'messages': [
+            {'role': 'system',
+             'content': 'You summarize new arxiv papers for a feed. Write exactly two plain sentences: what the paper '
+                        'does, then its main result. No preamble, no markdown.'},
+            {'role': 'user', 'content': 'Title: {title}\nAbstract: {abstract}'},
+        ],
+        'temperature': 0.3,
+        'max_tokens': 200,
+    },
+}
+
+Summary = namedtuple('Summary', ['text', 'model', 'prompt', 'prompt_tokens', 'completion_tokens'])
+
+
+def openai_client():
+    # the openai package alone takes most of a second to import, runs which find no new papers never need it
+    from openai import OpenAI
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def estimate_tokens(title: str, abstract: str, prompt: str) -> int:
+    """
+    :return: An upper bound of the tokens summarizing a paper can use: its prompt at ~4 characters per token
+    plus the most the completion may have
+    """
+    options = PROMPTS[prompt]
+    characters = sum(len(message['content']) for message in options['messages']) + len(title) + len(abstract)
+    return characters // 4 + 1 + options['max_tokens']
+
+
+def summarize(title: str, abstract: str, model: str = None, prompt: str = None, client=None) -> Summary:
+    """
+    Summarize a paper from its title and abstract
+    :param model: The OpenAI model, SUMMARY_MODEL by default
+    :param prompt: One of PROMPTS, SUMMARY_PROMPT by default
+    :param client: An OpenAI client to reuse, a new one by default
+    :return: The summary along with the model, prompt and tokens which produced it
+    """
+    model = model or settings.SUMMARY_MODEL
+    prompt = prompt or settings.SUMMARY_PROMPT
+    options = dict(PROMPTS[prompt])
+    messages = [{'role': message['role'], 'content': message['content'].format(title=title, abstract=abstract)}
+                for message in options.pop('messages')]
+    client = client or openai_client()
+    with upstream(OPENAI).request():
+        response = client.chat.completions.create(model=model, messages=messages, **options)
+    usage = response.usage
+    return Summary(response.choices[0].message.content.strip(), model, prompt,
+                   usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+
+
+class TokenBudget:
+    """
+    Caps the tokens a run may use in total and per minute. Every request reserves its worst case before it is
+    sent and settles to what it actually used afterwards.
+    """
+
+    def __init__(self, total: int = None, per_minute: int = None):
+        self.total = total
+        self.per_minute = per_minute
+        self.used = 0
+        self._lock = threading.Lock()
+        self._window = deque()
+
+    def reserve(self, tokens: int) -> bool:
+        """
+        Wait until the per minute budget allows tokens more
+        :return: False if the total budget doesn't, the request must not be sent then
+        """
+        with self._lock:
+            if self.total is not None and self.used + tokens > self.total:
+                return False
+            self.used += tokens
+        if self.per_minute:
+            while True:
+                now = time.monotonic()
+                while self._window and self._window[0][0] <= now - 60:
+                    self._window.popleft()
+                if not self._window or sum(used for _, used in self._window) + tokens <= self.per_minute:
+                    break
+                time.sleep(self._window[0][0] + 60 - now)
+            self._window.append((time.monotonic(), tokens))
+        return True
+
+    def settle(self, reserved: int, used: int) -> None:
+        with self._lock:
+            self.used += used - reserved
+
+
+def papers_to_summarize(model: str, prompt: str, variant: bool = False):
+    """
+    :param variant: If True, papers without a PaperSummary by model and prompt, else papers whose own summary
+    wasn't written by them
+    """
+    if variant:
+        done = PaperSummary.objects.filter(model=model, prompt=prompt).values('paper_id')
+        return ArxivPaper.objects.exclude(id__in=done)
+    return ArxivPaper.objects.exclude(summary_model=model, summary_prompt=prompt)
+
+
+def save_summaries(results: list, variant: bool = False) -> None:
+    """
+    :param results: (ArxivPaper, Summary) pairs
+    :param variant: If True, store them as PaperSummary rows next to the papers' own summaries
+    """
+    if variant:
+        PaperSummary.objects.bulk_create([
+            PaperSummary(paper=paper, model=summary.model, prompt=summary.prompt, summary=summary.text,
+                         prompt_tokens=summary.prompt_tokens, completion_tokens=summary.completion_tokens)
+            for paper, summary in results
+        ], ignore_conflicts=True)
+        return
+    now = timezone.now()
+    for paper, summary in results:
+        paper.summary, paper.summary_model, paper.summary_prompt = summary.text, summary.model, summary.prompt
+        # bulk_update skips auto_now, incremental corpus exports go by modified_at
+        paper.modified_at = now
+    ArxivPaper.objects.bulk_update([paper for paper, _ in results],
+                                   ['summary', 'summary_model', 'summary_prompt', 'modified_at'])
+    # cached pages show the old summaries otherwise
+    bump_content_version()
+    try:
+        # the summary is part of the related papers text; imported here like in paper_ingested, for numpy
+        from backend import embeddings
+        embeddings.append_papers([paper for paper, _ in results], replace=True)
+    except Exception as e:
+        print(f'Error occurred while updating the related papers index: {e}')
+
+
+def resummarize(model: str, prompt: str, variant: bool = False, batch_size: int = 100, concurrency: int = 4,
+                token_budget: int = None, tokens_per_minute: int = None, limit: int = None, stdout=None) -> dict:
+    """
+    Summarize every paper model and prompt haven't summarized yet, in id order and in batches of batch_size,
+    with up to concurrency requests in flight. Each batch is saved before the next one starts, so an interrupted
+    run picks up where it stopped when started again; papers which failed are retried then too.
+    :param variant: Store the summaries as PaperSummary rows instead of replacing the papers' summaries
+    :param token_budget: The most tokens the run may use, None for no limit
+    :param tokens_per_minute: Pace requests to at most this many tokens a minute, None for no limit
+    :param limit: The most papers to summarize, None for all
+    :param stdout: Optional stream to write progress to
+    :return: The numbers of papers summarized and failed, the tokens used and whether the budget ran out
+    """
+    papers = papers_to_summarize(model, prompt, variant).only('id', 'arxiv_id', 'title', 'abstract').order_by('id')
+    budget = TokenBudget(token_budget, tokens_per_minute)
+    client = openai_client()
+    stats = {'summarized': 0, 'failed': 0, 'tokens': 0, 'budget_exhausted': False}
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while not stats['budget_exhausted']:
+            size = batch_size if limit is None else min(batch_size, limit - stats['summarized'] - stats['failed'])
+            batch = list(papers.filter(id__gt=last_id)[:size]) if size > 0 else []
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            futures = {}
+            results = []
+
+            def collect(done):
+                for future in done:
+                    paper, reserved = futures.pop(future)
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        print(f'[{paper.arxiv_id}] Error occurred while summarizing: {e}')
+                        budget.settle(reserved, 0)
+                        stats['failed'] += 1
+                        continue
+                    budget.settle(reserved, summary.prompt_tokens + summary.completion_tokens)
+                    results.append((paper, summary))
+
+            for paper in batch:
+                reserved = estimate_tokens(paper.title, paper.abstract, prompt)
+                # reservations of requests in flight are worst cases, settling them may leave room for this one
+                while not budget.reserve(reserved):
+                    if not futures:
+                        stats['budget_exhausted'] = True
+                        break
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+                if stats['budget_exhausted']:
+                    break
+                future = executor.submit(summarize, paper.title, paper.abstract, model, prompt, client)
+                futures[future] = (paper, reserved)
+            collect(wait(futures).done)
+            if results:
+                save_summaries(results, variant)
+            stats['summarized'] += len(results)
+            stats['tokens'] = budget.used
+            if stdout:
+                stdout.write(f'Summarized {stats["summarized"]} papers up to id {last_id}, '
+                             f'{stats["failed"]} failed, {stats["tokens"]} tokens')
+    return stats
@@ -0,0 +1,162 @@
+"""
+Update mode: picks up new arxiv versions of papers which were already scraped. The export API tells the latest
+version of a few hundred papers per request; only papers with a newer one are fetched again, and only the
+abstract page, pdf and source which changed since they were stored, by conditional requests with their ETags.
+"""
+import datetime
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from backend.authors import link_authors, unlink_authors
+from backend.ingest import batch_ingested, paper_updated
+from backend.models import ArxivPaper, Author, PaperImage, PaperSource, PaperText
+from . import upstreams
+from .arxiv import list_versions, parse_abstract_page
+from .pipeline import extract_source, get_or_create_subject, response_validators
+from .sources import get_paper_screenshot_from_pdf
+from .summaries import summarize
+from .upstreams import ARXIV, upstream
+
+
+def conditional_get(url: str, validators: dict):
+    """
+    GET url unless it hasn't changed since the response validators were taken from
+    :return: The response, with status 304 if it hasn't changed
+    """
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return upstream(ARXIV).get(url, headers=headers)
+
+
+def _replace_file(field, name: str, content: bytes) -> None:
+    # deleted first, so the new file takes over the name instead of getting a suffix
+    field.delete(save=False)
+    field.save(name, ContentFile(content), save=False)
+
+
+def _update_metadata(paper, metadata: dict) -> None:
+    arxiv_id = paper.arxiv_id
+    abstract_changed = metadata['abstract'] != paper.abstract
+    paper.title, paper.abstract = metadata['title'], metadata['abstract']
+    paper.journal_ref, paper.comment, paper.doi = metadata['jref'], metadata['comments'], metadata['doi']
+    if metadata['date']:
+        paper.publication_date = metadata['date']
+    paper.primary_subject = get_or_create_subject(arxiv_id, *metadata['primary_subject'])
+    paper.subjects.set([get_or_create_subject(arxiv_id, short_name, full_name)
+                        for short_name, full_name in metadata['subjects']])
+
+    # authors added in the new version are linked, no Google Scholar lookups for them; dropped ones are unlinked
+    authors = []
+    for author_name in metadata['authors']:
+        author = Author.objects.filter(name=author_name).first()
+        if not author:
+            author = Author.objects.create(name=author_name)
+            print(f'[{arxiv_id}] Author created: {author}, no GS lookup')
+        authors.append(author)
+    unlink_authors(paper, set(paper.authors.values_list('id', flat=True)) - {author.id for author in authors})
+    link_authors(paper, authors)
+
+    if abstract_changed:
+        try:
+            summary = summarize(paper.title, paper.abstract)
+            paper.summary, paper.summary_model, paper.summary_prompt = summary.text, summary.model, summary.prompt
+        except Exception as e:
+            print(f'[{arxiv_id}] Exception while generating completion, keeping the old summary: {e}')
+
+
+def update_paper(paper, version: int, updated: datetime.datetime):
+    """
+    Bring a paper up to a newer arxiv version, fetching its abstract page, pdf and source only if they changed
+    :param paper: The ArxivPaper
+    :param version: Its latest version
+    :param updated: When that version was published
+    :return: The updated ArxivPaper, None if fetching failed (it is left as it was then, to be tried again)
+    """
+    arxiv_id = paper.arxiv_id
+    print(f'[{arxiv_id}] Updating from v{paper.version} to v{version}')
+    etags = dict(paper.etags)
+
+    responses = {}
+    for artifact, url in (('abs', paper.abstract_link()), ('pdf', paper.pdf_link()), ('source', paper.source_link())):
+        try:
+            response = conditional_get(url, etags.get(artifact, {}))
+        except Exception as e:
+            print(f'[{arxiv_id}] Error occurred while downloading {url}: {e}')
+            return None
+        if response.status_code not in (200, 304):
+            print(f'[{arxiv_id}] Error occurred while downloading {url}: {response.status_code}')
+            return None
+        if response.status_code == 200:
+            responses[artifact] = response
+            etags[artifact] = response_validators(response)
+
+    if 'abs' in responses:
+        _update_metadata(paper, parse_abstract_page(arxiv_id, responses['abs'].content))
+    if 'pdf' in responses:
+        _replace_file(paper.pdf, f'{arxiv_id}.pdf', responses['pdf'].content)
+        screenshot = get_paper_screenshot_from_pdf(paper.pdf.path)
+        if screenshot:
+            _replace_file(paper.screenshot, f'{arxiv_id}.png', screenshot)
+        # extract_paper_text extracts it again
+        PaperText.objects.filter(paper=paper).delete()
+    if 'source' in responses:
+        _replace_file(paper.source_tar, f'{arxiv_id}.tar.gz', responses['source'].content)
+        for image in PaperImage.objects.filter(paper=paper):
+            image.image.delete(save=False)
+            image.delete()
+        PaperSource.objects.filter(paper=paper).delete()
+        extract_source(paper)
+        if 'pdf' not in responses:
+            PaperText.objects.filter(paper=paper).delete()
+    print(f'[{arxiv_id}] Changed since v{paper.version}: {", ".join(responses) or "nothing"}')
+
+    paper.version, paper.arxiv_updated_at, paper.etags = version, updated, etags
+    paper.save()
+    paper_updated(paper)
+    return paper
+
+
+def update_papers(days: int = None, limit: int = None) -> list:
+    """
+    Check the papers published in the last days for newer arxiv versions and update those which have one
+    :param days: How far back to check, None for every paper
+    :param limit: The most papers to update, None for all
+    :return: The updated ArxivPapers
+    """
+    papers = ArxivPaper.objects.order_by('-publication_date', '-id')
+    if days is not None:
+        papers = papers.filter(publication_date__gte=timezone.now().date() - datetime.timedelta(days=days))
+    known = {arxiv_id: (paper_id, version, updated) for paper_id, arxiv_id, version, updated in
+             papers.values_list('id', 'arxiv_id', 'version', 'arxiv_updated_at')}
+    print(f'Checking {len(known)} papers for new versions')
+    latest = list_versions(list(known))
+
+    stale, unchanged = [], []
+    for arxiv_id, (version, updated) in latest.items():
+        if arxiv_id not in known:
+            continue
+        paper_id, known_version, known_updated = known[arxiv_id]
+        if version > known_version or (known_updated and updated > known_updated):
+            stale.append(paper_id)
+        elif not known_updated:
+            unchanged.append(ArxivPaper(id=paper_id, arxiv_updated_at=updated))
+    # remember when the checked versions were published, so a replaced version without a new number shows up too
+    ArxivPaper.objects.bulk_update(unchanged, ['arxiv_updated_at'], batch_size=500)
+    print(f'{len(stale)} papers have a newer version')
+
+    updated_papers = []
+    for paper_id in stale[:limit]:
+        paper = ArxivPaper.objects.get(id=paper_id)
+        paper = update_paper(paper, *latest[paper.arxiv_id])
+        if paper:
+            updated_papers.append(paper)
+    batch_ingested(updated_papers)
+
+    print(f'Updated {len(updated_papers)} of {len(stale)} papers')
+    for line in upstreams.summary():
+        print(line)
+    return updated_papers
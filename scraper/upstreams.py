@@ -0,0 +1,174 @@
+"""
+Rate limits and circuit breakers of the hosts the scraper calls, configured in SCRAPER_UPSTREAMS.
+
+Each host has a token bucket and a count of consecutive failures in a small JSON file in SCRAPER_STATE_DIR,
+read and written under an flock, so every scraper process (and resummarize's threads) on the machine shares
+them. Once a host fails often enough in a row its breaker opens: stages which can't do without the host pause
+until the cooldown is over, the others fail fast with CircuitOpen and carry on without it. The first request
+after the cooldown decides whether the breaker closes again or stays open for another one.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+
+ARXIV = 'arxiv.org'
+EXPORT = 'export.arxiv.org'
+OPENAI = 'api.openai.com'
+SCHOLAR = 'scholar.google.com'
+
+
+def _clock(timestamp: float) -> str:
+    return time.strftime('%H:%M:%S', time.localtime(timestamp))
+
+
+class CircuitOpen(Exception):
+    def __init__(self, host: str, until: float):
+        super().__init__(f'{host} is failing, not calling it until {_clock(until)}')
+        self.host = host
+        self.until = until
+
+
+class Upstream:
+    def __init__(self, host: str):
+        self.host = host
+        # this process's own numbers, for the run summary
+        self.stats = {'requests': 0, 'failures': 0, 'rejected': 0, 'waited': 0.0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def options(self) -> dict:
+        return settings.SCRAPER_UPSTREAMS[self.host]
+
+    def _count(self, stat: str, value=1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += value
+
+    @contextmanager
+    def _state(self):
+        os.makedirs(settings.SCRAPER_STATE_DIR, exist_ok=True)
+        with open(os.path.join(settings.SCRAPER_STATE_DIR, f'{self.host}.json'), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            state = json.loads(content) if content else {}
+            original = dict(state)
+            yield state
+            if state != original:
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+
+    def acquire(self) -> None:
+        """
+        Wait for the host's rate limit to allow one more request
+        :raises CircuitOpen: if the host's breaker is open and its stage doesn't pause for it
+        """
+        options = self.options
+        while True:
+            now = time.time()
+            with self._state() as state:
+                open_until = state.get('open_until', 0)
+                if now < open_until:
+                    wait = None
+                elif not options.get('rate'):
+                    wait = 0
+                else:
+                    burst = options.get('burst', 1)
+                    refill = (now - state.get('updated', now)) * options['rate']
+                    tokens = min(burst, state.get('tokens', burst) + refill)
+                    state['updated'] = now
+                    if tokens >= 1:
+                        state['tokens'] = tokens - 1
+                        wait = 0
+                    else:
+                        state['tokens'] = tokens
+                        wait = (1 - tokens) / options['rate']
+            if wait == 0:
+                self._count('requests')
+                return
+            if wait is None:
+                if not options.get('pause'):
+                    self._count('rejected')
+                    raise CircuitOpen(self.host, open_until)
+                print(f'[{self.host}] Host is failing, pausing until {_clock(open_until)}')
+                wait = open_until - now
+            time.sleep(wait)
+            self._count('waited', wait)
+
+    def record(self, success: bool) -> None:
+        """
+        Count a request's outcome towards the host's breaker
+        """
+        if not success:
+            self._count('failures')
+        with self._state() as state:
+            if success:
+                state['failures'] = 0
+                state['open_until'] = 0
+                return
+            state['failures'] = state.get('failures', 0) + 1
+            if state['failures'] >= self.options['failures']:
+                state['open_until'] = time.time() + self.options['cooldown']
+
+    @contextmanager
+    def request(self):
+        """
+        Wrap a call to the host: waits for the rate limit and records whether the call raised
+        """
+        self.acquire()
+        try:
+            yield
+        except Exception:
+            self.record(False)
+            raise
+        self.record(True)
+
+    def get(self, url: str, **kwargs):
+        """
+        requests.get through the rate limit, server errors and 429s count as failures
+        """
+        self.acquire()
+        try:
+            response = requests.get(url, **kwargs)
+        except Exception:
+            self.record(False)
+            raise
+        self.record(response.status_code < 500 and response.status_code != 429)
+        return response
+
+    def describe(self) -> str:
+        with self._state() as state:
+            failures, open_until = state.get('failures', 0), state.get('open_until', 0)
+        if time.time() < open_until:
+            breaker = f'open until {_clock(open_until)}'
+        elif failures >= self.options['failures']:
+            breaker = 'half-open'
+        else:
+            breaker = 'closed'
+        return (f'{self.host}: breaker {breaker} ({failures} failures in a row), {self.stats["requests"]} requests, '
+                f'{self.stats["failures"]} failed, {self.stats["rejected"]} rejected, '
+                f'{self.stats["waited"]:.1f}s waited')
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(host: str) -> Upstream:
+    with _upstreams_lock:
+        if host not in _upstreams:
+            _upstreams[host] = Upstream(host)
+        return _upstreams[host]
+
+
+def summary() -> list:
+    """
+    :return: A line on the breaker and requests of every host this process called
+    """
+    return [upstream(host).describe() for host in sorted(_upstreams)]
@@ -1,14 +1,13 @@
 #!/bin/sh
 BASEPATH=/var/www2/papers.day
 
-echo "Not compiling CSS!"
 source $BASEPATH/env/bin/activate
 
 echo "Updating from requirements.txt..."
 cd $BASEPATH
 python3 -m pip install -r ./requirements.txt
 
-# Static files
+# Static files, minified, hashed and precompressed by papers.storage
 echo "Collecting static files..."
 cd $BASEPATH
 python3 manage.py collectstatic --noinput
@@ -18,6 +17,11 @@ echo "Applying migrations..."
 cd $BASEPATH
 python3 manage.py migrate
 
+# Feeds, only rewrites the files whose papers changed
+echo "Generating feeds..."
+cd $BASEPATH
+python3 manage.py generate_feeds
+
 echo "Restarting uWSGI..."
 sudo service uwsgi2 restart
 
@@ -0,0 +1,116 @@
+"""
+Load test comparing deployments of the site, e.g. the WSGI (uWSGI) and ASGI (uvicorn) setups serving the same database.
+
+Browsing clients page through the feed and load the homepage while search clients run searches too short
+to be cached, which go to the database every time. The interesting number is how much the browsing
+latency suffers from the searches running next to it.
+
+    python scripts/loadtest.py --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002
+"""
+import argparse
+import asyncio
+import json
+import random
+import string
+import time
+
+import httpx
+
+DATE_FILTERS = ['today', 'this-week', 'this-month', 'this-year', 'forever']
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def browse_url(rng: random.Random) -> str:
+    if rng.random() < 0.2:
+        return '/'
+    return f'/api/papers/?d={rng.choice(DATE_FILTERS)}&s={15 * rng.randint(0, 20)}'
+
+
+def search_url(rng: random.Random) -> str:
+    # two letters are below the search cache's minimum prefix, so every one of these scans the papers table
+    query = ''.join(rng.choices(string.ascii_lowercase, k=2))
+    return f'/api/papers/?q={query}&d=forever'
+
+
+async def client(http: httpx.AsyncClient, make_url, results: list, errors: list, deadline: float, seed: str):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        url = make_url(rng)
+        start = time.perf_counter()
+        try:
+            response = await http.get(url)
+            if response.status_code != 200:
+                errors.append(f'{response.status_code} {url}')
+                continue
+        except httpx.HTTPError as e:
+            errors.append(f'{type(e).__name__} {url}')
+            continue
+        results.append(time.perf_counter() - start)
+
+
+async def run_target(url: str, duration: float, browsers: int, searchers: int) -> dict:
+    """
+    :return: per client kind: requests, requests/sec, median and p99 latency in ms, errors
+    """
+    limits = httpx.Limits(max_connections=browsers + searchers)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        # warm up: first requests pay for imports and empty caches
+        await http.get('/')
+        await http.get('/api/papers/')
+        kinds = {'browse': ([], [], browse_url, browsers), 'search': ([], [], search_url, searchers)}
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            client(http, make_url, results, errors, deadline, seed=f'{kind}-{n}')
+            for kind, (results, errors, make_url, count) in kinds.items() for n in range(count)
+        ])
+        elapsed = time.perf_counter() - started
+    return {
+        kind: {
+            'requests': len(results),
+            'rps': len(results) / elapsed,
+            'median_ms': percentile(results, 0.5) * 1000,
+            'p99_ms': percentile(results, 0.99) * 1000,
+            'errors': len(errors),
+        }
+        for kind, (results, errors, _, _) in kinds.items()
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Compare the throughput and latency of deployments')
+    parser.add_argument('-t', '--target', action='append', required=True,
+                        help='name=base url of a running server, may be repeated')
+    parser.add_argument('-d', '--duration', type=float, default=30, help='Seconds to run against each target')
+    parser.add_argument('-b', '--browsers', type=int, default=20, help='Concurrent browsing clients')
+    parser.add_argument('-s', '--searchers', type=int, default=4, help='Concurrent clients running uncached searches')
+    parser.add_argument('-o', '--output', help='Also write the results to this JSON file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        print(f'Running {name} ({url}) for {args.duration:.0f}s...')
+        results[name] = asyncio.run(run_target(url, args.duration, args.browsers, args.searchers))
+
+    print(f'{"target":<12} {"kind":<8} {"requests":>9} {"req/s":>9} {"median":>10} {"p99":>10} {"errors":>7}')
+    for name, kinds in results.items():
+        for kind, stats in kinds.items():
+            print(f'{name:<12} {kind:<8} {stats["requests"]:>9} {stats["rps"]:>9.1f} {stats["median_ms"]:>8.1f}ms '
+                  f'{stats["p99_ms"]:>8.1f}ms {stats["errors"]:>7}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()